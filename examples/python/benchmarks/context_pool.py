@@ -0,0 +1,50 @@
+#
+# Measures the latency of many small evaluations with a fresh Weld context
+# per run against contexts reused from a WeldContextPool.
+#
+# Usage: python context_pool.py [num_elements] [num_runs] [num_threads]
+#
+from __future__ import print_function
+
+import sys
+import time
+
+import numpy as np
+
+from weld.weldobject import WeldObject
+from weld.types import WeldVec, WeldLong
+from weld.encoders import NumpyArrayEncoder, NumpyArrayDecoder
+from weld.pool import WeldContextPool
+
+size = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+threads = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+obj = WeldObject(NumpyArrayEncoder(), NumpyArrayDecoder())
+name = obj.update(np.arange(size, dtype='int64'))
+obj.weld_code = "map(%s, |e| e + 2L)" % name
+function = obj.prepare(WeldVec(WeldLong()))
+
+
+def bench(pool):
+    # Warm up.
+    function.run(num_threads=threads, pool=pool)
+    latencies = []
+    for _ in range(runs):
+        start = time.time()
+        result = function.run(num_threads=threads, pool=pool)
+        del result
+        latencies.append(time.time() - start)
+    latencies = np.array(latencies) * 1e6
+    return np.mean(latencies), np.percentile(latencies, 50), \
+        np.percentile(latencies, 99)
+
+
+print("{} runs over {} elements, {} thread(s)".format(runs, size, threads))
+fresh = bench(None)
+print("fresh context: mean {:.1f} us, p50 {:.1f} us, p99 {:.1f} us".format(*fresh))
+pool = WeldContextPool()
+pooled = bench(pool)
+print("pooled context: mean {:.1f} us, p50 {:.1f} us, p99 {:.1f} us".format(*pooled))
+print("pool: {}".format(pool.stats()))
+print("{:.3}x lower mean latency".format(fresh[0] / pooled[0]))
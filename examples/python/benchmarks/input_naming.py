@@ -0,0 +1,63 @@
+#
+# Measures the overhead of registering large NumPy inputs with WeldObjects.
+#
+# Input names used to be assigned by looking up str(value) in a global dict,
+# which formats (part of) every array on every update. This benchmark times
+# WeldObject.update on large arrays against that str()-keyed lookup.
+#
+# Usage: python input_naming.py [num_elements] [num_updates]
+#
+from __future__ import print_function
+
+import sys
+import time
+
+import numpy as np
+
+from weld.weldobject import WeldObject
+from weld.encoders import NumpyArrayEncoder, NumpyArrayDecoder
+
+size = int(sys.argv[1]) if len(sys.argv) > 1 else (1 << 27)
+updates = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+# Arrays which differ only away from their edges, as is common for real
+# data (e.g., zero-padded or sorted columns).
+arrays = []
+for i in range(8):
+    arr = np.zeros(size // 8)
+    arr[size // 16] = i
+    arrays.append(arr)
+encoder = NumpyArrayEncoder()
+decoder = NumpyArrayDecoder()
+
+print("Inputs: {} arrays of {} float64s, {} updates".format(
+    len(arrays), size // 8, updates))
+
+# The old scheme, keyed on the array's string representation.
+legacy_registry = {}
+start = time.time()
+for i in range(updates):
+    value_str = str(arrays[i % len(arrays)])
+    if value_str not in legacy_registry:
+        legacy_registry[value_str] = "_inp%d" % len(legacy_registry)
+end = time.time()
+legacy_time = end - start
+print("str()-keyed registry: {:.3} seconds ({:.3} us/update)".format(
+    legacy_time, legacy_time / updates * 1e6))
+# NumPy abbreviates large arrays, so different arrays can collide.
+print("  distinct names for {} distinct arrays: {}".format(
+    len(arrays), len(legacy_registry)))
+
+start = time.time()
+names = set()
+for i in range(updates):
+    obj = WeldObject(encoder, decoder)
+    names.add(obj.update(arrays[i % len(arrays)]))
+end = time.time()
+weld_time = end - start
+print("WeldObject.update: {:.3} seconds ({:.3} us/update)".format(
+    weld_time, weld_time / updates * 1e6))
+print("  distinct names for {} distinct arrays: {}".format(
+    len(arrays), len(names)))
+
+print("{:.3}x faster".format(legacy_time / weld_time))
@@ -0,0 +1,97 @@
+#
+# Measures code generation for large WeldObject dependency graphs.
+#
+# WeldObject.get_let_statements used to prepend each statement to a list and
+# then sort the statements by their text, which is quadratic in the number of
+# objects and orders obj1000 before obj999. This benchmark builds a long chain
+# and a wide lattice of objects, and times the old and new implementations.
+#
+# Usage: python let_statements.py [num_objects]
+#
+from __future__ import print_function
+
+import sys
+import time
+
+from weld.weldobject import WeldObject
+from weld.encoders import NumpyArrayEncoder, NumpyArrayDecoder
+
+num_objects = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+encoder = NumpyArrayEncoder()
+decoder = NumpyArrayDecoder()
+
+
+def new_object(deps, code):
+    obj = WeldObject(encoder, decoder)
+    for dep in deps:
+        obj.dependencies[dep.obj_id] = dep
+    obj.weld_code = code
+    return obj
+
+
+def chain(n):
+    """ Each object adds one to the previous one. """
+    obj = new_object([], "1L")
+    for _ in range(n):
+        obj = new_object([obj], "%s + 1L" % obj.obj_id)
+    return obj
+
+
+def lattice(n, width=100):
+    """ Each object sums all objects of the previous layer. """
+    layer = [new_object([], "%dL" % i) for i in range(width)]
+    for _ in range(n // width - 1):
+        code = " + ".join(dep.obj_id for dep in layer)
+        layer = [new_object(layer, code) for _ in range(width)]
+    return new_object(layer, " + ".join(dep.obj_id for dep in layer))
+
+
+def legacy_let_statements(root):
+    queue = [root]
+    visited = set()
+    let_statements = []
+    is_first = True
+    while len(queue) > 0:
+        cur_obj = queue.pop()
+        cur_obj_id = cur_obj.obj_id
+        if cur_obj_id in visited:
+            continue
+        if not is_first:
+            let_statements.insert(0, "let %s = (%s);" % (cur_obj_id, cur_obj.weld_code))
+        is_first = False
+        for key in sorted(cur_obj.dependencies.keys()):
+            queue.append(cur_obj.dependencies[key])
+        visited.add(cur_obj_id)
+    let_statements.sort()
+    return "\n".join(let_statements)
+
+
+def defined_before_use(statements):
+    """ Returns whether every object is defined before it is referenced. """
+    defined = set()
+    for line in statements.splitlines():
+        name = line.split()[1]
+        code = line.split("=", 1)[1]
+        for token in code.replace("(", " ").replace(")", " ").split():
+            if token.startswith("obj") and token not in defined:
+                return False
+        defined.add(name)
+    return True
+
+
+for name, build in [("chain", chain), ("lattice", lattice)]:
+    root = build(num_objects)
+
+    start = time.time()
+    legacy = legacy_let_statements(root)
+    legacy_time = time.time() - start
+
+    start = time.time()
+    statements = root.get_let_statements()
+    weld_time = time.time() - start
+
+    print("{} of {} objects:".format(name, len(statements.splitlines())))
+    print("  legacy: {:.3f} ms (valid order: {})".format(
+        legacy_time * 1000, defined_before_use(legacy)))
+    print("  get_let_statements: {:.3f} ms (valid order: {})".format(
+        weld_time * 1000, defined_before_use(statements)))
@@ -0,0 +1,48 @@
+#
+# Measures encoding and decoding of 2-D NumPy arrays in Grizzly's convertor.
+#
+# 2-D arrays are passed to Weld as a vector of row vectors. Arrays whose rows
+# are contiguous (C order) only need a table of row pointers; other arrays
+# (e.g. in Fortran order) are first copied into row-major order with a
+# cache-blocked transpose. Decoding copies each row into a new array. This
+# benchmark times both directions for a C-order and a Fortran-order matrix
+# with 1 thread and with the given number of threads.
+#
+# Usage: python matrix_encoding.py [size] [threads]
+#
+from __future__ import print_function
+
+import ctypes
+import sys
+import time
+
+import numpy as np
+
+from grizzly.encoders import NumPyEncoder, NumPyDecoder
+from weld.types import WeldDouble, WeldVec
+
+size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+restype = WeldVec(WeldVec(WeldDouble()))
+
+matrix = np.random.rand(size, size)
+for order in ["C", "F"]:
+    data = np.asarray(matrix, order=order)
+    print("{0}x{0} float64 matrix in {1} order:".format(size, order))
+    for num_threads in sorted(set([1, threads])):
+        # Fresh encoders, so that no encoding is cached.
+        encoder = NumPyEncoder(num_threads)
+        decoder = NumPyDecoder(num_threads)
+
+        start = time.time()
+        encoded = encoder.encode(data)
+        encode_time = time.time() - start
+
+        start = time.time()
+        decoded = decoder.decode(ctypes.addressof(encoded), restype,
+                                 raw_ptr=True)
+        decode_time = time.time() - start
+
+        assert np.array_equal(decoded, data)
+        print("  {} threads: encode {:.3f} s, decode {:.3f} s".format(
+            num_threads, encode_time, decode_time))
@@ -0,0 +1,59 @@
+#
+# Measures the per-call overhead of WeldObject.evaluate against a function
+# prepared once with WeldObject.prepare and called with new inputs.
+#
+# The arrays are small so that the time is dominated by overhead (program
+# generation, argument struct setup, compilation or cache lookup) rather
+# than by the computation itself.
+#
+# Usage: python prepared_function.py [num_elements] [num_calls]
+#
+from __future__ import print_function
+
+import sys
+import time
+
+import numpy as np
+
+from weld.weldobject import WeldObject
+from weld.types import WeldLong
+from weld.encoders import NumpyArrayEncoder, NumpyArrayDecoder
+
+size = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+calls = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+encoder = NumpyArrayEncoder()
+decoder = NumpyArrayDecoder()
+
+batches = [np.arange(size, dtype='int64') + i for i in range(calls)]
+expected = [batch.sum() + 2 * size for batch in batches]
+
+
+def build(batch):
+    obj = WeldObject(encoder, decoder)
+    name = obj.update(batch)
+    obj.weld_code = "result(for(%s, merger[i64,+], |b, i, e| merge(b, e + 2L)))" % name
+    return obj, name
+
+
+# Warm up, so both paths run with the module already compiled.
+build(batches[0])[0].evaluate(WeldLong(), verbose=False)
+
+start = time.time()
+for batch, value in zip(batches, expected):
+    obj, _ = build(batch)
+    assert obj.evaluate(WeldLong(), verbose=False) == value
+end = time.time()
+evaluate_time = (end - start) / calls
+print("evaluate: {:.1f} us/call".format(evaluate_time * 1e6))
+
+obj, name = build(batches[0])
+function = obj.prepare(WeldLong())
+start = time.time()
+for batch, value in zip(batches, expected):
+    assert function(**{name: batch}) == value
+end = time.time()
+prepared_time = (end - start) / calls
+print("prepared: {:.1f} us/call".format(prepared_time * 1e6))
+
+print("{:.3}x less overhead per call".format(evaluate_time / prepared_time))
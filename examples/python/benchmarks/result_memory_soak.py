@@ -0,0 +1,62 @@
+#
+# Checks that evaluating WeldObjects doesn't leak memory: decoded results are
+# views of Weld's memory, which must be freed once they are garbage collected.
+#
+# Runs many evaluations that each return a large array and fails if the
+# process' peak RSS keeps growing after a warm-up period.
+#
+# Usage: python result_memory_soak.py [num_evaluations] [num_elements]
+#
+from __future__ import print_function
+
+import resource
+import sys
+
+import numpy as np
+
+from weld.weldobject import WeldObject
+from weld.types import WeldVec, WeldDouble
+from weld.encoders import NumpyArrayEncoder, NumpyArrayDecoder
+
+evaluations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+size = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+warmup = evaluations // 10
+
+encoder = NumpyArrayEncoder()
+decoder = NumpyArrayDecoder()
+data = np.random.rand(size)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on OS X.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss /= 1024
+    return rss / 1024.0
+
+
+def evaluate():
+    obj = WeldObject(encoder, decoder)
+    name = obj.update(data)
+    obj.weld_code = "map(%s, |e| e * 2.0)" % name
+    return obj.evaluate(WeldVec(WeldDouble()), verbose=False)
+
+
+for i in range(warmup):
+    evaluate()
+baseline = peak_rss_mb()
+print("Peak RSS after {} evaluations: {:.1f} MB".format(warmup, baseline))
+
+for i in range(warmup, evaluations):
+    result = evaluate()
+    assert result[0] == data[0] * 2.0
+    if (i + 1) % warmup == 0:
+        print("Peak RSS after {} evaluations: {:.1f} MB".format(
+            i + 1, peak_rss_mb()))
+
+growth = peak_rss_mb() - baseline
+# Each leaked result would add size * 8 bytes.
+leaked = size * 8 * (evaluations - warmup) / (1024.0 * 1024.0)
+print("Growth: {:.1f} MB ({:.1f} MB if every result leaked)".format(
+    growth, leaked))
+assert growth < leaked / 100, "Peak RSS grew by {:.1f} MB".format(growth)
@@ -0,0 +1,136 @@
+"""Helpers for dictionary-encoded (categorical) columns.
+
+A dictionary-encoded column is passed to Weld as an array of int32 codes,
+with -1 for missing values, while its dictionary (a pandas Index of the
+distinct values, or categories) stays in Python. Weld groups, joins and
+compares the codes, and the dictionary is only applied when the result is
+decoded.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def is_dictionary_encoded(series):
+    """
+    Returns whether a pandas Series is a Categorical of strings, which is
+    passed to Weld as its codes.
+
+    Args:
+        series (pandas.Series): The column
+    """
+    return (str(series.dtype) == 'category' and
+            series.cat.categories.dtype.kind == 'O')
+
+
+def encode(series):
+    """
+    Returns the codes and dictionary of a column: those of a Categorical, or
+    the sorted distinct values of other columns.
+
+    Args:
+        series (pandas.Series): The column
+
+    Returns:
+        A (numpy.ndarray<int32>, pandas.Index) tuple
+    """
+    if str(series.dtype) == 'category':
+        codes = series.cat.codes.values
+        categories = series.cat.categories
+    else:
+        codes, categories = pd.factorize(series.values, sort=True)
+        categories = pd.Index(categories)
+    return codes.astype(np.int32), categories
+
+
+def decode(codes, categories):
+    """
+    Applies a dictionary to decoded codes.
+
+    Args:
+        codes (numpy.ndarray): The codes
+        categories (pandas.Index): The dictionary
+
+    Returns:
+        pandas.Categorical
+    """
+    return pd.Categorical.from_codes(codes, categories)
+
+
+def to_strings(codes, categories):
+    """
+    Returns the values of codes as a NumPy string array, with missing values
+    as "nan" like the string columns of DataFrameWeld.
+
+    Args:
+        codes (numpy.ndarray): The codes
+        categories (pandas.Index): The dictionary
+    """
+    return string_table(categories)[codes]
+
+
+def string_table(categories):
+    """
+    Returns a table for grizzly_impl.lookup_codes mapping codes to strings.
+
+    Args:
+        categories (pandas.Index): The dictionary
+    """
+    return np.array(list(categories) + ["nan"], dtype=str)
+
+
+def code_table(categories, target):
+    """
+    Returns a table for grizzly_impl.lookup_codes mapping the codes of
+    `categories` to the codes of the same values in `target`, or to -2 for
+    values not in `target`. Missing values stay missing.
+
+    Args:
+        categories (pandas.Index): The dictionary to translate from
+        target (pandas.Index): The dictionary to translate to
+    """
+    table = target.get_indexer(categories).astype(np.int32)
+    table[table < 0] = -2
+    return np.append(table, np.int32(-1))
+
+
+def union(categories, other):
+    """
+    Returns `categories` followed by the values of `other` it doesn't
+    contain, so that codes of `categories` remain valid.
+
+    Args:
+        categories (pandas.Index): The dictionary to extend
+        other (pandas.Index): The dictionary with values to add
+    """
+    return categories.append(other[~other.isin(categories)])
+
+
+def recode(codes, categories, target):
+    """
+    Translates codes of `categories` to codes of `target`, which must
+    contain all of their values.
+
+    Args:
+        codes (numpy.ndarray): The codes
+        categories (pandas.Index): The dictionary of the codes
+        target (pandas.Index): The dictionary to translate to
+    """
+    return code_table(categories, target)[codes]
+
+
+def transform(categories, values):
+    """
+    Returns the dictionary of a column whose values are `values[code]`, and
+    a table for grizzly_impl.lookup_codes mapping the column's codes to it.
+
+    Args:
+        categories (pandas.Index): The dictionary of the column
+        values (array-like): The new value of each category, e.g. the
+            lower-cased categories. Values can repeat
+
+    Returns:
+        A (numpy.ndarray<int32>, pandas.Index) tuple
+    """
+    codes, uniques = pd.factorize(np.asarray(values), sort=True)
+    return np.append(codes, -1).astype(np.int32), pd.Index(uniques)
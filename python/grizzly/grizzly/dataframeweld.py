@@ -1,9 +1,11 @@
 import numpy as np
 import pandas as pd
 
+import categories as dictionary
 import grizzly_impl
 from lazy_op import LazyOpResult, to_weld_type
 from weld.weldobject import *
+from strings import StringColumn
 from utils import *
 
 from groupbyweld import GroupByWeld
@@ -17,19 +19,52 @@ class DataFrameWeld:
         predicates (TYPE): Description
         unmaterialized_cols (TYPE): Description
         expr (TYPE): Description
+        compact_strings (bool): Whether string columns are stored as
+            StringColumns rather than fixed-width NumPy string arrays
+        dictionary_encode (bool): Whether string columns are
+            dictionary-encoded like Categoricals
+        categories (dict): Maps the names of dictionary-encoded columns,
+            whose raw column holds int32 codes, to their dictionaries
     """
 
-    def __init__(self, df, predicates=None, expr=None):
+    def __init__(self, df, predicates=None, expr=None, compact_strings=False,
+                 dictionary_encode=False):
         self.df = df
         self.unmaterialized_cols = dict()
         self.predicates = predicates
+        self.compact_strings = compact_strings
+        self.dictionary_encode = dictionary_encode
         self.raw_columns = dict()
+        self.categories = dict()
         for key in self.df:
-            raw_column = self.df[key].values
+            series = self.df[key]
+            if dictionary.is_dictionary_encoded(series) or (
+                    dictionary_encode and series.dtype.kind == 'O'):
+                # Weld operates on the codes; the dictionary is applied
+                # when results are decoded.
+                raw_column, self.categories[key] = dictionary.encode(series)
+            elif str(series.dtype) == 'category':
+                raw_column = np.asarray(series)
+            else:
+                raw_column = series.values
             if raw_column.dtype == object:
-                raw_column = np.array(self.df[key], dtype=str)
+                # The string columns built here are only read, so they're
+                # made read-only, which lets the encoder cache their
+                # encodings across evaluations.
+                if compact_strings:
+                    raw_column = StringColumn.from_values(raw_column)
+                    raw_column.offsets.setflags(write=False)
+                else:
+                    raw_column = np.array(self.df[key], dtype=str)
+                    raw_column.setflags(write=False)
             self.raw_columns[key] = raw_column
 
+    def _frame(self, df, predicates):
+        """Returns a DataFrameWeld with the same options as this one."""
+        return DataFrameWeld(df, predicates,
+                             compact_strings=self.compact_strings,
+                             dictionary_encode=self.dictionary_encode)
+
     def __getitem__(self, key):
         """Summary
 
@@ -46,16 +81,13 @@ class DataFrameWeld:
             # First check if key corresponds to an un-materialized column
             if key in self.unmaterialized_cols:
                 return self.unmaterialized_cols[key]
-            raw_column = self.df[key].values
-            dtype = str(raw_column.dtype)
-            # If column type is "object", then cast as "vec[char]" in Weld
-            if dtype == 'object':
-                raw_column = self.raw_columns[key]
-                weld_type = WeldVec(WeldChar())
-            else:
-                weld_type = grizzly_impl.numpy_to_weld_type_mapping[dtype]
+            # String columns are cast as "vec[char]" in Weld
+            raw_column = self.raw_columns[key]
+            weld_type = grizzly_impl.column_weld_type(raw_column)
+            categories = self.categories.get(key)
             if self.predicates is None:
-                return SeriesWeld(raw_column, weld_type, self, key)
+                return SeriesWeld(raw_column, weld_type, self, key,
+                                  categories=categories)
             return SeriesWeld(
                 grizzly_impl.filter(
                     raw_column,
@@ -64,16 +96,17 @@ class DataFrameWeld:
                 ),
                 weld_type,
                 self,
-                key
+                key,
+                categories=categories
             )
         elif isinstance(key, list):
             # For multi-key get, return type is a dataframe
-            return DataFrameWeld(self.df[key], self.predicates)
+            return self._frame(self.df[key], self.predicates)
         elif isinstance(key, SeriesWeld):
             # Can also apply predicate to a dataframe
             if self.predicates is not None:
-                return DataFrameWeld(self.df, key.per_element_and(self.predicates))
-            return DataFrameWeld(self.df, key)
+                return self._frame(self.df, key.per_element_and(self.predicates))
+            return self._frame(self.df, key)
         raise Exception("Invalid type in __getitem__")
 
     def __setitem__(self, key, value):
@@ -148,12 +181,7 @@ class DataFrameWeld:
         """
         tys = []
         for col_name, raw_column in self.raw_columns.items():
-            dtype = str(raw_column.dtype)
-            if dtype == 'object' or dtype == '|S64':
-                weld_type = WeldVec(WeldChar())
-            else:
-                weld_type = grizzly_impl.numpy_to_weld_type_mapping[dtype]
-            tys.append(weld_type)
+            tys.append(grizzly_impl.column_weld_type(raw_column))
 
         if len(tys) == 1:
             weld_type = tys[0]
@@ -171,18 +199,14 @@ class DataFrameWeld:
                 predicates
             ),
             self.raw_columns.keys(),
-            weld_type
+            weld_type,
+            categories=self.categories
         )
 
     def pivot_table(self, values, index, columns, aggfunc='sum'):
         tys = []
         for col_name, raw_column in self.raw_columns.items():
-            dtype = str(raw_column.dtype)
-            if dtype == 'object' or dtype == '|S64':
-                weld_type = WeldVec(WeldChar())
-            else:
-                weld_type = grizzly_impl.numpy_to_weld_type_mapping[dtype]
-            tys.append(weld_type)
+            tys.append(grizzly_impl.column_weld_type(raw_column))
 
         if len(tys) == 1:
             weld_type = tys[0]
@@ -194,7 +218,8 @@ class DataFrameWeld:
                 self.raw_columns.values(),
             ),
             self.raw_columns.keys(),
-            weld_type
+            weld_type,
+            categories=self.categories
         ).pivot_table(values, index, columns, aggfunc)
 
     def groupby(self, grouping_column_name):
@@ -222,7 +247,8 @@ class DataFrameWeld:
 
 class DataFrameWeldExpr:
     # TODO We need to merge this with the original DataFrameWeld class
-    def __init__(self, expr, column_names, weld_type, is_pivot=False):
+    def __init__(self, expr, column_names, weld_type, is_pivot=False,
+                 categories=None):
         if isinstance(weld_type, WeldStruct):
            self.column_types = weld_type.field_types
            self.weld_type = weld_type
@@ -233,6 +259,18 @@ class DataFrameWeldExpr:
         self.column_names = column_names
         self.colindex_map = {name:i for i, name in enumerate(column_names)}
         self.is_pivot = is_pivot
+        # Dictionaries of the dictionary-encoded columns, keyed on name
+        self.categories = {name: categories[name] for name in column_names
+                           if categories is not None and name in categories}
+
+    def _lookup_fields(self, tables):
+        """
+        Returns this expression with the fields in `tables` mapped through
+        them (see grizzly_impl.lookup_fields).
+        """
+        if len(tables) == 0:
+            return self.expr
+        return grizzly_impl.lookup_fields(self.expr, self.column_types, tables)
 
     def __setitem__(self, key, item):
         if self.is_pivot:
@@ -289,6 +327,40 @@ class DataFrameWeldExpr:
         keys_d1 = set(self.colindex_map.keys())
         keys_d2 = set(df2.colindex_map.keys())
         join_keys = keys_d1 & keys_d2
+
+        # Join keys have to be encoded the same way on both sides. Codes of
+        # df2 are translated to a dictionary extending self's, and a key
+        # encoded on one side only is compared as strings.
+        expr_d1 = self.expr
+        expr_d2 = df2.expr
+        categories = dict(df2.categories)
+        categories.update(self.categories)
+        column_types_d1 = list(self.column_types)
+        column_types_d2 = list(df2.column_types)
+        tables_d1 = {}
+        tables_d2 = {}
+        for key in join_keys:
+            i1 = self.colindex_map[key]
+            i2 = df2.colindex_map[key]
+            c1 = self.categories.get(key)
+            c2 = df2.categories.get(key)
+            if c1 is not None and c2 is not None:
+                if not c1.equals(c2):
+                    categories[key] = dictionary.union(c1, c2)
+                    tables_d2[i2] = dictionary.code_table(c2, categories[key])
+            elif c1 is not None:
+                tables_d1[i1] = dictionary.string_table(c1)
+                column_types_d1[i1] = WeldVec(WeldChar())
+                del categories[key]
+            elif c2 is not None:
+                tables_d2[i2] = dictionary.string_table(c2)
+                column_types_d2[i2] = WeldVec(WeldChar())
+                del categories[key]
+        if len(tables_d1) > 0:
+            expr_d1 = self._lookup_fields(tables_d1)
+        if len(tables_d2) > 0:
+            expr_d2 = df2._lookup_fields(tables_d2)
+
         key_index_d1 = [self.colindex_map[key] for key in join_keys]
         key_index_d2 = [df2.colindex_map[key] for key in join_keys]
         rest_keys_d1 = keys_d1.difference(join_keys)
@@ -302,7 +374,7 @@ class DataFrameWeldExpr:
 
         key_index_types = []
         for i in key_index_d1:
-            key_index_types.append(self.column_types[i])
+            key_index_types.append(column_types_d1[i])
 
         if len(key_index_types) > 1:
             join_keys_type = WeldStruct(key_index_types)
@@ -320,8 +392,8 @@ class DataFrameWeldExpr:
         new_types = key_index_types + rest_types_d1 + rest_types_d2
         return DataFrameWeldExpr(
             grizzly_impl.join(
-                self.expr,
-                df2.expr,
+                expr_d1,
+                expr_d2,
                 key_index_d1,
                 key_index_d2,
                 join_keys_type,
@@ -331,7 +403,8 @@ class DataFrameWeldExpr:
                 WeldStruct(rest_types_d2)
             ),
             new_column_names,
-            WeldStruct(new_types)
+            WeldStruct(new_types),
+            categories=categories
         )
 
     def pivot_table(self, values, index, columns, aggfunc='sum'):
@@ -339,18 +412,28 @@ class DataFrameWeldExpr:
         index_index = self.colindex_map[index]
         columns_index = self.colindex_map[columns]
 
-        ind_ty = to_weld_type(self.column_types[index_index], 1)
+        # The index and column names of pivot tables are looked up and
+        # compared with strings, so dictionary-encoded ones are decoded first.
+        column_types = list(self.column_types)
+        tables = {}
+        for i, name in [(index_index, index), (columns_index, columns)]:
+            if name in self.categories:
+                tables[i] = dictionary.string_table(self.categories[name])
+                column_types[i] = WeldVec(WeldChar())
+        expr = self._lookup_fields(tables)
+
+        ind_ty = to_weld_type(column_types[index_index], 1)
         piv_ty = to_weld_type(WeldDouble(), 2)
-        col_ty = to_weld_type(self.column_types[columns_index], 1)
+        col_ty = to_weld_type(column_types[columns_index], 1)
         return DataFrameWeldExpr(
             grizzly_impl.pivot_table(
-                self.expr,
+                expr,
                 value_index,
-                self.column_types[value_index],
+                column_types[value_index],
                 index_index,
-                self.column_types[index_index],
+                column_types[index_index],
                 columns_index,
-                self.column_types[columns_index],
+                column_types[columns_index],
                 aggfunc
             ),
             [index, columns, values],
@@ -418,18 +501,32 @@ class DataFrameWeldExpr:
         else:
             raise Expcetion("sort_values needs to be implemented for non pivot tables")
 
-    def evaluate(self, verbose=True, passes=None):
+    def evaluate(self, verbose=False, passes=None, strings=None):
         """Summary
 
+        Args:
+            verbose (bool, optional): Description
+            passes (list, optional): Description
+            strings (str, optional): Format of decoded string columns:
+                'object' (the default), 'fixed' or 'categorical' (see
+                LazyOpResult.evaluate). Pandas can't hold StringColumns, so
+                'column' isn't supported
+
         Returns:
             TYPE: Description
+
+        Raises:
+            ValueError: If strings is 'column'
         """
+        if strings == 'column':
+            raise ValueError("DataFrames can't hold StringColumns; decode "
+                             "strings as 'fixed' or 'categorical' instead")
         if self.is_pivot:
             index, pivot, columns = LazyOpResult(
                 self.expr,
                 self.weld_type,
                 0
-            ).evaluate(verbose=verbose, passes=passes)
+            ).evaluate(verbose=verbose, passes=passes, strings=strings)
             df_dict = {}
             for i, column_name in enumerate(columns):
                 df_dict[column_name] = pivot[i]
@@ -447,25 +544,32 @@ class DataFrameWeldExpr:
                 ),
                 WeldStruct(weldvec_type_list),
                 0
-            ).evaluate(verbose=verbose, passes=passes)
+            ).evaluate(verbose=verbose, passes=passes, strings=strings)
 
             for i, column_name in enumerate(self.column_names):
-                df[column_name] = columns[i]
+                if column_name in self.categories:
+                    df[column_name] = dictionary.decode(
+                        columns[i], self.categories[column_name])
+                else:
+                    df[column_name] = columns[i]
 
             return DataFrameWeld(df)
 
-    def get_column(self, column_name, column_type, index, verbose=True):
+    def get_column(self, column_name, column_type, index, verbose=False,
+                   strings=None):
         """Summary
 
         Args:
             column_name (TYPE): Description
             column_type (TYPE): Description
             index (TYPE): Description
+            strings (str, optional): Format of a decoded string column (see
+                LazyOpResult.evaluate)
 
         Returns:
             TYPE: Description
         """
-        return LazyOpResult(
+        column = LazyOpResult(
             grizzly_impl.get_column(
                 self.expr,
                 self.weld_type,
@@ -473,7 +577,10 @@ class DataFrameWeldExpr:
             ),
             column_type,
             1
-        ).evaluate(verbose=verbose)
+        ).evaluate(verbose=verbose, strings=strings)
+        if column_name in self.categories:
+            return dictionary.decode(column, self.categories[column_name])
+        return column
 
 class DataFrameWeldLoc:
     """
@@ -5,12 +5,18 @@ Attributes:
 """
 
 from weld.weldobject import *
+from weld.session import get_session
 import numpy as np
+import pandas as pd
 import os
 import sys
+import threading
+import weakref
 
 import pkg_resources
 
+from strings import StringColumn
+
 numpy_to_weld_type_mapping = {
     'str': WeldVec(WeldChar()),
     'int16': WeldInt16(),
@@ -21,6 +27,22 @@ numpy_to_weld_type_mapping = {
     'bool': WeldBit()
 }
 
+# Formats NumPyDecoder can decode vectors of strings to
+string_formats = ('object', 'fixed', 'column', 'categorical')
+
+
+def column_weld_type(column):
+    """
+    Returns the Weld type of the elements of a column: a NumPy array, or a
+    StringColumn.
+
+    Args:
+        column (numpy.ndarray / StringColumn): The column
+    """
+    if isinstance(column, StringColumn) or column.dtype.kind in 'OSU':
+        return WeldVec(WeldChar())
+    return numpy_to_weld_type_mapping[str(column.dtype)]
+
 
 def to_shared_lib(name):
     """
@@ -37,19 +59,175 @@ def to_shared_lib(name):
         sys.exit(1)
 
 
+def _is_frozen(obj):
+    """
+    Returns whether the contents of an array can't change through NumPy,
+    i.e. neither it nor any array it views is writeable. For a StringColumn,
+    this is whether its offsets can't change.
+
+    Args:
+        obj (numpy.ndarray / StringColumn): The array
+    """
+    if isinstance(obj, StringColumn):
+        obj = obj.offsets
+    while isinstance(obj, np.ndarray):
+        if obj.flags.writeable:
+            return False
+        obj = obj.base
+    return True
+
+
+def _copies_data(obj):
+    """
+    Returns whether encoding an array copies (or reads) its contents, rather
+    than only pointing to them. This mirrors the checks in
+    numpy_weld_convertor.cpp: string arrays are scanned for their lengths,
+    the rows of string columns are read from their offsets, and 2-D arrays
+    whose rows aren't contiguous are copied into a new buffer.
+
+    Args:
+        obj (numpy.ndarray / StringColumn): The array
+    """
+    if isinstance(obj, StringColumn) or (
+            str(obj.dtype) not in numpy_to_weld_type_mapping):
+        return True
+    return obj.ndim == 2 and obj.strides[1] != obj.itemsize
+
+
+class _EncodedRows(object):
+    """
+    Owns the memory allocated to encode a 2-D array or a column of strings:
+    the table of its rows and, if the elements were copied into row-major
+    order, the copy. It is attached to the encoded value, and frees the
+    memory when the value (and any cache entry holding it) is garbage
+    collected.
+    """
+
+    def __init__(self, free, weld_vec, copied):
+        self.free = free
+        # Addresses, so that this doesn't reference the encoded value.
+        self.pointers = [ctypes.cast(weld_vec.ptr, c_void_p).value]
+        if copied:
+            self.pointers.append(ctypes.cast(weld_vec.ptr[0].ptr, c_void_p).value)
+
+    def __del__(self):
+        for ptr in self.pointers:
+            self.free(ptr)
+
+
+def _copies_rows(obj):
+    """
+    Returns whether encoding an array copies its elements into a new
+    row-major buffer, as numpy_to_weld_arr_arr does for 2-D arrays whose rows
+    aren't contiguous.
+
+    Args:
+        obj (numpy.ndarray): The array
+    """
+    return (obj.ndim == 2 and len(obj) > 0 and
+            str(obj.dtype) in numpy_to_weld_type_mapping and
+            obj.strides[1] != obj.itemsize)
+
+
+def _resolve_threads(num_threads):
+    """
+    Returns the number of threads the convertor should use for 2-D arrays:
+    `num_threads` if it is set, and otherwise the current session's.
+    """
+    if num_threads is None:
+        return get_session().num_threads
+    return num_threads
+
+
 class NumPyEncoder(WeldObjectEncoder):
     """Summary
 
+    Encodings of 2-D arrays, string arrays and StringColumns take time
+    linear in the number of rows, so they are cached, keyed on the array's
+    identity, buffer address, shape, strides and dtype. Entries are dropped when their array
+    is garbage collected. Encodings which depend on the array's contents
+    (see _copies_data) are only cached while the array is read-only, e.g.
+    after arr.setflags(write=False); call `invalidate` after changing such
+    an array through other means.
+
+    2-D arrays are encoded on `num_threads` threads; if it is None, the
+    current session's thread count is used.
+
     Attributes:
         utils (TYPE): Description
+        num_threads (int): Threads used to encode 2-D arrays, or None
     """
 
-    def __init__(self):
+    def __init__(self, num_threads=None):
         """Summary
         """
         lib = to_shared_lib("numpy_weld_convertor")
         lib_file = pkg_resources.resource_filename(__name__, lib)
         self.utils = ctypes.PyDLL(lib_file)
+        self.utils.free_encoded.argtypes = [c_void_p]
+        self.utils.free_encoded.restype = None
+        self.num_threads = num_threads
+        # Maps array key -> (weakref to the array, encoded value, whether the
+        # encoding depends on the array's contents)
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(obj):
+        if isinstance(obj, StringColumn):
+            return ((id(obj),) + NumPyEncoder._cache_key(obj.data)[1:] +
+                    NumPyEncoder._cache_key(obj.offsets)[1:])
+        interface = obj.__array_interface__
+        return (id(obj), interface["data"][0], obj.shape, obj.strides,
+                obj.dtype.str)
+
+    def _cached_encoding(self, obj):
+        """
+        Returns the cached encoding of obj, or None if there is none or it
+        is out of date.
+        """
+        key = NumPyEncoder._cache_key(obj)
+        with self._lock:
+            entry = self._encoded.get(key)
+            if entry is None:
+                return None
+            ref, weld_vec, copies_data = entry
+            if ref() is obj and (not copies_data or _is_frozen(obj)):
+                return weld_vec
+            del self._encoded[key]
+            return None
+
+    def _cache_encoding(self, obj, weld_vec):
+        copies_data = _copies_data(obj)
+        if copies_data and not _is_frozen(obj):
+            return
+        key = NumPyEncoder._cache_key(obj)
+        encoded = self._encoded
+
+        # This runs whenever the array is collected, possibly while this
+        # thread already holds the lock, so it doesn't take it.
+        def remove(ref):
+            encoded.pop(key, None)
+
+        try:
+            ref = weakref.ref(obj, remove)
+        except TypeError:
+            return
+        with self._lock:
+            encoded[key] = (ref, weld_vec, copies_data)
+
+    def invalidate(self, obj=None):
+        """Drops the cached encoding of an array, or of all arrays.
+
+        Args:
+            obj (numpy.ndarray, optional): The array; if None, the whole cache
+                is cleared
+        """
+        with self._lock:
+            if obj is None:
+                self._encoded.clear()
+            else:
+                self._encoded.pop(NumPyEncoder._cache_key(obj), None)
 
     def py_to_weld_type(self, obj):
         """Summary
@@ -81,6 +259,8 @@ class NumPyEncoder(WeldObjectEncoder):
                 base = WeldVec(WeldChar())  # TODO: Fix this
             for i in xrange(obj.ndim):
                 base = WeldVec(base)
+        elif isinstance(obj, StringColumn):
+            base = WeldVec(WeldVec(WeldChar()))
         elif isinstance(obj, str):
             base = WeldVec(WeldChar())
         else:
@@ -96,6 +276,27 @@ class NumPyEncoder(WeldObjectEncoder):
         Returns:
             Weld formatted object
         """
+        cached = isinstance(obj, StringColumn) or (
+            isinstance(obj, np.ndarray) and (
+                obj.ndim == 2 or
+                str(obj.dtype) not in numpy_to_weld_type_mapping))
+        if cached:
+            weld_vec = self._cached_encoding(obj)
+            if weld_vec is not None:
+                return weld_vec
+
+        if isinstance(obj, StringColumn):
+            # The rows point into the column's buffer, so nothing is copied.
+            numpy_to_weld = self.utils.numpy_to_weld_string_column
+            numpy_to_weld.restype = self.py_to_weld_type(obj).ctype_class
+            numpy_to_weld.argtypes = [py_object, py_object, c_int]
+            weld_vec = numpy_to_weld(obj.data, obj.offsets,
+                                     _resolve_threads(self.num_threads))
+            weld_vec._rows = _EncodedRows(self.utils.free_encoded, weld_vec,
+                                          False)
+            self._cache_encoding(obj, weld_vec)
+            return weld_vec
+
         if isinstance(obj, np.ndarray):
             if obj.ndim == 1 and obj.dtype == 'int16':
                 numpy_to_weld = self.utils.numpy_to_weld_int16_arr
@@ -129,26 +330,58 @@ class NumPyEncoder(WeldObjectEncoder):
             raise Exception("Unable to encode; invalid object type")
 
         numpy_to_weld.restype = self.py_to_weld_type(obj).ctype_class
-        numpy_to_weld.argtypes = [py_object]
-        weld_vec = numpy_to_weld(obj)
+        if isinstance(obj, np.ndarray) and obj.ndim == 2:
+            numpy_to_weld.argtypes = [py_object, c_int]
+            weld_vec = numpy_to_weld(obj, _resolve_threads(self.num_threads))
+        else:
+            numpy_to_weld.argtypes = [py_object]
+            weld_vec = numpy_to_weld(obj)
+        if cached:
+            # Vectors of vectors have a row table allocated by the convertor.
+            weld_vec._rows = _EncodedRows(self.utils.free_encoded, weld_vec,
+                                          _copies_rows(obj))
+            self._cache_encoding(obj, weld_vec)
         return weld_vec
 
 
 class NumPyDecoder(WeldObjectDecoder):
     """Summary
 
+    2-D arrays are copied out of Weld's memory on `num_threads` threads; if
+    it is None, the current session's thread count is used.
+
+    Vectors of strings are decoded according to `strings`:
+
+    - 'object': a NumPy array of Python strings.
+    - 'fixed': a NumPy `S` array, padded to the longest string.
+    - 'column': a StringColumn.
+    - 'categorical': a pandas Categorical of the distinct strings.
+
+    All but 'object' are filled with bulk copies, rather than by creating a
+    Python object per row. Like NumPy's `S` arrays, 'fixed' and
+    'categorical' drop trailing null bytes.
+
     Attributes:
         utils (TYPE): Description
+        num_threads (int): Threads used to decode 2-D arrays, or None
+        strings (str): Format of decoded vectors of strings
     """
 
-    def __init__(self):
+    tracks_ownership = True
+
+    def __init__(self, num_threads=None, strings='object'):
         """Summary
         """
+        if strings not in string_formats:
+            raise ValueError("Unknown string format {!r}; expected one of "
+                             "{}".format(strings, ", ".join(string_formats)))
         lib = to_shared_lib("numpy_weld_convertor")
         lib_file = pkg_resources.resource_filename(__name__, lib)
         self.utils = ctypes.PyDLL(lib_file)
+        self.num_threads = num_threads
+        self.strings = strings
 
-    def decode(self, obj, restype, raw_ptr=False):
+    def decode(self, obj, restype, raw_ptr=False, owner=None):
         """Converts Weld object to Python object.
 
         Args:
@@ -156,6 +389,8 @@ class NumPyDecoder(WeldObjectDecoder):
             restype: Type of Weld computation result
             raw_ptr: Boolean indicating whether obj needs to be extracted
                      from WeldValue or not
+            owner: WeldValueOwner of the memory obj points to. One-dimensional
+                   arrays are decoded without copying, and keep it alive
 
         Returns:
             Python object representing result of the Weld computation
@@ -206,6 +441,25 @@ class NumPyDecoder(WeldObjectDecoder):
         elif restype == WeldVec(WeldDouble()):
             weld_to_numpy = self.utils.weld_to_numpy_double_arr
         elif restype == WeldVec(WeldVec(WeldChar())):
+            if self.strings == 'column':
+                weld_to_numpy = self.utils.weld_to_numpy_string_column
+                weld_to_numpy.restype = py_object
+                weld_to_numpy.argtypes = [restype.ctype_class, c_int]
+                data, offsets = weld_to_numpy(
+                    result, _resolve_threads(self.num_threads))
+                return StringColumn(data, offsets)
+            elif self.strings in ('fixed', 'categorical'):
+                weld_to_numpy = self.utils.weld_to_numpy_fixed_width_strings
+                weld_to_numpy.restype = py_object
+                weld_to_numpy.argtypes = [restype.ctype_class, c_int]
+                padded = weld_to_numpy(
+                    result, _resolve_threads(self.num_threads))
+                strings = padded.view('S%d' % padded.shape[1]).reshape(
+                    len(padded))
+                if self.strings == 'fixed':
+                    return strings
+                categories, codes = np.unique(strings, return_inverse=True)
+                return pd.Categorical.from_codes(codes, categories)
             weld_to_numpy = self.utils.weld_to_numpy_char_arr_arr
         elif restype == WeldVec(WeldVec(WeldInt16())):
             weld_to_numpy = self.utils.weld_to_numpy_int16_arr_arr
@@ -224,7 +478,8 @@ class NumPyDecoder(WeldObjectDecoder):
             # Iterate through all fields in the struct, and recursively call
             # decode.
             for field_type in restype.field_types:
-                ret_vec = self.decode(data, field_type, raw_ptr=True)
+                ret_vec = self.decode(data, field_type, raw_ptr=True,
+                                      owner=owner)
                 data += sizeof(field_type.ctype_class())
                 ret_vecs.append(ret_vec)
             return tuple(ret_vecs)
@@ -232,7 +487,15 @@ class NumPyDecoder(WeldObjectDecoder):
             raise Exception("Unable to decode; invalid return type")
 
         weld_to_numpy.restype = py_object
-        weld_to_numpy.argtypes = [restype.ctype_class]
-
-        ret_vec = weld_to_numpy(result)
+        if restype == WeldVec(WeldVec(WeldChar())):
+            weld_to_numpy.argtypes = [restype.ctype_class]
+            ret_vec = weld_to_numpy(result)
+        elif isinstance(restype.elemType, WeldVec):
+            # 2-D arrays are copied into a new array.
+            weld_to_numpy.argtypes = [restype.ctype_class, c_int]
+            ret_vec = weld_to_numpy(result, _resolve_threads(self.num_threads))
+        else:
+            # One-dimensional arrays view Weld's memory directly.
+            weld_to_numpy.argtypes = [restype.ctype_class, py_object]
+            ret_vec = weld_to_numpy(result, owner)
         return ret_vec
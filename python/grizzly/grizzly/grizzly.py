@@ -2,6 +2,7 @@ from utils import *
 from seriesweld import SeriesWeld
 from dataframeweld import DataFrameWeld
 from groupbyweld import GroupByWeld
+from strings import StringColumn
 
 
 
@@ -5,12 +5,43 @@ Attributes:
     encoder_ (NumPyDecoder): Description
 """
 from encoders import *
+from weld import ir
 from weld.weldobject import *
 
 
 encoder_ = NumPyEncoder()
 decoder_ = NumPyDecoder()
 
+
+def _scalar(value):
+    """Returns a Weld literal for a Python scalar, to be cast as needed."""
+    if isinstance(value, (bool, np.bool_)):
+        return ir.literal(value, WeldBit())
+    if isinstance(value, (int, long, np.integer)):
+        return ir.literal(value, WeldLong())
+    return ir.literal(value, WeldDouble())
+
+
+def _filter_vec(array, predicates):
+    """Returns the elements of array whose predicate is true."""
+    return ir.result(ir.for_(
+        ir.zip_(array, predicates),
+        ir.appender(),
+        ir.lambda_([("b", None), ("i", None), ("e", None)],
+                   ir.if_(ir.field("e", 1), ir.merge("b", ir.field("e", 0)), "b"))))
+
+
+def _lookup_code(table, code):
+    """
+    Returns the entry of table for a code, or its last entry if the code is
+    negative (missing).
+    """
+    index = ir.if_(ir.binop(">=", code, ir.literal(0, WeldInt())),
+                   ir.cast(WeldLong(), code),
+                   ir.binop("-", ir.len_(table), ir.literal(1, WeldLong())))
+    return ir.lookup(table, index)
+
+
 def get_field(expr, field):
     """ Fetch a field from a struct expr
 
@@ -22,12 +53,7 @@ def get_field(expr, field):
         struct_var = expr.obj_id
         weld_obj.dependencies[struct_var] = expr
 
-    weld_template = """
-      %(struct)s.$%(field)s
-    """
-
-    weld_obj.weld_code = weld_template % {"struct":struct_var,
-                                          "field":field}
+    weld_obj.weld_code = ir.field(struct_var, field)
     return weld_obj
 
 def unique(array, ty):
@@ -48,24 +74,79 @@ def unique(array, ty):
         array_var = array.obj_id
         weld_obj.dependencies[array_var] = array
 
-    weld_template = """
-       map(
-         tovec(
-           result(
-             for(
-               map(
-                 %(array)s,
-                 |p: %(ty)s| {p,0}
-               ),
-               dictmerger[%(ty)s,i32,+],
-               |b, i, e| merge(b,e)
-             )
-           )
-         ),
-         |p: {%(ty)s, i32}| p.$0
-       )
+    counts = ir.result(ir.for_(
+        ir.map_(array_var,
+                ir.lambda_([("p", ty)], ir.struct("p", ir.literal(0, WeldInt())))),
+        ir.dictmerger(ty, WeldInt(), "+"),
+        ir.lambda_([("b", None), ("i", None), ("e", None)], ir.merge("b", "e"))))
+    weld_obj.weld_code = ir.map_(
+        ir.tovec(counts),
+        ir.lambda_([("p", "{%s, i32}" % ty)], ir.field("p", 0)))
+    return weld_obj
+
+
+def lookup_codes(codes, table):
+    """
+    Maps each code of a dictionary-encoded column to an entry of `table`.
+    Missing values (negative codes) map to the last entry of the table.
+
+    Args:
+        codes (WeldObject / Numpy.ndarray<int32>): Input codes
+        table (WeldObject / Numpy.ndarray): Value of each code, followed by
+            the value for missing values
+
+    Returns:
+        A WeldObject representing this computation
+    """
+    weld_obj = WeldObject(encoder_, decoder_)
+
+    codes_var = weld_obj.update(codes)
+    if isinstance(codes, WeldObject):
+        codes_var = codes.obj_id
+        weld_obj.dependencies[codes_var] = codes
+
+    table_var = weld_obj.update(table)
+    if isinstance(table, WeldObject):
+        table_var = table.obj_id
+        weld_obj.dependencies[table_var] = table
+
+    weld_obj.weld_code = ir.map_(
+        codes_var,
+        ir.lambda_([("c", WeldInt())], _lookup_code(table_var, "c")))
+    return weld_obj
+
+
+def lookup_fields(expr, column_types, tables):
+    """
+    Maps fields of each struct in a vector of structs through lookup tables,
+    like lookup_codes. Other fields are kept as is.
+
+    Args:
+        expr (WeldObject / Numpy.ndarray): Input vector of structs
+        column_types (list): Weld types of the fields
+        tables (dict): Maps field indices to the tables of lookup_codes
+
+    Returns:
+        A WeldObject representing this computation
     """
-    weld_obj.weld_code = weld_template % {"array": array_var, "ty": ty}
+    weld_obj = WeldObject(encoder_, decoder_)
+
+    expr_var = weld_obj.update(expr)
+    if isinstance(expr, WeldObject):
+        expr_var = expr.obj_id
+        weld_obj.dependencies[expr_var] = expr
+
+    fields = []
+    for i in xrange(len(column_types)):
+        if i in tables:
+            table_var = weld_obj.update(tables[i])
+            fields.append(_lookup_code(table_var, ir.field("e", i)))
+        else:
+            fields.append(ir.field("e", i))
+
+    weld_obj.weld_code = ir.map_(
+        expr_var,
+        ir.lambda_([("e", WeldStruct(column_types))], ir.struct(*fields)))
     return weld_obj
 
 
@@ -89,17 +170,10 @@ def aggr(array, op, initial_value, ty):
         array_var = array.obj_id
         weld_obj.dependencies[array_var] = array
 
-    weld_template = """
-      result(
-        for(
-          %(array)s,
-          merger[%(ty)s,%(op)s],
-          |b, i, e| merge(b, e)
-        )
-      )
-    """
-    weld_obj.weld_code = weld_template % {
-        "array": array_var, "ty": ty, "op": op}
+    weld_obj.weld_code = ir.result(ir.for_(
+        array_var,
+        ir.merger(ty, op),
+        ir.lambda_([("b", None), ("i", None), ("e", None)], ir.merge("b", "e"))))
     return weld_obj
 
 
@@ -135,20 +209,12 @@ def mask(array, predicates, new_value, ty):
             new_value_var = new_value.obj_id
             weld_obj.dependencies[new_value_var] = new_value
     else:
-        new_value_var = "%s(%s)" % (ty, str(new_value))
-
-    weld_template = """
-       map(
-         zip(%(array)s, %(predicates)s),
-         |p: {%(ty)s, bool}| if (p.$1, %(new_value)s, p.$0)
-       )
-    """
-    weld_obj.weld_code = weld_template % {
-        "array": array_var,
-        "predicates": predicates_var,
-        "new_value": new_value_var,
-        "ty": ty}
+        new_value_var = ir.cast(ty, _scalar(new_value))
 
+    weld_obj.weld_code = ir.map_(
+        ir.zip_(array_var, predicates_var),
+        ir.lambda_([("p", "{%s, bool}" % ty)],
+                   ir.if_(ir.field("p", 1), new_value_var, ir.field("p", 0))))
     return weld_obj
 
 
@@ -177,19 +243,7 @@ def filter(array, predicates, ty=None):
         predicates_var = predicates.obj_id
         weld_obj.dependencies[predicates_var] = predicates
 
-    weld_template = """
-       result(
-         for(
-           zip(%(array)s, %(predicates)s),
-           appender,
-           |b, i, e| if (e.$1, merge(b, e.$0), b)
-         )
-       )
-    """
-    weld_obj.weld_code = weld_template % {
-        "array": array_var,
-        "predicates": predicates_var}
-
+    weld_obj.weld_code = _filter_vec(array_var, predicates_var)
     return weld_obj
 
 def pivot_filter(pivot_array, predicates, ty=None):
@@ -217,33 +271,15 @@ def pivot_filter(pivot_array, predicates, ty=None):
         predicates_var = predicates.obj_id
         weld_obj.dependencies[predicates_var] = predicates
 
-    weld_template = """
-    let index_filtered =
-      result(
-        for(
-          zip(%(array)s.$0, %(predicates)s),
-          appender,
-          |b, i, e| if (e.$1, merge(b, e.$0), b)
-        )
-      );
-    let pivot_filtered =
-      map(
-        %(array)s.$1,
-        |x|
-          result(
-            for(
-              zip(x, %(predicates)s),
-              appender,
-              |b, i, e| if (e.$1, merge(b, e.$0), b)
-            )
-          )
-      );
-    {index_filtered, pivot_filtered, %(array)s.$2}
-    """
-    weld_obj.weld_code = weld_template % {
-        "array": pivot_array_var,
-        "predicates": predicates_var}
-
+    weld_obj.weld_code = ir.let(
+        "index_filtered",
+        _filter_vec(ir.field(pivot_array_var, 0), predicates_var),
+        ir.let(
+            "pivot_filtered",
+            ir.map_(ir.field(pivot_array_var, 1),
+                    ir.lambda_([("x", None)], _filter_vec("x", predicates_var))),
+            ir.struct("index_filtered", "pivot_filtered",
+                      ir.field(pivot_array_var, 2))))
     return weld_obj
 
 def isin(array, predicates, ty):
@@ -270,28 +306,15 @@ def isin(array, predicates, ty):
     if isinstance(predicates, WeldObject):
         predicates_var = predicates.obj_id
         weld_obj.dependencies[predicates_var] = predicates
-    weld_template = """
-    let check_dict =
-      result(
-        for(
-          map(
-            %(predicate)s,
-            |p: %(ty)s| {p,0}
-          ),
-        dictmerger[%(ty)s,i32,+],
-        |b, i, e| merge(b,e)
-        )
-      );
-      map(
-        %(array)s,
-        |x: %(ty)s| keyexists(check_dict, x)
-      )
-    """
-    weld_obj.weld_code = weld_template % {
-        "array": array_var,
-        "predicate": predicates_var,
-        "ty": ty}
-
+    check_dict = ir.result(ir.for_(
+        ir.map_(predicates_var,
+                ir.lambda_([("p", ty)], ir.struct("p", ir.literal(0, WeldInt())))),
+        ir.dictmerger(ty, WeldInt(), "+"),
+        ir.lambda_([("b", None), ("i", None), ("e", None)], ir.merge("b", "e"))))
+    weld_obj.weld_code = ir.let(
+        "check_dict", check_dict,
+        ir.map_(array_var,
+                ir.lambda_([("x", ty)], ir.keyexists("check_dict", "x"))))
     return weld_obj
 
 
@@ -320,16 +343,10 @@ def element_wise_op(array, other, op, ty):
         other_var = other.obj_id
         weld_obj.dependencies[other_var] = other
 
-    weld_template = """
-       map(
-         zip(%(array)s, %(other)s),
-         |a| a.$0 %(op)s a.$1
-       )
-    """
-
-    weld_obj.weld_code = weld_template % {"array": array_var,
-                                          "other": other_var,
-                                          "ty": ty, "op": op}
+    weld_obj.weld_code = ir.map_(
+        ir.zip_(array_var, other_var),
+        ir.lambda_([("a", None)],
+                   ir.binop(op, ir.field("a", 0), ir.field("a", 1))))
     return weld_obj
 
 def unzip_columns(expr, column_types):
@@ -343,34 +360,26 @@ def unzip_columns(expr, column_types):
         A WeldObject representing this computation
     """
     weld_obj = WeldObject(encoder_, decoder_)
-    column_appenders = []
-    struct_fields = []
-    result_fields = []
-    for i, column_type in enumerate(column_types):
-        column_appenders.append("appender[%s]" % column_type)
-        struct_fields.append("merge(b.$%s, e.$%s)" % (i, i))
-        result_fields.append("result(unzip_builder.$%s)" % i)
-    appender_string = "{%s}" % ", ".join(column_appenders)
-    struct_string = "{%s}" % ", ".join(struct_fields)
-    result_string = "{%s}" % ", ".join(result_fields)
     expr_var = weld_obj.update(expr)
     if isinstance(expr, WeldObject):
         expr_var = expr.obj_id
         weld_obj.dependencies[expr_var] = expr
 
-    weld_template = """
-    let unzip_builder = for(
-      %(expr)s,
-      %(appenders)s,
-      |b,i,e| %(struct_builder)s
-    );
-    %(result)s
-    """
-
-    weld_obj.weld_code = weld_template % {"expr": expr_var,
-                                          "appenders": appender_string,
-                                          "struct_builder": struct_string,
-                                          "result": result_string}
+    appenders = []
+    merges = []
+    results = []
+    for i, column_type in enumerate(column_types):
+        appenders.append(ir.appender(column_type))
+        merges.append(ir.merge(ir.field("b", i), ir.field("e", i)))
+        results.append(ir.result(ir.field("unzip_builder", i)))
+
+    weld_obj.weld_code = ir.let(
+        "unzip_builder",
+        ir.for_(expr_var,
+                ir.struct(*appenders),
+                ir.lambda_([("b", None), ("i", None), ("e", None)],
+                           ir.struct(*merges))),
+        ir.struct(*results))
     return weld_obj
 
 def sort(expr, field = None, keytype=None, ascending=True):
@@ -392,18 +401,15 @@ def sort(expr, field = None, keytype=None, ascending=True):
         weld_obj.dependencies[expr_var] = expr
 
     if field is not None:
-        key_str = "x.$%s" % field
+        key = ir.field("x", field)
     else:
-        key_str = "x"
+        key = ir.ident("x")
 
     if not ascending:
         # The type is not necessarily f64.
-        key_str = key_str + "* %s(-1)" % keytype
+        key = ir.binop("*", key, ir.cast(keytype, ir.literal(-1, WeldInt())))
 
-    weld_template = """
-    sort(%(expr)s, |x| %(key)s)
-    """
-    weld_obj.weld_code = weld_template % {"expr":expr_var, "key":key_str}
+    weld_obj.weld_code = ir.sort(expr_var, ir.lambda_([("x", None)], key))
     return weld_obj
 
 def slice_vec(expr, start, stop):
@@ -422,12 +428,9 @@ def slice_vec(expr, start, stop):
         expr_var = expr.obj_id
         weld_obj.dependencies[expr_var] = expr
 
-    weld_template = """
-    slice(%(expr)s, %(start)sL, %(stop)sL)
-    """
-    weld_obj.weld_code = weld_template % {"expr":expr_var,
-                                          "start":start,
-                                          "stop":stop}
+    weld_obj.weld_code = ir.slice_(expr_var,
+                                   ir.literal(start, WeldLong()),
+                                   ir.literal(stop, WeldLong()))
     return weld_obj
 
 def zip_columns(columns):
@@ -449,20 +452,10 @@ def zip_columns(columns):
             weld_obj.dependencies[col_var] = column
         column_vars.append(col_var)
 
-    arrays = ", ".join(column_vars)
-
-    weld_template = """
-       result(
-         for(
-           zip(%(array)s),
-           appender,
-           |b, i, e| merge(b, e)
-         )
-       )
-    """
-    weld_obj.weld_code = weld_template % {
-        "array": arrays,
-    }
+    weld_obj.weld_code = ir.result(ir.for_(
+        ir.zip_(*column_vars),
+        ir.appender(),
+        ir.lambda_([("b", None), ("i", None), ("e", None)], ir.merge("b", "e"))))
 
     return weld_obj
 
@@ -495,17 +488,11 @@ def compare(array, other, op, ty_str):
             other_var = tmp.obj_id
             weld_obj.dependencies[other_var] = other
     else:
-        other_var = "%s(%s)" % (ty_str, str(other))
+        other_var = ir.cast(ty_str, _scalar(other))
 
-    weld_template = """
-       map(
-         %(array)s,
-         |a: %(ty)s| a %(op)s %(other)s
-       )
-    """
-    weld_obj.weld_code = weld_template % {"array": array_var,
-                                          "other": other_var,
-                                          "op": op, "ty": ty_str}
+    weld_obj.weld_code = ir.map_(
+        array_var,
+        ir.lambda_([("a", ty_str)], ir.binop(op, "a", other_var)))
 
     return weld_obj
 
@@ -531,14 +518,11 @@ def slice(array, start, size, ty):
         array_var = array.obj_id
         weld_obj.dependencies[array_var] = array
 
-    weld_template = """
-       map(
-         %(array)s,
-         |array: %(ty)s| slice(array, %(start)dL, %(size)dL)
-       )
-    """
-    weld_obj.weld_code = weld_template % {"array": array_var, "start": start,
-                                          "ty": ty, "size": size}
+    weld_obj.weld_code = ir.map_(
+        array_var,
+        ir.lambda_([("array", ty)],
+                   ir.slice_("array", ir.literal(start, WeldLong()),
+                             ir.literal(size, WeldLong()))))
 
     return weld_obj
 
@@ -562,13 +546,14 @@ def to_lower(array, ty):
         array_var = array.obj_id
         weld_obj.dependencies[array_var] = array
 
-    weld_template = """
-       map(
-         %(array)s,
-         |array: vec[i8]| map(array, |b:i8| if(b <= i8(90), b + i8(32), b))
-       )
-    """
-    weld_obj.weld_code = weld_template % {"array": array_var, "ty": ty}
+    def i8(value):
+        return ir.cast(WeldChar(), ir.literal(value, WeldInt()))
+
+    lower = ir.if_(ir.binop("<=", "b", i8(90)), ir.binop("+", "b", i8(32)), "b")
+    weld_obj.weld_code = ir.map_(
+        array_var,
+        ir.lambda_([("array", WeldVec(WeldChar()))],
+                   ir.map_("array", ir.lambda_([("b", WeldChar())], lower))))
 
     return weld_obj
 
@@ -645,11 +630,7 @@ def count(array, ty):
         array_var = array.obj_id
         weld_obj.dependencies[array_var] = array
 
-    weld_template = """
-     len(%(array)s)
-  """
-
-    weld_obj.weld_code = weld_template % {"array": array_var}
+    weld_obj.weld_code = ir.len_(array_var)
 
     return weld_obj
 
@@ -1433,18 +1414,19 @@ def grouped_slice(expr, type, start, size):
           A WeldObject representing this computation
     """
     weld_obj = WeldObject(encoder_, decoder_)
-    weld_obj.update(expr)
-    weld_template = """
-       map(
-           %(vec)s,
-           |b: %(type)s| {b.$0, slice(b.$1, i64(%(start)s), i64(%(size)s))}
-         )
-    """
 
-    weld_obj.weld_code = weld_template % {"vec": expr.weld_code,
-                                          "type": type,
-                                          "start": str(start),
-                                          "size": str(size)}
+    expr_var = weld_obj.update(expr)
+    if isinstance(expr, WeldObject):
+        expr_var = expr.obj_id
+        weld_obj.dependencies[expr_var] = expr
+
+    weld_obj.weld_code = ir.map_(
+        expr_var,
+        ir.lambda_([("b", type)],
+                   ir.struct(ir.field("b", 0),
+                             ir.slice_(ir.field("b", 1),
+                                       ir.literal(start, WeldLong()),
+                                       ir.literal(size, WeldLong())))))
     return weld_obj
 
 
@@ -1467,14 +1449,7 @@ def get_column(columns, column_tys, index):
         columns_var = columns.obj_id
         weld_obj.dependencies[columns_var] = columns
 
-    weld_template = """
-     map(
-       %(columns)s,
-       |elem: %(ty)s| elem.$%(index)s
-     )
-  """
-
-    weld_obj.weld_code = weld_template % {"columns": columns_var,
-                                          "ty": column_tys,
-                                          "index": index}
+    weld_obj.weld_code = ir.map_(
+        columns_var,
+        ir.lambda_([("elem", column_tys)], ir.field("elem", index)))
     return weld_obj
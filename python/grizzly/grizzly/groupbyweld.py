@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
 
+import categories as dictionary
 import grizzly_impl
 from lazy_op import LazyOpResult, to_weld_type
 from weld.weldobject import *
@@ -19,6 +20,8 @@ class GroupByWeld:
         grouping_column (TYPE): Description
         grouping_column_name (TYPE): Description
         grouping_column_type (TYPE): Description
+        categories (dict): Dictionaries of the dictionary-encoded columns,
+            which are grouped on their codes
     """
 
     def __init__(self, df, grouping_column_names):
@@ -32,11 +35,14 @@ class GroupByWeld:
         self.df = df
         self.grouping_columns = []
         self.grouping_column_types = []
+        self.categories = dict()
 
         if isinstance(grouping_column_names, str):
             grouping_column_names = [grouping_column_names]
         for column_name in grouping_column_names:
             column = df[column_name]
+            if getattr(column, 'categories', None) is not None:
+                self.categories[column_name] = column.categories
             if isinstance(column, LazyOpResult):
                 self.grouping_column_types.append(column.weld_type)
                 self.grouping_columns.append(column.expr)
@@ -57,6 +63,8 @@ class GroupByWeld:
         for column_name in self.column_names:
             column = df[column_name]
             column_type = None
+            if getattr(column, 'categories', None) is not None:
+                self.categories[column_name] = column.categories
             if isinstance(column, LazyOpResult):
                 column_type = column.weld_type
                 column = column.expr
@@ -75,7 +83,8 @@ class GroupByWeld:
             self.column_types[item_index],
             self.grouping_column_names,
             self.grouping_columns,
-            self.grouping_column_types
+            self.grouping_column_types,
+            self.categories.get(self.grouping_column_names[0])
         )
 
     def sum(self):
@@ -94,7 +103,8 @@ class GroupByWeld:
             self.grouping_column_names,
             self.column_names,
             self.grouping_column_types,
-            self.column_types
+            self.column_types,
+            self.categories
         )
 
     def sort_values(self, by, ascending=True):
@@ -125,7 +135,8 @@ class GroupByWeld:
             self.grouping_column_names,
             self.column_names,
             self.grouping_column_types,
-            vec_type
+            vec_type,
+            self.categories
         )
 
     def mean(self):
@@ -158,7 +169,8 @@ class GroupByWeld:
             ),
             WeldLong(),
             index_type=index_type,
-            index_name=index_name
+            index_name=index_name,
+            index_categories=self.categories.get(index_name)
         )
 
     def count(self):
@@ -183,6 +195,7 @@ class GroupedDataFrameWeld(LazyOpResult):
         grouping_column_name (TYPE): Description
         grouping_column_type (TYPE): Description
         weld_type (TYPE): Description
+        categories (dict): Dictionaries of the dictionary-encoded columns
     """
 
     def __init__(
@@ -191,7 +204,8 @@ class GroupedDataFrameWeld(LazyOpResult):
             grouping_column_names,
             column_names,
             grouping_column_types,
-            column_types):
+            column_types,
+            categories=None):
         """Summary
 
         Args:
@@ -200,8 +214,11 @@ class GroupedDataFrameWeld(LazyOpResult):
             column_names (TYPE): Description
             grouping_column_type (TYPE): Description
             column_types (TYPE): Description
+            categories (dict, optional): Dictionaries of the
+                dictionary-encoded columns, applied in evaluate
         """
         self.expr = expr
+        self.categories = dict(categories or {})
         self.grouping_column_name = grouping_column_names
         self.column_names = column_names
         self.grouping_column_types = grouping_column_types
@@ -230,10 +247,11 @@ class GroupedDataFrameWeld(LazyOpResult):
             self.grouping_column_name,
             self.column_names,
             self.grouping_column_types,
-            self.column_types
+            self.column_types,
+            self.categories
         )
 
-    def get_column(self, column_name, column_type, index, verbose=True):
+    def get_column(self, column_name, column_type, index, verbose=False):
         """Summary
 
         Args:
@@ -284,7 +302,7 @@ class GroupedDataFrameWeld(LazyOpResult):
                     self.grouping_column_types
                 )
 
-    def evaluate(self, verbose=True, passes=None):
+    def evaluate(self, verbose=False, passes=None):
         """Summary
 
         Returns:
@@ -325,7 +343,11 @@ class GroupedDataFrameWeld(LazyOpResult):
         df = pd.DataFrame(columns=[])
         all_columns = self.column_names + self.grouping_column_name
         for i, column_name in enumerate(all_columns):
-            df[column_name] = result[i]
+            if column_name in self.categories:
+                df[column_name] = dictionary.decode(
+                    result[i], self.categories[column_name])
+            else:
+                df[column_name] = result[i]
         return dataframeweld.DataFrameWeld(df)
 
 class GroupByWeldSeries:
@@ -338,13 +360,14 @@ class GroupByWeldSeries:
         grouping_column
     """
 
-    def __init__(self, name, column, column_type, grouping_column_names, grouping_columns, grouping_column_types):
+    def __init__(self, name, column, column_type, grouping_column_names, grouping_columns, grouping_column_types, index_categories=None):
         self.name = name
         self.column = column
         self.column_type = column_type
         self.grouping_column_names = grouping_column_names
         self.grouping_columns = grouping_columns
         self.grouping_column_types = grouping_column_types
+        self.index_categories = index_categories
 
     def std(self):
         """Standard deviation
@@ -378,5 +401,6 @@ class GroupByWeldSeries:
             group_expr.expr,
             WeldDouble(),
             index_type=self.grouping_column_types[0],
-            index_name=self.grouping_column_names[0]
+            index_name=self.grouping_column_names[0],
+            index_categories=self.index_categories
         )
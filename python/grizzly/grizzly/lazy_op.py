@@ -1,6 +1,23 @@
 """Summary
 """
 from weld.weldobject import *
+from encoders import NumPyDecoder
+
+# Decoders for each format of decoded strings, created on first use
+_string_decoders = {}
+
+
+def string_decoder(strings):
+    """Returns a NumPyDecoder which decodes vectors of strings to `strings`.
+
+    Args:
+        strings (str): One of encoders.string_formats
+    """
+    decoder = _string_decoders.get(strings)
+    if decoder is None:
+        decoder = _string_decoders.setdefault(strings, NumPyDecoder(
+            strings=strings))
+    return decoder
 
 
 def to_weld_type(weld_type, dim):
@@ -40,18 +57,34 @@ class LazyOpResult:
         self.weld_type = weld_type
         self.dim = dim
 
-    def evaluate(self, verbose=True, decode=True, passes=None, num_threads=1,
-                 apply_experimental_transforms=False):
+    def evaluate(self, verbose=False, decode=True, passes=None,
+                 num_threads=None, apply_experimental_transforms=None,
+                 sink=None, strings=None):
         """Summary
 
         Args:
             verbose (bool, optional): Description
             decode (bool, optional): Description
+            passes (list, optional): Optimization passes; None uses the
+                current WeldSession's
+            num_threads (int, optional): Number of threads; None uses the
+                current WeldSession's
+            apply_experimental_transforms (bool, optional): None uses the
+                current WeldSession's setting
+            sink (MetricsSink, optional): Receives the evaluation's metrics,
+                including Weld's compile stats (see weld.metrics)
+            strings (str, optional): Format of decoded vectors of strings:
+                'object' (the default) for a NumPy array of Python strings,
+                'fixed' for a NumPy `S` array, 'column' for a StringColumn,
+                or 'categorical' for a pandas Categorical (see NumPyDecoder)
 
         Returns:
             TYPE: Description
         """
         if isinstance(self.expr, WeldObject):
+            decoder = None
+            if strings is not None:
+                decoder = string_decoder(strings)
             return self.expr.evaluate(
                 to_weld_type(
                     self.weld_type,
@@ -60,5 +93,7 @@ class LazyOpResult:
                 decode,
                 passes=passes,
                 num_threads=num_threads,
-                apply_experimental_transforms=apply_experimental_transforms)
+                apply_experimental_transforms=apply_experimental_transforms,
+                sink=sink,
+                decoder=decoder)
         return self.expr
@@ -4,7 +4,8 @@
 #include <cstdlib>
 #include <cstdio>
 #include <iostream>
-//#include <omp.h> //uncomment to enable parallel encode
+#include <cstring>
+#include <pthread.h>
 
 using namespace std;
 
@@ -95,37 +96,137 @@ weld::vec<bool> numpy_to_weld_bool_arr(PyObject* in) {
   return t;
 }
 
+// Minimum number of elements each thread should handle when encoding or
+// decoding 2-D arrays; smaller arrays use fewer threads.
+#define PARALLEL_GRAIN (1 << 16)
+
+// Side of the square tiles in which strided 2-D arrays are copied, so that
+// both the elements read and the elements written stay in cache.
+#define TRANSPOSE_BLOCK 32
+
+template <typename F>
+struct range_task {
+  F* fn;
+  int64_t start;
+  int64_t end;
+};
+
+template <typename F>
+static void* run_range_task(void* arg) {
+  range_task<F>* task = (range_task<F>*) arg;
+  (*task->fn)(task->start, task->end);
+  return NULL;
+}
+
 /**
- * Converts numpy array to Weld vector, with ndim = 2.
+ * Splits [0, n) into contiguous ranges and calls fn(start, end) on each of
+ * them, using up to `num_threads` threads (including the calling thread) and
+ * at least `grain` items per thread.
  */
-extern "C"
-weld::vec<weld::vec<int16_t> > numpy_to_weld_int16_arr_arr(PyObject* in) {
-    PyArrayObject* inp = (PyArrayObject*) in;
-    int64_t dimension = (int64_t) PyArray_DIMS(inp)[0];
-    weld::vec<weld::vec<int16_t> > t;
-    t = weld::make_vec<weld::vec<int16_t> >(dimension);
-    for (int i = 0; i < t.size; i++) {
-        t.ptr[i].size = (int64_t) PyArray_DIMS(inp)[1];
-        t.ptr[i].ptr = (int16_t *)(inp->data + i * inp->strides[0]);
+template <typename F>
+static void parallel_for(int64_t n, int num_threads, int64_t grain, F fn) {
+  int64_t max_threads = n / (grain > 0 ? grain : 1);
+  if (num_threads > max_threads) {
+    num_threads = (int) max_threads;
+  }
+  if (num_threads <= 1) {
+    fn((int64_t) 0, n);
+    return;
+  }
+
+  range_task<F>* tasks = (range_task<F>*) malloc(sizeof(range_task<F>) * num_threads);
+  pthread_t* threads = (pthread_t*) malloc(sizeof(pthread_t) * num_threads);
+  bool* spawned = (bool*) malloc(sizeof(bool) * num_threads);
+  for (int i = 0; i < num_threads; i++) {
+    tasks[i].fn = &fn;
+    tasks[i].start = n * i / num_threads;
+    tasks[i].end = n * (i + 1) / num_threads;
+  }
+  // Run the first range on this thread; if a thread can't be created, its
+  // range runs here too.
+  for (int i = 1; i < num_threads; i++) {
+    spawned[i] = pthread_create(&threads[i], NULL, run_range_task<F>, &tasks[i]) == 0;
+    if (!spawned[i]) {
+      run_range_task<F>(&tasks[i]);
+    }
+  }
+  run_range_task<F>(&tasks[0]);
+  for (int i = 1; i < num_threads; i++) {
+    if (spawned[i]) {
+      pthread_join(threads[i], NULL);
     }
+  }
+  free(spawned);
+  free(threads);
+  free(tasks);
+}
 
-    return t;
+/**
+ * Returns the number of rows with `cols` columns that make up a thread's
+ * minimum share of work.
+ */
+static int64_t row_grain(int64_t cols) {
+  int64_t grain = PARALLEL_GRAIN / (cols > 0 ? cols : 1);
+  return grain > 0 ? grain : 1;
 }
 
 /**
- * Converts numpy array to Weld vector, with ndim = 2.
+ * Copies a `rows` x `cols` array with the given byte strides into the
+ * row-major buffer `dst`. The array is copied one TRANSPOSE_BLOCK square
+ * tile at a time, so that a column-major source is read and written with
+ * few cache misses; each thread copies a range of tile rows.
  */
-extern "C"
-weld::vec<weld::vec<int> > numpy_to_weld_int_arr_arr(PyObject* in) {
+template <typename T>
+static void copy_to_row_major(const char* src, npy_intp row_stride, npy_intp col_stride,
+    int64_t rows, int64_t cols, T* dst, int num_threads) {
+  int64_t tile_rows = (rows + TRANSPOSE_BLOCK - 1) / TRANSPOSE_BLOCK;
+  int64_t grain = row_grain(cols) / TRANSPOSE_BLOCK;
+  parallel_for(tile_rows, num_threads, grain, [&](int64_t start, int64_t end) {
+    for (int64_t tile = start; tile < end; tile++) {
+      int64_t row_start = tile * TRANSPOSE_BLOCK;
+      int64_t row_end = min(row_start + TRANSPOSE_BLOCK, rows);
+      for (int64_t col_start = 0; col_start < cols; col_start += TRANSPOSE_BLOCK) {
+        int64_t col_end = min(col_start + TRANSPOSE_BLOCK, cols);
+        for (int64_t j = col_start; j < col_end; j++) {
+          const char* col = src + j * col_stride;
+          for (int64_t i = row_start; i < row_end; i++) {
+            dst[i * cols + j] = *((const T*) (col + i * row_stride));
+          }
+        }
+      }
+    }
+  });
+}
+
+/**
+ * Converts a 2-D numpy array to a Weld vector of row vectors. Rows that are
+ * contiguous in the array are passed without copying; otherwise (e.g. for
+ * arrays in Fortran order) the array is first copied into row-major order.
+ * The caller frees the row table and the copy with free_encoded.
+ */
+template <typename T>
+static weld::vec<weld::vec<T> > numpy_to_weld_arr_arr(PyObject* in, int num_threads) {
   PyArrayObject* inp = (PyArrayObject*) in;
-  int64_t dimension = (int64_t) PyArray_DIMS(inp)[0];
-  weld::vec<weld::vec<int> > t;
-  t = weld::make_vec<weld::vec<int> >(dimension);
-  for (int i = 0; i < t.size; i++) {
-    t.ptr[i].size = (int64_t) PyArray_DIMS(inp)[1];
-    t.ptr[i].ptr = (int *)(inp->data + i * inp->strides[0]);
+  int64_t rows = (int64_t) PyArray_DIMS(inp)[0];
+  int64_t cols = (int64_t) PyArray_DIMS(inp)[1];
+  npy_intp row_stride = PyArray_STRIDES(inp)[0];
+  npy_intp col_stride = PyArray_STRIDES(inp)[1];
+  char* data = PyArray_BYTES(inp);
+
+  if (col_stride != (npy_intp) sizeof(T) && rows > 0) {
+    T* buffer = (T*) malloc(sizeof(T) * rows * cols);
+    copy_to_row_major<T>(data, row_stride, col_stride, rows, cols, buffer, num_threads);
+    data = (char*) buffer;
+    row_stride = sizeof(T) * cols;
   }
 
+  weld::vec<weld::vec<T> > t = weld::make_vec<weld::vec<T> >(rows);
+  parallel_for(rows, num_threads, PARALLEL_GRAIN, [&](int64_t start, int64_t end) {
+    for (int64_t i = start; i < end; i++) {
+      t.ptr[i].size = cols;
+      t.ptr[i].ptr = (T*) (data + i * row_stride);
+    }
+  });
   return t;
 }
 
@@ -133,52 +234,32 @@ weld::vec<weld::vec<int> > numpy_to_weld_int_arr_arr(PyObject* in) {
  * Converts numpy array to Weld vector, with ndim = 2.
  */
 extern "C"
-weld::vec<weld::vec<long> > numpy_to_weld_long_arr_arr(PyObject* in) {
-  PyArrayObject* inp = (PyArrayObject*) in;
-  int64_t dimension1 = (int64_t) PyArray_DIMS(inp)[0];
-  int64_t dimension2 = (int64_t) PyArray_DIMS(inp)[1];
-  weld::vec<weld::vec<long> > t = weld::make_vec<weld::vec<long> >(dimension1);
-  if ((dimension1 * 8) == PyArray_STRIDES(inp)[1]) {
-    // Matrix is transposed.
-    long *new_buffer = (long *) malloc(sizeof(long) * dimension1 * dimension2);
-    long *old_buffer = (long *) inp->data;
-    for (int i = 0; i < t.size; i++) {
-      t.ptr[i].size = dimension2;
-      for (int j = 0; j < dimension2; j++) {
-	*(new_buffer + j) = old_buffer[(j * dimension1) + i];
-      }
-      t.ptr[i].ptr = new_buffer;
-      new_buffer += dimension2;
-    }
-  } else {
-    for (int i = 0; i < t.size; i++) {
-      t.ptr[i].size = dimension2;
-      t.ptr[i].ptr = (long *)(inp->data + i * PyArray_STRIDES(inp)[0]);
-    }
-  }
+weld::vec<weld::vec<int16_t> > numpy_to_weld_int16_arr_arr(PyObject* in, int num_threads) {
+  return numpy_to_weld_arr_arr<int16_t>(in, num_threads);
+}
 
-  return t;
+/**
+ * Converts numpy array to Weld vector, with ndim = 2.
+ */
+extern "C"
+weld::vec<weld::vec<int> > numpy_to_weld_int_arr_arr(PyObject* in, int num_threads) {
+  return numpy_to_weld_arr_arr<int>(in, num_threads);
 }
 
-struct numpy_to_weld_double_arr_arr_args {
-  const PyArrayObject* inp;
-  double* ptr;
-  weld::vec<weld::vec<double> >* t;
-  int start;
-  int end;
-};
+/**
+ * Converts numpy array to Weld vector, with ndim = 2.
+ */
+extern "C"
+weld::vec<weld::vec<long> > numpy_to_weld_long_arr_arr(PyObject* in, int num_threads) {
+  return numpy_to_weld_arr_arr<long>(in, num_threads);
+}
 
-/* Helper method used for parallelized encoder. */
-void *numpy_to_weld_double_arr_arr_helper(void* args_) {
-  struct numpy_to_weld_double_arr_arr_args* args = (struct numpy_to_weld_double_arr_arr_args*) args_;
-  double* ptr = args->ptr;
-  const PyArrayObject* inp = args->inp;
-  weld::vec<weld::vec<double> >* t = args->t;
-  for (int i = args->start; i < args->end; i++) {
-    t->ptr[i].size = (int64_t) PyArray_DIMS(inp)[1];
-    t->ptr[i].ptr = (double *)(inp->data + i * PyArray_STRIDES(inp)[0]);
-    ptr += (inp->strides[0]);
-  }
+/**
+ * Converts numpy array to Weld vector, with ndim = 2.
+ */
+extern "C"
+weld::vec<weld::vec<float> > numpy_to_weld_float_arr_arr(PyObject* in, int num_threads) {
+  return numpy_to_weld_arr_arr<float>(in, num_threads);
 }
 
 /**
@@ -186,148 +267,17 @@ void *numpy_to_weld_double_arr_arr_helper(void* args_) {
  */
 extern "C"
 weld::vec<weld::vec<double> > numpy_to_weld_double_arr_arr(PyObject* in, int num_threads) {
-  PyArrayObject* inp = (PyArrayObject*) in;
-  int64_t dimension1 = (int64_t) PyArray_DIMS(inp)[0];
-  int64_t dimension2 = (int64_t) PyArray_DIMS(inp)[1];
-  weld::vec<weld::vec<double> > t = weld::make_vec<weld::vec<double> >(dimension1);
-  if ((dimension1 * 8) == PyArray_STRIDES(inp)[1]) {
-    // Matrix is transposed.
-    double *new_buffer = (double *) malloc(sizeof(long) * dimension1 * dimension2);
-    double *old_buffer = (double *) inp->data;
-    for (int i = 0; i < t.size; i++) {
-      t.ptr[i].size = dimension2;
-      for (int j = 0; j < dimension2; j++) {
-	*(new_buffer + j) = old_buffer[(j * dimension1) + i];
-      }
-      t.ptr[i].ptr = new_buffer;
-      new_buffer += dimension2;
-    }
-  } else {
-    struct numpy_to_weld_double_arr_arr_args args[num_threads];
-    int fringe_length = t.size % num_threads;
-
-    for (int i = 0; i < num_threads; i++) {
-      args[i].inp = inp;
-      args[i].ptr = (double *) inp->data;
-      args[i].t = &t;
-      args[i].start = (t.size / num_threads) * i;
-      if (i < fringe_length) {
-	args[i].start += i;
-      } else {
-	args[i].start += fringe_length;
-      }
-      args[i].ptr += (args[i].start * inp->strides[0]);
-      args[i].end = (t.size / num_threads) * (i + 1);
-      if ((i+1) < fringe_length) {
-	args[i].end += (i+1);
-      } else {
-	args[i].end += fringe_length;
-      }
-    }
-
-    // #pragma omp parallel for // uncomment to enable parallel encode
-    for (int i = 0; i < num_threads; i++) {
-      numpy_to_weld_double_arr_arr_helper(&args[i]);
-    }
-  }
-
-  return t;
+  return numpy_to_weld_arr_arr<double>(in, num_threads);
 }
 
-weld::vec<weld::vec<float> > numpy_to_weld_float_arr_arr(PyObject* in) {
-    PyArrayObject* inp = (PyArrayObject*) in;
-    int64_t dimension1 = (int64_t) PyArray_DIMS(inp)[0];
-    int64_t dimension2 = (int64_t) PyArray_DIMS(inp)[1];
-    weld::vec<weld::vec<float> > t = weld::make_vec<weld::vec<float> >(dimension1);
-    if ((dimension1 * 8) == PyArray_STRIDES(inp)[1]) {
-        // Matrix is transposed.
-        float *new_buffer = (float *) malloc(sizeof(long) * dimension1 * dimension2);
-        float *old_buffer = (float *) inp->data;
-        for (int i = 0; i < t.size; i++) {
-            t.ptr[i].size = dimension2;
-            for (int j = 0; j < dimension2; j++) {
-                *(new_buffer + j) = old_buffer[(j * dimension1) + i];
-            }
-            t.ptr[i].ptr = new_buffer;
-            new_buffer += dimension2;
-        }
-    } else {
-        for (int i = 0; i < t.size; i++) {
-            t.ptr[i].size = dimension2;
-            t.ptr[i].ptr = (float *)(inp->data + i * PyArray_STRIDES(inp)[0]);
-        }
-    }
-
-    return t;
+/**
+ * Converts numpy array of bool to Weld vector, with ndim = 2.
+ */
+extern "C"
+weld::vec<weld::vec<bool> > numpy_to_weld_bool_arr_arr(PyObject* in, int num_threads) {
+  return numpy_to_weld_arr_arr<bool>(in, num_threads);
 }
 
-struct numpy_to_weld_char_arr_arr_args {
-  const PyArrayObject* inp;
-  uint8_t* ptr;
-  weld::vec<weld::vec<uint8_t> >* t;
-  int start;
-  int end;
-};
-
-// /* Helper method used for parallelized encoder. */
-// void *numpy_to_weld_char_arr_arr_helper(void* args_) {
-//   struct numpy_to_weld_char_arr_arr_args* args = (struct numpy_to_weld_char_arr_arr_args*) args_;
-//   uint8_t* ptr = args->ptr;
-//   const PyArrayObject* inp = args->inp;
-//   uint8_t* data = (uint8_t *) PyArray_DATA(inp);
-//   weld::vec<weld::vec<uint8_t> >* t = args->t;
-//   for (int i = args->start; i < args->end; i++) {
-//     t->ptr[i].size = (int64_t) strlen((char *) ptr);
-//     if ((int) inp->dimensions[1] < t->ptr[i].size) {
-//       t->ptr[i].size = (int) inp->dimensions[1];
-//     }
-//     t->ptr[i].ptr = (uint8_t *)(data + i * inp->strides[0]);
-//     ptr += (PyArray_STRIDES(inp)[0]);
-//   }
-// }
-
-// /**
-//  * Converts numpy array of strings to Weld vector, with ndim = 2.
-//  */
-// extern "C"
-// weld::vec<weld::vec<uint8_t> > numpy_to_weld_char_arr_arr(PyObject* in, int num_threads) {
-  
-//   PyArrayObject* inp = (PyArrayObject*) in;
-//   int64_t dimension = (int64_t) PyArray_DIMS(inp)[0];
-//   weld::vec<weld::vec<uint8_t> > t;
-//   t = weld::make_vec<weld::vec<uint8_t> >(dimension);
-//   uint8_t* ptr = (uint8_t *) PyArray_DATA(inp);
-//   struct numpy_to_weld_char_arr_arr_args args[num_threads];
-//   int fringe_length = t.size % num_threads;
-//   for (int i = 0; i < num_threads; i++) {
-    
-//     args[i].inp = inp;
-//     args[i].ptr = (uint8_t *) PyArray_DATA(inp);
-//     args[i].t = &t;
-//     args[i].start = (t.size / num_threads) * i;
-//     if (i < fringe_length) {
-//       args[i].start += i;
-//     } else {
-//       args[i].start += fringe_length;
-//     }
-//     args[i].ptr += (args[i].start * inp->strides[0]);
-//     args[i].end = (t.size / num_threads) * (i + 1);
-//     if ((i+1) < fringe_length) {
-//       args[i].end += (i+1);
-//     } else {
-//       args[i].end += fringe_length;
-//     }
-//     return t;
-//   }
-
-//   // #pragma omp parallel for // uncomment to enable parallel encode
-//   for (int i = 0; i < num_threads; i++) {
-//     numpy_to_weld_char_arr_arr_helper(&args[i]);
-//   }
-
-//   return t;
-// }
-
 /**
  * Converts numpy array of strings to Weld vector, with ndim = 2.
  */
@@ -352,45 +302,58 @@ weld::vec<weld::vec<uint8_t> > numpy_to_weld_char_arr_arr(PyObject* in) {
 }
 
 /**
- * Converts numpy array of bool to Weld vector, with ndim = 2.
+ * Converts a string column, stored as the bytes of all its rows and the
+ * offsets at which each row starts (followed by the total length), to a
+ * Weld vector of strings. The rows point into the column's bytes.
  */
 extern "C"
-weld::vec<weld::vec<bool> > numpy_to_weld_bool_arr_arr(PyObject* in) {
-    PyArrayObject* inp = (PyArrayObject*) in;
-    int64_t dimension1 = (int64_t) PyArray_DIMS(inp)[0];
-    int64_t dimension2 = (int64_t) PyArray_DIMS(inp)[1];
-    weld::vec<weld::vec<bool> > t = weld::make_vec<weld::vec<bool> >(dimension1);
-    if ((dimension1 * 8) == PyArray_STRIDES(inp)[1]) {
-        // Matrix is transposed.
-        bool *new_buffer = (bool *) malloc(sizeof(bool) * dimension1 * dimension2);
-        bool *old_buffer = (bool *) inp->data;
-        for (int i = 0; i < t.size; i++) {
-            t.ptr[i].size = dimension2;
-            for (int j = 0; j < dimension2; j++) {
-                *(new_buffer + j) = old_buffer[(j * dimension1) + i];
-            }
-            t.ptr[i].ptr = new_buffer;
-            new_buffer += dimension2;
-        }
-    } else {
-        for (int i = 0; i < t.size; i++) {
-            t.ptr[i].size = dimension2;
-            t.ptr[i].ptr = (bool *)(inp->data + i * PyArray_STRIDES(inp)[0]);
-        }
+weld::vec<weld::vec<uint8_t> > numpy_to_weld_string_column(PyObject* data, PyObject* offsets,
+    int num_threads) {
+  uint8_t* bytes = (uint8_t*) PyArray_DATA((PyArrayObject*) data);
+  int64_t* offs = (int64_t*) PyArray_DATA((PyArrayObject*) offsets);
+  int64_t rows = (int64_t) PyArray_DIMS((PyArrayObject*) offsets)[0] - 1;
+
+  weld::vec<weld::vec<uint8_t> > t = weld::make_vec<weld::vec<uint8_t> >(rows);
+  parallel_for(rows, num_threads, PARALLEL_GRAIN, [&](int64_t start, int64_t end) {
+    for (int64_t i = start; i < end; i++) {
+      t.ptr[i].ptr = bytes + offs[i];
+      t.ptr[i].size = offs[i + 1] - offs[i];
     }
+  });
+  return t;
+}
 
-    return t;
+/**
+ * Frees memory allocated by the encoders above: the row tables of vectors of
+ * vectors, and the row-major copies of 2-D arrays.
+ */
+extern "C"
+void free_encoded(void* ptr) {
+  free(ptr);
+}
+
+/**
+ * Makes `owner` the base object of an array viewing Weld's memory, so that
+ * the memory is only freed once the array (and any view of it) is garbage
+ * collected. Passing None leaves the memory unowned.
+ */
+static void set_owner(PyObject* out, PyObject* owner) {
+  if (out != NULL && owner != Py_None) {
+    Py_INCREF(owner);
+    PyArray_SetBaseObject((PyArrayObject*) out, owner);
+  }
 }
 
 /**
  * Converts Weld vector to numpy array.
  */
 extern "C"
-PyObject* weld_to_numpy_int16_arr(weld::vec<int16_t> inp) {
+PyObject* weld_to_numpy_int16_arr(weld::vec<int16_t> inp, PyObject* owner) {
     Py_Initialize();
     npy_intp size = {inp.size};
     _import_array();
     PyObject* out = PyArray_SimpleNewFromData(1, &size, NPY_INT16, (char*)inp.ptr);
+    set_owner(out, owner);
     return out;
 }
 
@@ -398,11 +361,12 @@ PyObject* weld_to_numpy_int16_arr(weld::vec<int16_t> inp) {
  * Converts Weld vector to numpy array.
  */
 extern "C"
-PyObject* weld_to_numpy_int_arr(weld::vec<int> inp) {
+PyObject* weld_to_numpy_int_arr(weld::vec<int> inp, PyObject* owner) {
   Py_Initialize();
   npy_intp size = {inp.size};
   _import_array();
   PyObject* out = PyArray_SimpleNewFromData(1, &size, NPY_INT32, (char*)inp.ptr);
+  set_owner(out, owner);
   return out;
 }
 
@@ -410,11 +374,12 @@ PyObject* weld_to_numpy_int_arr(weld::vec<int> inp) {
  * Converts Weld vector to numpy array.
  */
 extern "C"
-PyObject* weld_to_numpy_long_arr(weld::vec<long> inp) {
+PyObject* weld_to_numpy_long_arr(weld::vec<long> inp, PyObject* owner) {
   Py_Initialize();
   npy_intp size = {inp.size};
   _import_array();
   PyObject* out = PyArray_SimpleNewFromData(1, &size, NPY_INT64, (char*)inp.ptr);
+  set_owner(out, owner);
   return out;
 }
 
@@ -422,11 +387,12 @@ PyObject* weld_to_numpy_long_arr(weld::vec<long> inp) {
  * Converts Weld vector to numpy float array.
  */
 extern "C"
-PyObject* weld_to_numpy_float_arr(weld::vec<float> inp) {
+PyObject* weld_to_numpy_float_arr(weld::vec<float> inp, PyObject* owner) {
     Py_Initialize();
     npy_intp size = {inp.size};
     _import_array();
     PyObject* out = PyArray_SimpleNewFromData(1, &size, NPY_FLOAT, (char*)inp.ptr);
+    set_owner(out, owner);
     return out;
 }
 
@@ -434,11 +400,12 @@ PyObject* weld_to_numpy_float_arr(weld::vec<float> inp) {
  * Converts Weld vector to numpy double array.
  */
 extern "C"
-PyObject* weld_to_numpy_double_arr(weld::vec<double> inp) {
+PyObject* weld_to_numpy_double_arr(weld::vec<double> inp, PyObject* owner) {
   Py_Initialize();
   npy_intp size = {inp.size};
   _import_array();
   PyObject* out = PyArray_SimpleNewFromData(1, &size, NPY_DOUBLE, (char*)inp.ptr);
+  set_owner(out, owner);
   return out;
 }
 
@@ -446,178 +413,184 @@ PyObject* weld_to_numpy_double_arr(weld::vec<double> inp) {
  * Converts Weld vector to (bool) numpy array.
  */
 extern "C"
-PyObject* weld_to_numpy_bool_arr(weld::vec<bool> inp) {
+PyObject* weld_to_numpy_bool_arr(weld::vec<bool> inp, PyObject* owner) {
   Py_Initialize();
   npy_intp size = {inp.size};
   _import_array();
   PyObject* out = PyArray_SimpleNewFromData(1, &size, NPY_BOOL, (char*)inp.ptr);
+  set_owner(out, owner);
   return out;
 }
 
 /**
- * Converts Weld vector-of-int-vectors to two-dimensional numpy array.
+ * Converts a Weld vector of row vectors to a two-dimensional numpy array of
+ * type `type_num`, copying the rows on up to `num_threads` threads.
  */
-extern "C"
-PyObject* weld_to_numpy_int16_arr_arr(weld::vec< weld::vec<int16_t> > inp) {
-    Py_Initialize();
-
-    int num_rows = inp.size;
-    int num_cols = inp.ptr[0].size;
+template <typename T>
+static PyObject* weld_to_numpy_arr_arr(weld::vec<weld::vec<T> > inp, int type_num,
+    int num_threads) {
+  Py_Initialize();
+  _import_array();
 
-    npy_intp size[2] = {num_rows, num_cols};
-    int16_t *ptr_array = (int16_t *) malloc(sizeof(int16_t) * num_rows * num_cols);
+  int64_t rows = inp.size;
+  int64_t cols = rows > 0 ? inp.ptr[0].size : 0;
+  npy_intp size[2] = {rows, cols};
+  PyObject* out = PyArray_SimpleNew(2, size, type_num);
+  if (out == NULL) {
+    return NULL;
+  }
 
-    for (int i = 0; i < num_rows; i++) {
-        for (int j = 0; j < num_cols; j++) {
-            ptr_array[i * num_cols + j] = *((int16_t *) inp.ptr[i].ptr + j);
-        }
+  T* data = (T*) PyArray_DATA((PyArrayObject*) out);
+  parallel_for(rows, num_threads, row_grain(cols), [&](int64_t start, int64_t end) {
+    for (int64_t i = start; i < end; i++) {
+      memcpy(data + i * cols, inp.ptr[i].ptr, sizeof(T) * cols);
     }
+  });
+  return out;
+}
 
-    _import_array();
-    PyObject* out = PyArray_SimpleNewFromData(2, size, NPY_INT16, (char*)ptr_array);
-    return out;
+/**
+ * Converts Weld vector-of-int16-vectors to two-dimensional numpy array.
+ */
+extern "C"
+PyObject* weld_to_numpy_int16_arr_arr(weld::vec< weld::vec<int16_t> > inp, int num_threads) {
+  return weld_to_numpy_arr_arr<int16_t>(inp, NPY_INT16, num_threads);
 }
 
 /**
  * Converts Weld vector-of-int-vectors to two-dimensional numpy array.
  */
 extern "C"
-PyObject* weld_to_numpy_int_arr_arr(weld::vec< weld::vec<int> > inp) {
-  Py_Initialize();
-
-  int num_rows = inp.size;
-  int num_cols = inp.ptr[0].size;
-
-  npy_intp size[2] = {num_rows, num_cols};
-  int *ptr_array = (int *) malloc(sizeof(int) * num_rows * num_cols);
-
-  for (int i = 0; i < num_rows; i++) {
-    for (int j = 0; j < num_cols; j++) {
-      ptr_array[i * num_cols + j] = *((int *) inp.ptr[i].ptr + j);
-    }
-  }
-
-  _import_array();
-  PyObject* out = PyArray_SimpleNewFromData(2, size, NPY_INT32, (char*)ptr_array);
-  return out;
+PyObject* weld_to_numpy_int_arr_arr(weld::vec< weld::vec<int> > inp, int num_threads) {
+  return weld_to_numpy_arr_arr<int>(inp, NPY_INT32, num_threads);
 }
 
 /**
  * Converts Weld vector-of-long-vectors to two-dimensional numpy array.
  */
 extern "C"
-PyObject* weld_to_numpy_long_arr_arr(weld::vec< weld::vec<long> > inp) {
-  Py_Initialize();
-
-  int num_rows = inp.size;
-  int num_cols = inp.ptr[0].size;
-
-  npy_intp size[2] = {num_rows, num_cols};
-  long *ptr_array = (long *) malloc(sizeof(long) * num_rows * num_cols);
-
-  for (int i = 0; i < num_rows; i++) {
-    for (int j = 0; j < num_cols; j++) {
-      ptr_array[i * num_cols + j] = *((long *) inp.ptr[i].ptr + j);
-    }
-  }
-
-  _import_array();
-  PyObject* out = PyArray_SimpleNewFromData(2, size, NPY_INT64, (char*)ptr_array);
-  return out;
+PyObject* weld_to_numpy_long_arr_arr(weld::vec< weld::vec<long> > inp, int num_threads) {
+  return weld_to_numpy_arr_arr<long>(inp, NPY_INT64, num_threads);
 }
 
 /**
  * Converts Weld vector-of-float-vectors to two-dimensional numpy array.
  */
 extern "C"
-PyObject* weld_to_numpy_float_arr_arr(weld::vec< weld::vec<float> > inp) {
-    Py_Initialize();
-
-    int num_rows = inp.size;
-    int num_cols = inp.ptr[0].size;
-
-    npy_intp size[2] = {num_rows, num_cols};
-    float *ptr_array = (float *) malloc(sizeof(float) * num_rows * num_cols);
+PyObject* weld_to_numpy_float_arr_arr(weld::vec< weld::vec<float> > inp, int num_threads) {
+  return weld_to_numpy_arr_arr<float>(inp, NPY_FLOAT, num_threads);
+}
 
-    for (int i = 0; i < num_rows; i++) {
-        for (int j = 0; j < num_cols; j++) {
-            ptr_array[i * num_cols + j] = *((float *) inp.ptr[i].ptr + j);
-        }
-    }
+/**
+ * Converts Weld vector-of-double-vectors to two-dimensional numpy array.
+ */
+extern "C"
+PyObject* weld_to_numpy_double_arr_arr(weld::vec< weld::vec<double> > inp, int num_threads) {
+  return weld_to_numpy_arr_arr<double>(inp, NPY_DOUBLE, num_threads);
+}
 
-    _import_array();
-    PyObject* out = PyArray_SimpleNewFromData(2, size, NPY_FLOAT, (char*)ptr_array);
-    return out;
+/**
+ * Converts Weld vector-of-bool-vectors to two-dimensional numpy array.
+ */
+extern "C"
+PyObject* weld_to_numpy_bool_arr_arr(weld::vec< weld::vec<bool> > inp, int num_threads) {
+  return weld_to_numpy_arr_arr<bool>(inp, NPY_BOOL, num_threads);
 }
 
 /**
- * Converts Weld vector-of-double-vectors to two-dimensional numpy array.
+ * Converts Weld vector-of-char-vectors to NumPy vector-of-strings.
  */
 extern "C"
-PyObject* weld_to_numpy_double_arr_arr(weld::vec< weld::vec<double> > inp) {
+PyObject* weld_to_numpy_char_arr_arr(weld::vec< weld::vec<uint8_t> > inp) {
   Py_Initialize();
 
   int num_rows = inp.size;
-  int num_cols = inp.ptr[0].size;
 
-  npy_intp size[2] = {num_rows, num_cols};
-  double *ptr_array = (double *) malloc(sizeof(double) * num_rows * num_cols);
+  PyObject** ptr_array = (PyObject**) malloc(sizeof(PyObject*) * num_rows);
+  _import_array();
 
   for (int i = 0; i < num_rows; i++) {
-    for (int j = 0; j < num_cols; j++) {
-      ptr_array[i * num_cols + j] = *((double *) inp.ptr[i].ptr + j);
-    }
+    int size = inp.ptr[i].size;
+    PyObject* buffer = PyString_FromStringAndSize((const char*) inp.ptr[i].ptr, size);
+    ptr_array[i] = buffer;
   }
+  npy_intp size = num_rows;
 
-  _import_array();
-  PyObject* out = PyArray_SimpleNewFromData(2, size, NPY_DOUBLE, (char*)ptr_array);
+  PyObject* out = PyArray_SimpleNewFromData(1, &size, NPY_OBJECT, (void*) ptr_array);
   return out;
-
 }
 
 /**
- * Converts Weld vector-of-bool-vectors to two-dimensional numpy array.
+ * Converts Weld vector-of-char-vectors to a string column: returns a tuple of
+ * a uint8 array with the bytes of all rows, and an int64 array with the
+ * offset of each row followed by the total length. The rows are copied on up
+ * to `num_threads` threads.
  */
 extern "C"
-PyObject* weld_to_numpy_bool_arr_arr(weld::vec< weld::vec<bool> > inp) {
-    Py_Initialize();
-
-    int num_rows = inp.size;
-    int num_cols = inp.ptr[0].size;
+PyObject* weld_to_numpy_string_column(weld::vec< weld::vec<uint8_t> > inp, int num_threads) {
+  Py_Initialize();
+  _import_array();
 
-    npy_intp size[2] = {num_rows, num_cols};
-    bool *ptr_array = (bool *) malloc(sizeof(bool) * num_rows * num_cols);
+  int64_t rows = inp.size;
+  npy_intp num_offsets = rows + 1;
+  PyObject* offsets = PyArray_SimpleNew(1, &num_offsets, NPY_INT64);
+  if (offsets == NULL) {
+    return NULL;
+  }
+  int64_t* offs = (int64_t*) PyArray_DATA((PyArrayObject*) offsets);
+  offs[0] = 0;
+  for (int64_t i = 0; i < rows; i++) {
+    offs[i + 1] = offs[i] + inp.ptr[i].size;
+  }
 
-    for (int i = 0; i < num_rows; i++) {
-        for (int j = 0; j < num_cols; j++) {
-            ptr_array[i * num_cols + j] = *((bool *) inp.ptr[i].ptr + j);
-        }
+  npy_intp num_bytes = offs[rows];
+  PyObject* data = PyArray_SimpleNew(1, &num_bytes, NPY_UINT8);
+  if (data == NULL) {
+    Py_DECREF(offsets);
+    return NULL;
+  }
+  uint8_t* bytes = (uint8_t*) PyArray_DATA((PyArrayObject*) data);
+  int64_t grain = row_grain(rows > 0 ? num_bytes / rows : 0);
+  parallel_for(rows, num_threads, grain, [&](int64_t start, int64_t end) {
+    for (int64_t i = start; i < end; i++) {
+      memcpy(bytes + offs[i], inp.ptr[i].ptr, inp.ptr[i].size);
     }
+  });
 
-    _import_array();
-    PyObject* out = PyArray_SimpleNewFromData(2, size, NPY_BOOL, (char*)ptr_array);
-    return out;
+  PyObject* out = PyTuple_Pack(2, data, offsets);
+  Py_DECREF(data);
+  Py_DECREF(offsets);
+  return out;
 }
 
 /**
- * Converts Weld vector-of-char-vectors to NumPy vector-of-strings.
+ * Converts Weld vector-of-char-vectors to a two-dimensional uint8 array with
+ * one row per string, each padded with zeros to the length of the longest
+ * string (at least 1). Viewed as an `S` dtype, this is a fixed-width NumPy
+ * string array. The rows are copied on up to `num_threads` threads.
  */
 extern "C"
-PyObject* weld_to_numpy_char_arr_arr(weld::vec< weld::vec<uint8_t> > inp) {
+PyObject* weld_to_numpy_fixed_width_strings(weld::vec< weld::vec<uint8_t> > inp,
+    int num_threads) {
   Py_Initialize();
-
-  int num_rows = inp.size;
-
-  PyObject** ptr_array = (PyObject**) malloc(sizeof(PyObject*) * num_rows);
   _import_array();
 
-  for (int i = 0; i < num_rows; i++) {
-    int size = inp.ptr[i].size;
-    PyObject* buffer = PyString_FromStringAndSize((const char*) inp.ptr[i].ptr, size);
-    ptr_array[i] = buffer;
+  int64_t rows = inp.size;
+  int64_t width = 1;
+  for (int64_t i = 0; i < rows; i++) {
+    width = max(width, inp.ptr[i].size);
   }
-  npy_intp size = num_rows;
 
-  PyObject* out = PyArray_SimpleNewFromData(1, &size, NPY_OBJECT, (void*) ptr_array);
+  npy_intp size[2] = {rows, width};
+  PyObject* out = PyArray_ZEROS(2, size, NPY_UINT8, 0);
+  if (out == NULL) {
+    return NULL;
+  }
+  uint8_t* data = (uint8_t*) PyArray_DATA((PyArrayObject*) out);
+  parallel_for(rows, num_threads, row_grain(width), [&](int64_t start, int64_t end) {
+    for (int64_t i = start; i < end; i++) {
+      memcpy(data + i * width, inp.ptr[i].ptr, inp.ptr[i].size);
+    }
+  });
   return out;
 }
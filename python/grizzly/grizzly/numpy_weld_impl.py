@@ -6,6 +6,7 @@ Attributes:
     norm_factor_id_ (int): Unique IDs given to norm factor literals
 """
 from encoders import *
+from weld import ir
 from weld.weldobject import *
 
 encoder_ = NumPyEncoder()
@@ -36,17 +37,12 @@ def div(array, other, ty):
         other_var = other.obj_id
         weld_obj.dependencies[other_var] = other
     else:
-        other_var = ("%.2f" % other)
+        other_var = ir.literal(other, WeldDouble())
 
-    weld_template = """
-       map(
-         %(array)s,
-         |value| value / %(ty)s(%(other)s)
-       )
-    """
-    weld_obj.weld_code = weld_template % {"array": array_var,
-                                          "other": other_var,
-                                          "ty": ty}
+    weld_obj.weld_code = ir.map_(
+        array_var,
+        ir.lambda_([("value", None)],
+                   ir.binop("/", "value", ir.cast(ty, other_var))))
     return weld_obj
 
 
@@ -71,24 +67,48 @@ def aggr(array, op, initial_value, ty):
         array_var = array.obj_id
         weld_obj.dependencies[array_var] = array
 
-    weld_template = """
-      result(
-        for(
-          %(array)s,
-          merger[%(ty)s,%(op)s],
-          |b, i, e| merge(b, e)
-        )
-      )
-    """
-    weld_obj.weld_code = weld_template % {
-        "array": array_var, "ty": ty, "op": op}
+    weld_obj.weld_code = ir.result(ir.for_(
+        array_var,
+        ir.merger(ty, op),
+        ir.lambda_([("b", None), ("i", None), ("e", None)], ir.merge("b", "e"))))
     return weld_obj
 
 
+def flatten_matrix(matrix):
+    """
+    Returns a flat view of a 2-d array's buffer, with its shape and strides
+    (in elements), so that element (i, j) is at index
+    i * strides[0] + j * strides[1] of the view.
+
+    C-contiguous and Fortran-ordered arrays are viewed without copying; other
+    arrays are copied into C order first. Passing a matrix to Weld this way
+    avoids building a table of row vectors (and, for Fortran-ordered
+    matrices, copying the matrix) on every evaluation.
+
+    Args:
+        matrix (Numpy.ndarray): 2-d input matrix
+
+    Returns:
+        A tuple (flat, shape, strides)
+    """
+    rows, cols = matrix.shape
+    if matrix.flags.c_contiguous:
+        strides = (cols, 1)
+    elif matrix.flags.f_contiguous:
+        strides = (1, rows)
+    else:
+        matrix = np.ascontiguousarray(matrix)
+        strides = (cols, 1)
+    return matrix.ravel(order='K'), (rows, cols), strides
+
+
 def dot(matrix, vector, matrix_ty, vector_ty):
     """
     Computes the dot product between a matrix and a vector.
 
+    NumPy matrices are passed to Weld as a flat vector (see flatten_matrix),
+    and indexed with their shape and strides.
+
     Args:
         matrix (WeldObject / Numpy.ndarray): 2-d input matrix
         vector (WeldObject / Numpy.ndarray): 1-d input vector
@@ -97,6 +117,9 @@ def dot(matrix, vector, matrix_ty, vector_ty):
     Returns:
         A WeldObject representing this computation
     """
+    if isinstance(matrix, np.ndarray) and matrix.ndim == 2:
+        return _dot_flat(matrix, vector, matrix_ty, vector_ty)
+
     weld_obj = WeldObject(encoder_, decoder_)
 
     matrix_var = weld_obj.update(matrix)
@@ -105,40 +128,97 @@ def dot(matrix, vector, matrix_ty, vector_ty):
         weld_obj.dependencies[matrix_var] = matrix
 
     vector_var = weld_obj.update(vector)
-    loopsize_annotation = ""
+    loopsize = None
     if isinstance(vector, WeldObject):
         vector_var = vector.obj_id
         weld_obj.dependencies[vector_var] = vector
     if isinstance(vector, np.ndarray):
-        loopsize_annotation = "@(loopsize: %dL)" % len(vector)
-
-    weld_template = """
-       map(
-         %(matrix)s,
-         |row: vec[%(matrix_ty)s]|
-           result(
-             %(loopsize_annotation)s
-             for(
-               result(
-                 %(loopsize_annotation)s
-                 for(
-                   zip(row, %(vector)s),
-                   appender,
-                   |b2, i2, e2: {%(matrix_ty)s, %(vector_ty)s}|
-                     merge(b2, f64(e2.$0 * %(matrix_ty)s(e2.$1)))
-                 )
-               ),
-               merger[f64,+],
-               |b, i, e| merge(b, e)
-             )
-           )
-       )
+        loopsize = "loopsize: %dL" % len(vector)
+
+    products = _annotate(loopsize, ir.for_(
+        ir.zip_("row", vector_var),
+        ir.appender(),
+        ir.lambda_([("b2", None), ("i2", None),
+                    ("e2", WeldStruct([matrix_ty, vector_ty]))],
+                   ir.merge("b2", _product(ir.field("e2", 0),
+                                           ir.field("e2", 1),
+                                           matrix_ty)))))
+    row_sum = _annotate(loopsize, ir.for_(
+        ir.result(products),
+        ir.merger(WeldDouble(), "+"),
+        ir.lambda_([("b", None), ("i", None), ("e", None)],
+                   ir.merge("b", "e"))))
+    weld_obj.weld_code = ir.map_(
+        matrix_var,
+        ir.lambda_([("row", WeldVec(matrix_ty))], ir.result(row_sum)))
+    return weld_obj
+
+
+def _annotate(annotation, expr):
+    """Returns expr with the annotation, if there is one."""
+    if annotation is None:
+        return expr
+    return ir.annotate(annotation, expr)
+
+
+def _product(matrix_elem, vector_elem, matrix_ty):
+    """Returns the product of a matrix and vector element as an f64."""
+    return ir.cast(WeldDouble(), ir.binop(
+        "*", matrix_elem, ir.cast(matrix_ty, vector_elem)))
+
+
+def _dot_flat(matrix, vector, matrix_ty, vector_ty):
+    """
+    Computes the dot product between a NumPy matrix and a vector, passing
+    the matrix as a flat vector.
     """
-    weld_obj.weld_code = weld_template % {"matrix": matrix_var,
-                                          "vector": vector_var,
-                                          "matrix_ty": matrix_ty,
-                                          "vector_ty": vector_ty,
-                                          "loopsize_annotation": loopsize_annotation}
+    weld_obj = WeldObject(encoder_, decoder_)
+
+    flat, (rows, cols), (row_stride, col_stride) = flatten_matrix(matrix)
+    matrix_var = weld_obj.update(flat)
+
+    vector_var = weld_obj.update(vector)
+    loopsize = None
+    if isinstance(vector, WeldObject):
+        vector_var = vector.obj_id
+        weld_obj.dependencies[vector_var] = vector
+    if isinstance(vector, np.ndarray):
+        loopsize = "loopsize: %dL" % len(vector)
+
+    def i64(value):
+        return ir.literal(value, WeldLong())
+
+    row_start = ir.binop("*", "r", i64(row_stride))
+    if col_stride == 1:
+        # Each row is a contiguous slice of the buffer.
+        row = ir.for_(
+            ir.zip_(
+                ir.iter_(matrix_var, row_start,
+                         ir.binop("+", row_start, i64(cols)), i64(1)),
+                vector_var),
+            ir.merger(WeldDouble(), "+"),
+            ir.lambda_([("b2", None), ("i2", None),
+                        ("e2", WeldStruct([matrix_ty, vector_ty]))],
+                       ir.merge("b2", _product(ir.field("e2", 0),
+                                               ir.field("e2", 1),
+                                               matrix_ty))))
+    else:
+        # Rows are strided; Weld's iter can't end past the buffer, so the
+        # elements are looked up instead.
+        index = ir.binop("+", row_start, ir.binop("*", "c", i64(col_stride)))
+        row = ir.for_(
+            ir.rangeiter(i64(0), i64(cols), i64(1)),
+            ir.merger(WeldDouble(), "+"),
+            ir.lambda_([("b2", None), ("i2", None), ("c", WeldLong())],
+                       ir.merge("b2", _product(ir.lookup(matrix_var, index),
+                                               ir.lookup(vector_var, "c"),
+                                               matrix_ty))))
+
+    weld_obj.weld_code = ir.result(ir.for_(
+        ir.rangeiter(i64(0), i64(rows), i64(1)),
+        ir.appender(WeldDouble()),
+        ir.lambda_([("b", None), ("i", None), ("r", WeldLong())],
+                   ir.merge("b", ir.result(_annotate(loopsize, row))))))
     return weld_obj
 
 
@@ -160,11 +240,6 @@ def exp(array, ty):
         array_var = array.obj_id
         weld_obj.dependencies[array_var] = array
 
-    weld_template = """
-       map(
-         %(array)s,
-         |ele: %(ty)s| exp(ele)
-       )
-    """
-    weld_obj.weld_code = weld_template % {"array": array_var, "ty": ty}
+    weld_obj.weld_code = ir.map_(
+        array_var, ir.lambda_([("ele", ty)], ir.call("exp", "ele")))
     return weld_obj
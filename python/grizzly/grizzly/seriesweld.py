@@ -1,8 +1,11 @@
+import numpy as np
 import pandas as pd
 
+import categories as dictionary
 import grizzly_impl
 from lazy_op import LazyOpResult, to_weld_type
 from weld.weldobject import *
+from strings import StringColumn
 
 import utils
 
@@ -15,9 +18,14 @@ class SeriesWeld(LazyOpResult):
         dim (int): Description
         expr (TYPE): Description
         weld_type (TYPE): Description
+        categories (pandas.Index): Dictionary of a dictionary-encoded
+            series, whose expr holds int32 codes, or None
+        index_categories (pandas.Index): Dictionary of a dictionary-encoded
+            index, or None
     """
 
-    def __init__(self, expr, weld_type, df=None, column_name=None, index_type=None, index_name=None):
+    def __init__(self, expr, weld_type, df=None, column_name=None, index_type=None, index_name=None,
+                 categories=None, index_categories=None):
         """Summary
 
         TODO: Implement an actual Index Object like how Pandas does
@@ -26,6 +34,8 @@ class SeriesWeld(LazyOpResult):
             weld_type (TYPE): Description
             df (None, optional): Description
             column_name (None, optional): Description
+            categories (None, optional): Dictionary of the codes in expr
+            index_categories (None, optional): Dictionary of the index codes
         """
         self.expr = expr
         self.weld_type = weld_type
@@ -34,6 +44,39 @@ class SeriesWeld(LazyOpResult):
         self.column_name = column_name
         self.index_type = index_type
         self.index_name = index_name
+        self.categories = categories
+        self.index_categories = index_categories
+
+    def _strings(self):
+        """Returns this dictionary-encoded series decoded to strings."""
+        return SeriesWeld(
+            grizzly_impl.lookup_codes(
+                self.expr,
+                dictionary.string_table(self.categories)
+            ),
+            WeldVec(WeldChar()),
+            self.df,
+            self.column_name
+        )
+
+    def _transform(self, values):
+        """Returns this dictionary-encoded series with each category replaced
+        by the corresponding entry of `values`, which is computed on the
+        dictionary rather than on every row."""
+        table, categories = dictionary.transform(self.categories, values)
+        return SeriesWeld(
+            grizzly_impl.lookup_codes(self.expr, table),
+            WeldInt(),
+            self.df,
+            self.column_name,
+            categories=categories
+        )
+
+    def _code(self, value):
+        """Returns the code of `value`, or -2 (which matches no row) if it
+        isn't in the dictionary."""
+        code = self.categories.get_indexer([value])[0]
+        return code if code >= 0 else -2
 
     def __getitem__(self, key):
         """Summary
@@ -65,7 +108,9 @@ class SeriesWeld(LazyOpResult):
                     self.df,
                     self.column_name,
                     self.index_type,
-                    self.index_name
+                    self.index_name,
+                    self.categories,
+                    self.index_categories
                 )
             else:
                 return SeriesWeld(
@@ -73,7 +118,9 @@ class SeriesWeld(LazyOpResult):
                         self.expr,
                         start,
                         stop
-                    )
+                    ),
+                    self.weld_type,
+                    categories=self.categories
                 )
         else:
             # By default we return as if the key were predicates to filter by
@@ -110,12 +157,14 @@ class SeriesWeld(LazyOpResult):
         Raises:
             Exception: Description
         """
-        if key == 'str' and self.weld_type == WeldVec(WeldChar()):
+        if key == 'str' and (self.weld_type == WeldVec(WeldChar()) or
+                             self.categories is not None):
             return StringSeriesWeld(
                 self.expr,
                 self.weld_type,
                 self.df,
-                self.column_name
+                self.column_name,
+                self.categories
             )
         raise AttributeError("Attr %s does not exist" % key)
 
@@ -129,23 +178,49 @@ class SeriesWeld(LazyOpResult):
                 ),
                 self.index_type,
                 self.df,
-                self.index_name
+                self.index_name,
+                categories=self.index_categories
             )
         # TODO : Make all series have a series attribute
         raise Exception("No index present")
 
-    def evaluate(self, verbose=False, passes=None):
+    def evaluate(self, verbose=False, passes=None, strings=None):
+        """Summary
+
+        Args:
+            verbose (bool, optional): Description
+            passes (list, optional): Description
+            strings (str, optional): Format of decoded strings: 'object'
+                (the default), 'fixed', 'column' or 'categorical' (see
+                LazyOpResult.evaluate). A series of strings decoded to a
+                StringColumn is returned as is, rather than as a pandas
+                Series. Dictionary-encoded series are decoded to
+                Categoricals
+
+        Returns:
+            TYPE: Description
+        """
         if self.index_type is not None:
             index, column = LazyOpResult(
                 self.expr,
                 WeldStruct([WeldVec(self.index_type), WeldVec(self.weld_type)]),
                 0
-            ).evaluate(verbose=verbose, passes=passes)
+            ).evaluate(verbose=verbose, passes=passes, strings=strings)
+            if self.categories is not None:
+                column = dictionary.decode(column, self.categories)
+            if self.index_categories is not None:
+                index = pd.CategoricalIndex(
+                    dictionary.decode(index, self.index_categories))
             series = pd.Series(column, index)
             series.index.rename(self.index_name, True)
             return series
         else:
-            column = LazyOpResult.evaluate(self, verbose=verbose, passes=passes)
+            column = LazyOpResult.evaluate(self, verbose=verbose, passes=passes,
+                                           strings=strings)
+            if isinstance(column, StringColumn):
+                return column
+            if self.categories is not None:
+                column = dictionary.decode(column, self.categories)
             return pd.Series(column)
 
     def sort_values(self, ascending=False):
@@ -167,7 +242,9 @@ class SeriesWeld(LazyOpResult):
                 self.df,
                 self.column_name,
                 self.index_type,
-                self.index_name
+                self.index_name,
+                self.categories,
+                self.index_categories
             )
         else:
             result_expr = grizzly_impl.sort(self.expr)
@@ -186,7 +263,8 @@ class SeriesWeld(LazyOpResult):
             ),
             self.weld_type,
             self.df,
-            self.column_name
+            self.column_name,
+            categories=self.categories
         )
 
     def lower(self):
@@ -197,6 +275,8 @@ class SeriesWeld(LazyOpResult):
         """
         # TODO : Bug in nested map operating on strings
         # TODO : Check that self.weld_type is a string type
+        if self.categories is not None:
+            return self._transform(self.categories.str.lower())
         vectype = self.weld_type
         if isinstance(vectype, WeldVec):
             elem_type = vectype.elemType
@@ -218,6 +298,17 @@ class SeriesWeld(LazyOpResult):
         Returns:
         TYPE: Description
         """
+        if self.categories is not None:
+            # Only the dictionary is searched.
+            table = np.append(
+                self.categories.str.contains(string, regex=False).values,
+                False)
+            return SeriesWeld(
+                grizzly_impl.lookup_codes(self.expr, table),
+                WeldBit(),
+                self.df,
+                self.column_name
+            )
         # Check that self.weld_type is a string type
         vectype = self.weld_type
         if isinstance(vectype, WeldVec):
@@ -237,6 +328,26 @@ class SeriesWeld(LazyOpResult):
 
     def isin(self, ls):
         if isinstance(ls, SeriesWeld):
+            if self.categories is not None and ls.categories is not None:
+                # Compare codes, translating ls to this series' dictionary.
+                ls_expr = ls.expr
+                if not ls.categories.equals(self.categories):
+                    ls_expr = grizzly_impl.lookup_codes(
+                        ls.expr,
+                        dictionary.code_table(ls.categories, self.categories)
+                    )
+                return SeriesWeld(
+                    grizzly_impl.isin(self.expr,
+                                      ls_expr,
+                                      WeldInt()),
+                    WeldBit(),
+                    self.df,
+                    self.column_name
+                )
+            if self.categories is not None:
+                return self._strings().isin(ls)
+            if ls.categories is not None:
+                return self.isin(ls._strings())
             if self.weld_type == ls.weld_type:
                 return SeriesWeld(
                     grizzly_impl.isin(self.expr,
@@ -325,6 +436,13 @@ class SeriesWeld(LazyOpResult):
         """
         if isinstance(predicates, SeriesWeld):
             predicates = predicates.expr
+        categories = self.categories
+        if categories is not None:
+            # Masked rows get the code of new_value, which is added to the
+            # dictionary if necessary.
+            if new_value not in categories:
+                categories = categories.append(pd.Index([new_value]))
+            new_value = categories.get_loc(new_value)
         return SeriesWeld(
             grizzly_impl.mask(
                 self.expr,
@@ -334,7 +452,8 @@ class SeriesWeld(LazyOpResult):
             ),
             self.weld_type,
             self.df,
-            self.column_name
+            self.column_name,
+            categories=categories
         )
 
     def filter(self, predicates):
@@ -348,7 +467,8 @@ class SeriesWeld(LazyOpResult):
             ),
             self.weld_type,
             self.df,
-            self.column_name
+            self.column_name,
+            categories=self.categories
         )
 
     def add(self, other):
@@ -535,6 +655,21 @@ class SeriesWeld(LazyOpResult):
         Returns:
             TYPE: Description
         """
+        if self.categories is not None:
+            if not isinstance(other, str):
+                return self._strings().__eq__(other)
+            # Compare codes with the code of other.
+            return SeriesWeld(
+                grizzly_impl.compare(
+                    self.expr,
+                    self._code(other),
+                    "==",
+                    WeldInt()
+                ),
+                WeldBit(),
+                self.df,
+                self.column_name
+            )
         return SeriesWeld(
             grizzly_impl.compare(
                 self.expr,
@@ -556,6 +691,21 @@ class SeriesWeld(LazyOpResult):
         Returns:
             TYPE: Description
         """
+        if self.categories is not None:
+            if not isinstance(other, str):
+                return self._strings().__ne__(other)
+            # Compare codes with the code of other.
+            return SeriesWeld(
+                grizzly_impl.compare(
+                    self.expr,
+                    self._code(other),
+                    "!=",
+                    WeldInt()
+                ),
+                WeldBit(),
+                self.df,
+                self.column_name
+            )
         return SeriesWeld(
             grizzly_impl.compare(
                 self.expr,
@@ -577,6 +727,8 @@ class SeriesWeld(LazyOpResult):
         Returns:
             TYPE: Description
         """
+        if self.categories is not None:
+            return self._strings().__gt__(other)
         return SeriesWeld(
             grizzly_impl.compare(
                 self.expr,
@@ -598,6 +750,8 @@ class SeriesWeld(LazyOpResult):
         Returns:
             TYPE: Description
         """
+        if self.categories is not None:
+            return self._strings().__ge__(other)
         if self.index_type is not None:
             expr = grizzly_impl.get_field(self.expr, 1)
         else:
@@ -623,6 +777,8 @@ class SeriesWeld(LazyOpResult):
         Returns:
             TYPE: Description
         """
+        if self.categories is not None:
+            return self._strings().__lt__(other)
         return SeriesWeld(
             grizzly_impl.compare(
                 self.expr,
@@ -644,6 +800,8 @@ class SeriesWeld(LazyOpResult):
         Returns:
             TYPE: Description
         """
+        if self.categories is not None:
+            return self._strings().__le__(other)
         return SeriesWeld(
             grizzly_impl.compare(
                 self.expr,
@@ -668,7 +826,8 @@ class StringSeriesWeld:
         weld_type (TYPE): Description
     """
 
-    def __init__(self, expr, weld_type, df=None, column_name=None):
+    def __init__(self, expr, weld_type, df=None, column_name=None,
+                 categories=None):
         """Summary
 
         Args:
@@ -676,12 +835,15 @@ class StringSeriesWeld:
             weld_type (TYPE): Description
             df (None, optional): Description
             column_name (None, optional): Description
+            categories (None, optional): Dictionary of a dictionary-encoded
+                series
         """
         self.expr = expr
         self.weld_type = weld_type
         self.dim = 1
         self.df = df
         self.column_name = column_name
+        self.categories = categories
 
     def slice(self, start, size):
         """Summary
@@ -693,6 +855,11 @@ class StringSeriesWeld:
         Returns:
             TYPE: Description
         """
+        if self.categories is not None:
+            series = SeriesWeld(self.expr, self.weld_type, self.df,
+                                self.column_name, categories=self.categories)
+            return series._transform(
+                self.categories.str.slice(start, start + size))
         return SeriesWeld(
             grizzly_impl.slice(
                 self.expr,
@@ -741,7 +908,9 @@ class WeldLocIndexer:
                         series.df,
                         series.column_name,
                         series.index_type,
-                        series.index_name
+                        series.index_name,
+                        series.categories,
+                        series.index_categories
                     )
             # TODO : Need to implement for non-pivot tables
         raise Exception("Cannot invoke getitem on non SeriesWeld object")
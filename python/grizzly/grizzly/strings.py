@@ -0,0 +1,98 @@
+"""Compact storage for columns of strings.
+
+NumPy stores strings either as Python objects or padded to the longest
+string in the array. A StringColumn instead keeps the bytes of all its
+strings in one buffer, with the offset at which each string starts, in the
+same layout as Arrow's string arrays. It is passed to Weld as a vec[vec[i8]]
+whose rows point into the buffer, and Weld's vectors of strings can be
+decoded back into one (see NumPyDecoder) without creating a Python object
+per row.
+"""
+
+import numpy as np
+
+
+class StringColumn(object):
+    """A column of byte strings stored as one buffer and an offsets array.
+
+    Row i is data[offsets[i]:offsets[i + 1]].
+
+    Attributes:
+        data (numpy.ndarray): uint8 array holding the bytes of every row
+        offsets (numpy.ndarray): int64 array of len(self) + 1 offsets into
+            data, starting at 0
+    """
+
+    # Like NumPy arrays, columns are mutable buffers, so WeldObjects give each
+    # one its own input name instead of keeping it alive in a cache keyed on
+    # its value.
+    __hash__ = None
+
+    def __init__(self, data, offsets):
+        """Summary
+
+        Args:
+            data (numpy.ndarray): The bytes of the rows
+            offsets (numpy.ndarray): The offsets of the rows, followed by
+                the total length
+
+        Raises:
+            ValueError: If the offsets don't describe rows of data
+        """
+        self.data = np.ascontiguousarray(data, dtype=np.uint8)
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        if (self.data.ndim != 1 or self.offsets.ndim != 1 or
+                len(self.offsets) == 0 or self.offsets[0] != 0 or
+                self.offsets[-1] > len(self.data)):
+            raise ValueError("Invalid string column offsets")
+
+    @staticmethod
+    def from_values(values, encoding="utf-8"):
+        """Builds a column from a sequence of strings.
+
+        Args:
+            values: Iterable of byte or unicode strings, e.g. a NumPy array
+                or a pandas Series
+            encoding (str): Encoding of unicode strings
+
+        Returns:
+            StringColumn
+        """
+        strings = [value if isinstance(value, bytes) else
+                   value.encode(encoding) for value in values]
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in strings], out=offsets[1:])
+        data = np.frombuffer(b"".join(strings), dtype=np.uint8)
+        return StringColumn(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        """Returns row i as a byte string."""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("String column index out of range")
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return "StringColumn(rows=%d, bytes=%d)" % (len(self), self.nbytes)
+
+    @property
+    def lengths(self):
+        """The length in bytes of each row."""
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self):
+        """The size of the data and offsets buffers."""
+        return self.data.nbytes + self.offsets.nbytes
+
+    def tolist(self):
+        """Returns the rows as a list of byte strings."""
+        return list(self)
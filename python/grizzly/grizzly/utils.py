@@ -1,3 +1,4 @@
+import categories as dictionary
 import grizzly_impl
 
 from lazy_op import LazyOpResult, to_weld_type
@@ -11,12 +12,7 @@ def merge(df1, df2):
         # TODO need to passin filtering by predicates as well here
         tys = []
         for col_name, raw_column in df1.raw_columns.items():
-            dtype = str(raw_column.dtype)
-            if dtype == 'object' or dtype == '|S64':
-                weld_type = WeldVec(WeldChar())
-            else:
-                weld_type = grizzly_impl.numpy_to_weld_type_mapping[dtype]
-            tys.append(weld_type)
+            tys.append(grizzly_impl.column_weld_type(raw_column))
 
         if len(tys) == 1:
             weld_type = tys[0]
@@ -28,17 +24,13 @@ def merge(df1, df2):
                 df1.raw_columns.values()
             ),
             df1.raw_columns.keys(),
-            weld_type
+            weld_type,
+            categories=df1.categories
         )
     if isinstance(df2, DataFrameWeld):
         tys = []
         for col_name, raw_column in df2.raw_columns.items():
-            dtype = str(raw_column.dtype)
-            if dtype == 'object' or dtype == '|S64':
-                weld_type = WeldVec(WeldChar())
-            else:
-                weld_type = grizzly_impl.numpy_to_weld_type_mapping[dtype]
-            tys.append(weld_type)
+            tys.append(grizzly_impl.column_weld_type(raw_column))
 
         if len(tys) == 1:
             weld_type = tys[0]
@@ -49,7 +41,8 @@ def merge(df1, df2):
                 df2.raw_columns.values()
             ),
             df2.raw_columns.keys(),
-            weld_type
+            weld_type,
+            categories=df2.categories
         )
     return df1.merge(df2)
 
@@ -70,6 +63,11 @@ def group_eval(objs, passes=None):
         if isinstance(ob, SeriesWeld):
             if ob.index_type is not None:
                 index, column = result
+                if ob.categories is not None:
+                    column = dictionary.decode(column, ob.categories)
+                if ob.index_categories is not None:
+                    index = pd.CategoricalIndex(
+                        dictionary.decode(index, ob.index_categories))
                 series = pd.Series(column, index)
                 series.index.rename(ob.index_name, True)
                 pd_results.append(series)
@@ -86,7 +84,11 @@ def group_eval(objs, passes=None):
                 columns = result
                 df_dict = {}
                 for i, column_name in enumerate(ob.column_names):
-                    df_dict[column_name] = columns[i]
+                    if column_name in ob.categories:
+                        df_dict[column_name] = dictionary.decode(
+                            columns[i], ob.categories[column_name])
+                    else:
+                        df_dict[column_name] = columns[i]
                 pd_results.append(pd.DataFrame(df_dict))
     return pd_results
 
@@ -1,6 +1,7 @@
 #!/usr/bin/python
 
 import grizzly.grizzly as gr
+import grizzly.grizzly_impl as grizzly_impl
 import pandas as pd
 import numpy as np
 import unittest
@@ -66,6 +67,54 @@ class PandasWeldTestMethods(unittest.TestCase):
         self.assertItemsEqual(["aaa", "bbb", "ccc"],
                               inp.unique().evaluate(False))
 
+    def test_string_encoding_cached(self):
+        df = pd.DataFrame({"k": ["aaa", "bbb", "aaa", "Ccc"]})
+        for compact_strings in (False, True):
+            frame = gr.DataFrameWeld(df, compact_strings=compact_strings)
+            column = frame.raw_columns["k"]
+            encoded = []
+            for i in range(2):
+                self.assertItemsEqual(
+                    ["aaa", "bbb", "Ccc"],
+                    list(frame["k"].unique().evaluate(False, strings='fixed')))
+                encoded.append(grizzly_impl.encoder_._cached_encoding(column))
+            # The second evaluation reuses the encoding of the first.
+            self.assertIsNotNone(encoded[0])
+            self.assertIs(encoded[0], encoded[1])
+
+    def test_string_column(self):
+        df = pd.DataFrame({"k": ["aaa", "bbb", "aaa", "Ccc"]})
+        inp = gr.DataFrameWeld(df, compact_strings=True)["k"]
+        self.assertItemsEqual(
+            ["aaa", "bbb", "Ccc"],
+            inp.unique().evaluate(False, strings='column').tolist())
+        self.assertSequenceEqual(
+            ["aaa", "bbb", "aaa", "ccc"], list(inp.lower().evaluate(False)))
+
+    def test_string_formats(self):
+        inp = gr.SeriesWeld(
+            np.array(["aaa", "bbb", "aaa", "ccc"], dtype=str),
+            gr.WeldVec(gr.WeldChar()))
+        fixed = inp.lower().evaluate(False, strings='fixed')
+        self.assertEqual("S3", fixed.dtype.str[1:])
+        self.assertSequenceEqual(["aaa", "bbb", "aaa", "ccc"], list(fixed))
+        categorical = inp.lower().evaluate(False, strings='categorical')
+        self.assertSequenceEqual(["aaa", "bbb", "ccc"],
+                                 list(categorical.cat.categories))
+
+    def test_categorical_eq_and_groupby(self):
+        df = gr.DataFrameWeld(pd.DataFrame({
+            "borough": ["QUEENS", "BROOKLYN", "QUEENS", "QUEENS"],
+            "complaint": ["Noise", "Heat", "Noise", "Heat"]}),
+            dictionary_encode=True)
+        noise = df["complaint"] == "Noise"
+        self.assertSequenceEqual([True, False, True, False],
+                                 list(noise.evaluate(False)))
+        sizes = df.groupby("complaint").size().evaluate(False)
+        self.assertEqual(2, sizes["Noise"])
+        self.assertItemsEqual(["BROOKLYN", "QUEENS"],
+                              list(df["borough"].unique().evaluate(False)))
+
     def test_sum(self):
         inp = gr.SeriesWeld(
             np.array([1, 2, 3, 4, 5], dtype=np.int32), gr.WeldInt())
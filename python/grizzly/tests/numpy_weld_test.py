@@ -24,6 +24,13 @@ class NumPyWeldTestMethods(unittest.TestCase):
         self.assertItemsEqual([8, 11, 14], npw.dot(
             matrix, vector).evaluate(False))
 
+    def test_dot_fortran_order(self):
+        matrix = np.asfortranarray(
+            np.array([[1, 2, 3], [2, 3, 4], [3, 4, 5], [4, 5, 6]], dtype=np.int64))
+        vector = np.array([0, 1, 2], dtype=np.int64)
+        self.assertItemsEqual([8, 11, 14, 17], npw.dot(
+            matrix, vector).evaluate(False))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,10 @@
+import gc
 import numpy as np
 import py.test
 import random
+from weld import metrics
+from weld.weldobject import WeldValueOwner
+import weldnumpy
 from weldnumpy import weldarray, erf as welderf
 import scipy.special as ss
 
@@ -23,7 +27,7 @@ UNARY_OPS = [np.exp, np.log, np.sqrt]
 # TODO: Add wa.erf - doesn't use the ufunc functionality of numpy so not doing it for
 # now.
 BINARY_OPS = [np.add, np.subtract, np.multiply, np.divide]
-REDUCE_UFUNCS = [np.add.reduce, np.multiply.reduce]
+REDUCE_UFUNCS = [np.add.reduce, np.multiply.reduce, np.minimum.reduce, np.maximum.reduce]
 
 # FIXME: weld mergers dont support non-commutative ops --> need to find a workaround for this.
 # REDUCE_UFUNCS = [np.add.reduce, np.subtract.reduce, np.multiply.reduce, np.divide.reduce]
@@ -995,3 +999,115 @@ def test_erf():
         # __array_ufunc__.
         # assert np.array_equal(w2_eval, n2)
 
+def test_result_memory_freed():
+    '''
+    Evaluated arrays are zero-copy views of Weld's memory, which is freed once they are garbage
+    collected.
+    '''
+    n, w = random_arrays(NUM_ELS, 'float64')
+    w2 = np.exp(w)
+    arr = w2._eval()
+    assert np.allclose(arr, np.exp(n))
+
+    owner = arr.base.owner
+    assert isinstance(owner, WeldValueOwner)
+    value = owner.value
+    assert not value.freed
+
+    del w2, arr, owner
+    gc.collect()
+    assert value.freed
+
+def test_evaluation_metrics():
+    '''
+    Evaluations report their metrics to the registered sinks.
+    '''
+    n, w = random_arrays(NUM_ELS, 'float64')
+    sink = metrics.add_sink(metrics.RingBufferSink())
+    try:
+        arr = np.exp(w)._eval()
+    finally:
+        metrics.remove_sink(sink)
+    assert np.allclose(arr, np.exp(n))
+
+    record = sink.records()[-1]
+    assert record.bytes_encoded >= n.nbytes
+    assert record.bytes_decoded == arr.nbytes
+    assert record.compile_time is not None
+    assert record.run_time >= 0
+
+def test_repeated_operands():
+    '''
+    Ops whose operands are the same expression (e.g. w * w) compute it once, so the program stays
+    linear in the number of ops.
+    '''
+    n, w = random_arrays(NUM_ELS, 'float64')
+    n = n / np.max(n)
+    w = weldarray(n)
+    for i in range(30):
+        n = n * n
+        w = w * w
+    assert np.allclose(w.evaluate(), n)
+
+def test_materialization_policy():
+    '''
+    Long chains of ops are evaluated as they are built, when they go over the policy's limits.
+    '''
+    n, w = random_arrays(NUM_ELS, 'float64')
+    previous = weldnumpy.set_policy(weldnumpy.EvaluationPolicy(max_depth=8))
+    stats = weldnumpy.get_stats()
+    stats.clear()
+    try:
+        for i in range(50):
+            np.add(w, 1.0, out=w)
+            n += 1.0
+    finally:
+        weldnumpy.set_policy(previous)
+    assert w._lazy_depth <= 8
+    assert np.allclose(w.evaluate(), n)
+    assert stats.counts['depth'] == 50 // 9
+    assert all(event.depth == 9 for event in stats.events())
+
+def test_dispatch():
+    '''
+    Ops which NumPy computes faster than Weld can compile them run in NumPy.
+    '''
+    n, w = random_arrays(NUM_ELS, 'float64')
+    dispatcher = weldnumpy.Dispatcher()
+    previous = weldnumpy.set_dispatcher(dispatcher)
+    try:
+        w2 = np.exp(w)
+        assert w2._lazy_size == 0
+        assert dispatcher.stats.counts == {'numpy': 1}
+
+        dispatcher.profile.numpy_seconds_per_element = 1.0
+        w3 = np.exp(w)
+        assert w3._lazy_size == 1
+        assert dispatcher.stats.decisions()[-1].route == 'weld'
+
+        # In place ops in NumPy don't change the values lazy weldarrays read.
+        dispatcher.profile.numpy_seconds_per_element = 0.0
+        n = n.copy()
+        w4 = np.add(w, 1.0, out=w)
+        assert w4 is w
+        assert dispatcher.stats.decisions()[-1].route == 'numpy'
+    finally:
+        weldnumpy.set_dispatcher(previous)
+    assert np.allclose(w2, np.exp(n))
+    assert np.allclose(w3.evaluate(), np.exp(n))
+    assert np.allclose(w, n + 1.0)
+
+def test_default_dispatcher(monkeypatch):
+    '''
+    Ops always run in Weld unless dispatch is enabled with WELDNUMPY_DISPATCH.
+    '''
+    from weldnumpy import dispatch
+    monkeypatch.delenv(dispatch.PROFILE_ENV, raising=False)
+    monkeypatch.delenv(dispatch.DISPATCH_ENV, raising=False)
+    monkeypatch.setattr(dispatch, '_dispatcher', None)
+    monkeypatch.setattr(dispatch, '_dispatcher_set', False)
+    assert weldnumpy.get_dispatcher() is None
+
+    monkeypatch.setenv(dispatch.DISPATCH_ENV, '1')
+    dispatch._dispatcher_set = False
+    assert isinstance(weldnumpy.get_dispatcher(), weldnumpy.Dispatcher)
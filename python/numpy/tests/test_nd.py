@@ -0,0 +1,142 @@
+import numpy as np
+import weldnumpy
+from weld import ir, metrics
+from weldnumpy import weldarray
+
+SHAPE = (4, 5, 6)
+
+def random_arrays(shape, dtype):
+    '''
+    Generates a random N-d numpy array of the given shape, and a weldarray of it.
+    '''
+    test = np.array(np.random.rand(*shape) + 1, dtype=dtype)
+    return test, weldarray(test)
+
+def test_elemwise():
+    n, w = random_arrays(SHAPE, 'float64')
+    n2, w2 = random_arrays(SHAPE, 'float64')
+    w3 = np.exp(w) * w2 + 2.0
+    assert w3.shape == SHAPE
+    assert np.allclose(w3.evaluate(), np.exp(n) * n2 + 2.0)
+
+def test_strided_views():
+    '''
+    Views of numpy arrays are read in place, without copying them.
+    '''
+    orig = np.random.rand(20, 20)
+    for idx in [np.s_[3:15, 4:20:2], np.s_[::-1, ::3], np.s_[:, 1]]:
+        a = orig[idx]
+        w = weldarray(a)
+        assert np.allclose(np.sqrt(w).evaluate(), np.sqrt(a))
+
+def test_getitem():
+    n, w = random_arrays(SHAPE, 'float32')
+    w = w + 1.0
+    n = n + 1.0
+    assert np.allclose(w[1:3, ::2], n[1:3, ::2])
+    assert np.allclose((w[2] * 2.0).evaluate(), n[2] * 2.0)
+    assert w[1, 2, 3] == n[1, 2, 3]
+
+def test_setitem():
+    n, w = random_arrays(SHAPE, 'float64')
+    w = w * 2.0
+    n = n * 2.0
+    w[1, :, 2] = 7.0
+    n[1, :, 2] = 7.0
+    assert np.allclose((w + 1.0).evaluate(), n + 1.0)
+
+    # Arrays computed from w before an update keep their values.
+    w2 = w * 2.0
+    n2 = n * 2.0
+    w[0, 0] = 3.0
+    n[0, 0] = 3.0
+    assert np.allclose(w2.evaluate(), n2)
+    assert np.allclose(w, n)
+
+def test_transpose():
+    n, w = random_arrays(SHAPE, 'float64')
+    assert np.allclose((w.T * 3.0).evaluate(), n.T * 3.0)
+    assert np.allclose(np.exp(w).T.evaluate(), np.exp(n).T)
+
+def test_reduce():
+    n, w = random_arrays(SHAPE, 'int64')
+    assert np.sum(w) == np.sum(n)
+    assert np.max(w) == np.max(n)
+
+def test_reduce_outputs():
+    '''
+    Reductions into outputs, and full reductions with keepdims, are computed by NumPy.
+    '''
+    n, w = random_arrays(SHAPE, 'float64')
+    o = np.zeros(())
+    assert np.add.reduce(w * 2.0, axis=None, out=o) is o
+    assert np.allclose(o, np.sum(n * 2.0))
+    o = np.zeros(SHAPE[1:])
+    np.multiply.reduce(w, axis=0, out=o)
+    assert np.allclose(o, np.prod(n, axis=0))
+    o = weldarray(np.zeros(SHAPE[:2]))
+    assert np.maximum.reduce(w, axis=2, out=o) is o
+    assert np.allclose(o.evaluate(), np.max(n, axis=2))
+    total = np.sum(np.exp(w), keepdims=True)
+    assert total.shape == (1, 1, 1)
+    assert np.allclose(total, np.sum(np.exp(n), keepdims=True))
+
+def test_axis_reduce():
+    '''
+    Reductions along an axis return lazy weldarrays, computed with the ops registered before them.
+    '''
+    for t in ['float64', 'int32']:
+        n, w = random_arrays(SHAPE, t)
+        for op in [np.sum, np.prod, np.min, np.max, np.mean]:
+            for axis in [0, 1, -1, (0, 2)]:
+                w2 = op(w * 2, axis=axis)
+                assert isinstance(w2, weldarray)
+                assert w2.weldobj.weld_code != ir.ident(w2.name)
+                n2 = op(n * 2, axis=axis)
+                assert w2.shape == n2.shape and w2.dtype == n2.dtype
+                assert np.allclose(w2.evaluate(), n2)
+
+    n, w = random_arrays(SHAPE, 'float32')
+    assert np.allclose(np.sum(np.exp(w), axis=1, keepdims=True), np.sum(np.exp(n), axis=1,
+                                                                         keepdims=True))
+    assert np.allclose(w.T.max(axis=0), n.T.max(axis=0))
+
+    n = np.full((3, 4), -np.inf)
+    n[1, 2] = np.inf
+    w = weldarray(n)
+    assert np.array_equal(np.max(w, axis=1).evaluate(), np.max(n, axis=1))
+    assert np.array_equal(np.min(-w, axis=0).evaluate(), np.min(-n, axis=0))
+
+def test_lazy_scalars():
+    '''
+    Full reductions return lazy weldscalars, and arithmetic on them stays lazy.
+    '''
+    n, w = random_arrays(SHAPE, 'float64')
+    w2 = np.exp(w) * 2.0
+    n2 = np.exp(n) * 2.0
+    total = np.sum(w2)
+    assert isinstance(total, weldnumpy.weldscalar)
+    var = np.sum(w2 * w2) / w2.size - (total / w2.size) ** 2
+    assert isinstance(var, weldnumpy.weldscalar)
+    low, mean = w2.min(), np.mean(w2)
+
+    # The reductions of w2 are computed in a single evaluation.
+    sink = metrics.add_sink(metrics.RingBufferSink())
+    try:
+        values = [var.evaluate(), low.evaluate(), mean.evaluate()]
+    finally:
+        metrics.remove_sink(sink)
+    assert len(sink.records()) == 1
+    assert np.allclose(values, [np.var(n2), n2.min(), np.mean(n2)])
+    assert np.allclose((w - np.mean(w)).evaluate(), n - np.mean(n))
+
+    # Reductions keep the values of the array when they were taken, whether it's updated with
+    # setitem, or by numpy writing through a view.
+    expected = np.sum(n)
+    total = np.sum(w)
+    w[0, 0] = 100.0
+    w3 = weldarray(n.flatten())
+    view = w3[0:10]
+    total3 = np.sum(w3)
+    np.floor(view, out=view)
+    assert np.isclose(total, expected) and np.isclose(total3, expected)
@@ -1,5 +1,8 @@
 from weldarray import *
 from weldnumpy import *
+from materialize import EvaluationPolicy, MaterializationStats, get_policy, set_policy, get_stats
+from weldscalar import weldscalar
+from dispatch import DispatchProfile, Dispatcher, DispatchStats, get_dispatcher, set_dispatcher
 
 # importing everything from numpy so we can selectively over-ride the array creation routines, and
 # let other functions go to numpy.
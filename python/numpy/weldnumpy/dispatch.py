@@ -0,0 +1,250 @@
+import collections
+import json
+import os
+import time
+
+import numpy as np
+from weld import ir
+from weld.session import get_session
+from weld.types import WeldVec
+from weld.weldobject import WeldObject
+from weld.encoders import NumpyArrayEncoder, NumpyArrayDecoder
+from weldnumpy import SUPPORTED_DTYPES
+
+# Environment variable which, if set to a non-empty value other than 0, makes weldarrays dispatch
+# their ufuncs with a default Dispatcher. Otherwise they always run in Weld unless a dispatcher is
+# set with set_dispatcher.
+DISPATCH_ENV = 'WELDNUMPY_DISPATCH'
+
+# Environment variable naming a file with the default dispatcher's DispatchProfile. If the file
+# doesn't exist, the profile is calibrated when weldnumpy first dispatches an op, and saved there.
+PROFILE_ENV = 'WELDNUMPY_PROFILE'
+
+class DispatchProfile(object):
+    '''
+    The costs, in seconds, the dispatcher estimates the cost of an op with.
+
+    @numpy_seconds_per_element: NumPy's time to compute an op, per element.
+    @weld_seconds_per_element: Weld's time to compute an op, per element.
+    @weld_call_seconds: the fixed cost of an evaluation in Weld (encoding, running and decoding).
+    @compile_seconds: the time to compile a program of one op.
+    @compile_seconds_per_op: the time each further op adds to the compile time.
+    '''
+    _fields = ('numpy_seconds_per_element', 'weld_seconds_per_element', 'weld_call_seconds',
+               'compile_seconds', 'compile_seconds_per_op')
+
+    def __init__(self, numpy_seconds_per_element=1e-9, weld_seconds_per_element=5e-10,
+                 weld_call_seconds=1e-4, compile_seconds=0.05, compile_seconds_per_op=0.005):
+        self.numpy_seconds_per_element = numpy_seconds_per_element
+        self.weld_seconds_per_element = weld_seconds_per_element
+        self.weld_call_seconds = weld_call_seconds
+        self.compile_seconds = compile_seconds
+        self.compile_seconds_per_op = compile_seconds_per_op
+
+    def __repr__(self):
+        return 'DispatchProfile(%s)' % ', '.join(
+            '%s=%r' % (field, getattr(self, field)) for field in self._fields)
+
+    def to_dict(self):
+        return dict((field, getattr(self, field)) for field in self._fields)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+    @staticmethod
+    def load(path):
+        with open(path) as f:
+            values = json.load(f)
+        return DispatchProfile(**dict((str(k), v) for k, v in values.items()
+                                      if k in DispatchProfile._fields))
+
+    @staticmethod
+    def calibrate(num_elements=1 << 16, repeat=5):
+        '''
+        Measures the costs with a micro-benchmark of adding float64 arrays, which takes a
+        fraction of a second.
+        '''
+        def best(f):
+            times = []
+            for _ in range(repeat):
+                start = time.time()
+                f()
+                times.append(time.time() - start)
+            return min(times)
+
+        large = np.random.rand(num_elements)
+        small = np.random.rand(1)
+        numpy_time = best(lambda: np.add(large, large))
+
+        def prepare(num_ops):
+            obj = WeldObject(NumpyArrayEncoder(), NumpyArrayDecoder())
+            code = ir.ident(obj.update(large, SUPPORTED_DTYPES['float64']))
+            for i in range(num_ops):
+                code = ir.map_(code, ir.lambda_([('z', None)],
+                                                ir.binop('+', 'z', ir.literal(i, 'f64'))))
+            obj.weld_code = code
+            return obj.prepare(WeldVec(SUPPORTED_DTYPES['float64']), cache=False)
+
+        compile_one = best(lambda: prepare(1))
+        compile_many = best(lambda: prepare(9))
+        function = prepare(1)
+        call_small = best(lambda: function(small))
+        call_large = best(lambda: function(large))
+        return DispatchProfile(
+            numpy_seconds_per_element=numpy_time / num_elements,
+            weld_seconds_per_element=max(call_large - call_small, 0.0) / num_elements,
+            weld_call_seconds=call_small,
+            compile_seconds=compile_one,
+            compile_seconds_per_op=max(compile_many - compile_one, 0.0) / 8)
+
+DispatchDecision = collections.namedtuple(
+    'DispatchDecision',
+    ['timestamp', 'op', 'num_elements', 'depth', 'cached', 'numpy_cost', 'weld_cost', 'route'])
+
+class DispatchStats(object):
+    '''
+    Records the dispatcher's decisions.
+
+    @counts: dict, number of ops routed to each of 'numpy' and 'weld'.
+    decisions() returns the latest DispatchDecisions, oldest first.
+    '''
+    def __init__(self, capacity=1024):
+        self._decisions = collections.deque(maxlen=capacity)
+        self.counts = {}
+
+    def __repr__(self):
+        return 'DispatchStats(counts=%r)' % (self.counts,)
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def record(self, decision):
+        self._decisions.append(decision)
+        self.counts[decision.route] = self.counts.get(decision.route, 0) + 1
+
+    def decisions(self):
+        return list(self._decisions)
+
+    def clear(self):
+        self._decisions.clear()
+        self.counts = {}
+
+class Dispatcher(object):
+    '''
+    Decides whether weldarray's ufuncs run lazily in Weld or right away in NumPy, by comparing
+    the estimated cost of each.
+
+    An op on arrays without pending ops costs NumPy its time per element, and Weld the fixed cost
+    of an evaluation and its time per element, plus the time to compile the op unless a module
+    for it is already in the session's module cache. An op on an array with pending ops only adds
+    its per element time, and the time to compile one more op, to a program Weld has to compile
+    and run anyway (routing it to NumPy evaluates the pending ops first). So small arrays are
+    computed by NumPy, unless Weld has a compiled module at hand.
+
+    @profile: DispatchProfile, the costs to estimate with.
+    '''
+    def __init__(self, profile=None):
+        if profile is None:
+            profile = DispatchProfile()
+        self.profile = profile
+        self.stats = DispatchStats()
+        # Normalized Weld program of each shape of op on arrays without pending ops.
+        self._programs = {}
+
+    def __repr__(self):
+        return 'Dispatcher(%r)' % (self.profile,)
+
+    def estimate(self, num_elements, depth, cached):
+        '''
+        @ret: (estimated cost of the op in NumPy, estimated cost in Weld), in seconds.
+        '''
+        p = self.profile
+        numpy_cost = p.numpy_seconds_per_element * num_elements
+        weld_cost = p.weld_seconds_per_element * num_elements
+        if depth > 0:
+            weld_cost += p.compile_seconds_per_op
+        else:
+            weld_cost += p.weld_call_seconds
+            if not cached:
+                weld_cost += p.compile_seconds
+        return numpy_cost, weld_cost
+
+    def choose(self, op, num_elements, depth, program=None, verbose=False):
+        '''
+        @op: str, name of the op, for the stats.
+        @depth: the largest depth of the ops pending on the op's weldarray operands.
+        @program: function returning the normalized Weld program of the op, which is only called
+        (to check whether it is in the module cache) when that decides the route.
+        @ret: 'numpy' or 'weld'.
+        '''
+        numpy_cost, weld_cost = self.estimate(num_elements, depth, False)
+        cached = False
+        if depth == 0 and numpy_cost < weld_cost and program is not None:
+            # Weld only wins if it doesn't have to compile the op.
+            if self.estimate(num_elements, depth, True)[1] < weld_cost:
+                cached = self._is_cached(program())
+                if cached:
+                    numpy_cost, weld_cost = self.estimate(num_elements, depth, True)
+        route = 'numpy' if numpy_cost < weld_cost else 'weld'
+        self.stats.record(DispatchDecision(time.time(), op, num_elements, depth, cached,
+                                           numpy_cost, weld_cost, route))
+        if verbose:
+            print('dispatching %s on %d elements to %s (estimated NumPy %.2es, Weld %.2es)' % (
+                op, num_elements, route, numpy_cost, weld_cost))
+        return route
+
+    def program(self, key, build):
+        '''
+        @ret: the normalized program for the op shape key, built with build() the first time.
+        '''
+        program = self._programs.get(key)
+        if program is None:
+            program = build()
+            self._programs[key] = program
+        return program
+
+    @staticmethod
+    def _is_cached(program):
+        session = get_session()
+        cache = session.get_cache(True)
+        return cache is not None and cache.contains(program, session.compile_conf())
+
+def _default_dispatcher():
+    if os.environ.get(DISPATCH_ENV, '0') in ('', '0'):
+        return None
+    path = os.environ.get(PROFILE_ENV)
+    if not path:
+        return Dispatcher()
+    if os.path.exists(path):
+        return Dispatcher(DispatchProfile.load(path))
+    profile = DispatchProfile.calibrate()
+    profile.save(path)
+    return Dispatcher(profile)
+
+_dispatcher = None
+_dispatcher_set = False
+
+def get_dispatcher():
+    '''
+    @ret: the Dispatcher of weldarray's ufuncs, or None if they always run in Weld. Unless one was
+    set, there is no dispatcher, or, if the WELDNUMPY_DISPATCH environment variable is set, a
+    default one created on first use, with the profile in the file named by the
+    WELDNUMPY_PROFILE environment variable if it is set.
+    '''
+    global _dispatcher, _dispatcher_set
+    if not _dispatcher_set:
+        _dispatcher = _default_dispatcher()
+        _dispatcher_set = True
+    return _dispatcher
+
+def set_dispatcher(dispatcher):
+    '''
+    @dispatcher: Dispatcher, or None to always run weldarray's ufuncs in Weld.
+    @ret: the previous dispatcher.
+    '''
+    global _dispatcher, _dispatcher_set
+    previous = get_dispatcher()
+    _dispatcher = dispatcher
+    _dispatcher_set = True
+    return previous
@@ -0,0 +1,133 @@
+import collections
+import time
+
+class EvaluationPolicy(object):
+    '''
+    Decides when a weldarray's lazily registered ops are evaluated before something asks for
+    the array's values.
+
+    Every op on a weldarray extends the Weld program that computes it, so a loop of many ops (or
+    of writes into views, which each add a loop over the whole base array) builds a program
+    whose compile time can far exceed its run time. The policy tracks the program's depth (the
+    longest chain of ops) and size (the number of ops) and materializes the array - evaluates
+    it, and continues from the result - when either goes over its limit, or when the estimated
+    time to compile the pending ops exceeds max_compile_ratio times the estimated time of the
+    extra pass over the array that materializing it costs. The programs built between
+    materializations are then short, and since they usually repeat, mostly found in the module
+    cache.
+
+    @max_depth: int, or None for no limit.
+    @max_size: int, or None for no limit.
+    @max_compile_ratio: float, or None to not compare the estimated costs.
+    @min_size: programs with fewer ops are never materialized because of their estimated cost,
+    so that short chains of ops are still fused.
+    @compile_seconds_per_op: estimated compile time of each op.
+    @materialize_seconds_per_element: estimated time to write out and read back each element.
+    '''
+    def __init__(self, max_depth=64, max_size=256, max_compile_ratio=4.0, min_size=16,
+                 compile_seconds_per_op=0.005, materialize_seconds_per_element=2e-9):
+        for name, value in (('max_depth', max_depth), ('max_size', max_size),
+                            ('max_compile_ratio', max_compile_ratio)):
+            if value is not None and value <= 0:
+                raise ValueError('%s must be positive or None' % name)
+        self.max_depth = max_depth
+        self.max_size = max_size
+        self.max_compile_ratio = max_compile_ratio
+        self.min_size = min_size
+        self.compile_seconds_per_op = compile_seconds_per_op
+        self.materialize_seconds_per_element = materialize_seconds_per_element
+
+    def __repr__(self):
+        return ('EvaluationPolicy(max_depth=%r, max_size=%r, max_compile_ratio=%r, min_size=%r)'
+                % (self.max_depth, self.max_size, self.max_compile_ratio, self.min_size))
+
+    def estimate(self, size, num_elements):
+        '''
+        @ret: (estimated compile time of size ops, estimated time to materialize num_elements),
+        in seconds.
+        '''
+        return (self.compile_seconds_per_op * size,
+                self.materialize_seconds_per_element * num_elements)
+
+    def check(self, depth, size, num_elements):
+        '''
+        @ret: str, the reason to materialize a program of the given depth and size over
+        num_elements elements ('depth', 'size' or 'cost'), or None to keep it lazy.
+        '''
+        if self.max_depth is not None and depth > self.max_depth:
+            return 'depth'
+        if self.max_size is not None and size > self.max_size:
+            return 'size'
+        if self.max_compile_ratio is not None and size >= self.min_size:
+            compile_time, materialize_time = self.estimate(size, num_elements)
+            if compile_time > self.max_compile_ratio * materialize_time:
+                return 'cost'
+        return None
+
+MaterializationEvent = collections.namedtuple(
+    'MaterializationEvent',
+    ['timestamp', 'reason', 'depth', 'size', 'num_elements', 'estimated_compile_time',
+     'estimated_materialize_time', 'eval_time'])
+
+class MaterializationStats(object):
+    '''
+    Records the materializations the evaluation policy triggered.
+
+    @counts: dict, number of materializations by reason ('depth', 'size' or 'cost').
+    @total_eval_time: time spent evaluating materialized arrays, in seconds.
+    events() returns the latest MaterializationEvents, oldest first.
+    '''
+    def __init__(self, capacity=1024):
+        self._events = collections.deque(maxlen=capacity)
+        self.counts = {}
+        self.total_eval_time = 0.0
+
+    def __repr__(self):
+        return 'MaterializationStats(counts=%r, total_eval_time=%r)' % (
+            self.counts, self.total_eval_time)
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def record(self, event):
+        self._events.append(event)
+        self.counts[event.reason] = self.counts.get(event.reason, 0) + 1
+        self.total_eval_time += event.eval_time
+
+    def events(self):
+        return list(self._events)
+
+    def clear(self):
+        self._events.clear()
+        self.counts = {}
+        self.total_eval_time = 0.0
+
+_policy = EvaluationPolicy()
+_stats = MaterializationStats()
+
+def get_policy():
+    '''
+    @ret: the EvaluationPolicy of all weldarrays, or None if they are only evaluated on demand.
+    '''
+    return _policy
+
+def set_policy(policy):
+    '''
+    @policy: EvaluationPolicy, or None to only evaluate weldarrays on demand.
+    @ret: the previous policy.
+    '''
+    global _policy
+    previous = _policy
+    _policy = policy
+    return previous
+
+def get_stats():
+    '''
+    @ret: the MaterializationStats of all weldarrays.
+    '''
+    return _stats
+
+def _record(policy, reason, depth, size, num_elements, eval_time):
+    compile_time, materialize_time = policy.estimate(size, num_elements)
+    _stats.record(MaterializationEvent(time.time(), reason, depth, size, num_elements,
+                                       compile_time, materialize_time, eval_time))
@@ -1,6 +1,87 @@
+import time
+
+from weld import ir
 from weld.weldobject import *
 from weld.encoders import NumpyArrayEncoder, NumpyArrayDecoder
 from weldnumpy import *
+from weldscalar import weldscalar, _Reduction, _compute_readers, _program
+import dispatch
+import materialize
+
+def _strided_code(buf, weld_type, offset, shape, strides):
+    '''
+    @buf: ir.Expr, a flat vector.
+    @ret: ir.Expr, the elements at buf[offset + sum(idx * strides)] for every index idx of an array
+    of the given shape, as a vector in C order.
+
+    Each row (along the last axis) is an iter over buf if its stride is positive; the rows are
+    iterated over with a rangeiter, whose index is split into the leading indices.
+    '''
+    def i64(value):
+        return ir.literal(value, 'i64')
+
+    def row(start, builder):
+        cols, stride = shape[-1], strides[-1]
+        if stride > 0:
+            # Weld's iter can't end past the buffer, so end right after the last element.
+            end = ir.binop('+', start, i64((cols - 1) * stride + 1))
+            return ir.for_(ir.iter_(buf, start, end, i64(stride)), builder,
+                           ir.lambda_([('b2', None), ('j', None), ('e', None)],
+                                      ir.merge('b2', 'e')))
+        index = ir.binop('+', start, ir.binop('*', 'c', i64(stride)))
+        return ir.for_(ir.rangeiter(i64(0), i64(cols), i64(1)), builder,
+                       ir.lambda_([('b2', None), ('j', None), ('c', 'i64')],
+                                  ir.merge('b2', ir.lookup(buf, index))))
+
+    if len(shape) == 1:
+        return ir.result(row(i64(offset), ir.appender(weld_type)))
+
+    num_rows = int(np.prod(shape[:-1]))
+    start = i64(offset)
+    inner = 1
+    for dim, stride in reversed(list(zip(shape[:-1], strides[:-1]))):
+        if dim > 1:
+            index = ir.ident('r') if inner == 1 else ir.binop('/', 'r', i64(inner))
+            if inner * dim < num_rows:
+                index = ir.binop('%', index, i64(dim))
+            if stride != 1:
+                index = ir.binop('*', index, i64(stride))
+            start = ir.binop('+', start, index)
+        inner *= dim
+    return ir.result(ir.for_(ir.rangeiter(i64(0), i64(num_rows), i64(1)),
+                             ir.appender(weld_type),
+                             ir.lambda_([('b', None), ('i', None), ('r', 'i64')],
+                                        row(start, 'b'))))
+
+def _is_c_contiguous(shape, strides, itemsize):
+    '''
+    @ret: Bool, if an array with the given shape and strides (in bytes) is C-contiguous.
+    '''
+    expected = itemsize
+    for dim, stride in reversed(list(zip(shape, strides))):
+        if dim > 1 and stride != expected:
+            return False
+        expected *= dim
+    return True
+
+def _reduce_identity(op, dtype):
+    '''
+    @op: str, binop of a Weld merger (see REDUCE_OPS).
+    @ret: ir.Expr, the identity of op for elements of the given dtype. As for Weld's mergers, that
+    of min and max is the largest and smallest value (infinity for floats).
+    '''
+    weld_type = SUPPORTED_DTYPES[str(dtype)]
+    if op in ('+', '*'):
+        return ir.literal(0 if op == '+' else 1, weld_type)
+    if dtype.kind == 'f':
+        # Infinity isn't a valid literal.
+        return ir.binop('/', ir.literal(1.0 if op == 'min' else -1.0, weld_type),
+                        ir.literal(0.0, weld_type))
+    largest = ir.literal(int(np.iinfo(dtype).max), weld_type)
+    if op == 'min':
+        return largest
+    # The smallest value, -largest - 1, isn't a valid literal.
+    return ir.binop('-', ir.unop('-', largest), ir.literal(1, weld_type))
 
 class weldarray(np.ndarray):
     '''
@@ -14,8 +95,14 @@ class weldarray(np.ndarray):
     able to deal with the 2nd and 3rd case in __getitem__ so there does not seem to be any need to
     use __array_finalize (besides __array_finalize__ also adds a function call to the creation of a
     new array, which adds to the overhead compared to numpy for initializing arrays)
+
+    Arrays can have any number of dimensions. Weld computes a weldarray as a flat vector of its
+    elements in C order, so elementwise ops are flat loops whatever the shape, and results are
+    reshaped when they are evaluated. Strided arrays (e.g. views of a numpy array, or of a
+    transposed array) are passed to Weld as the contiguous memory they view, and read with
+    strided loops (see _strided_code) rather than copied.
     '''
-    def __new__(cls, input_array, verbose=True, *args, **kwargs):
+    def __new__(cls, input_array, verbose=False, *args, **kwargs):
         '''
         @input_array: original ndarray from which the new array is derived.
         '''
@@ -53,12 +140,48 @@ class weldarray(np.ndarray):
         if isinstance(obj, weldarray):
             # self was not generated through a call to __new__ so we should update self's
             # properties
-            self.name = obj.name
-            # TODO: Or maybe just set them equal to each other?
-            self._gen_weldobj(obj)
             self._verbose = obj._verbose
             self._weldarray_view = obj._weldarray_view
             self._weld_type = obj._weld_type
+            if self._same_values(obj):
+                self.name = obj.name
+                # TODO: Or maybe just set them equal to each other?
+                self._gen_weldobj(obj)
+            else:
+                # e.g. arr.T, which views obj's memory in a different layout.
+                self._gen_weldobj(self._values_of(obj))
+
+    def _same_values(self, obj):
+        '''
+        @obj: weldarray self was created from.
+        @ret: Bool, whether the elements of self in C order are those of obj in C order, so that
+        self can share obj's weld_code: self is a copy of obj, or views its memory in the same
+        layout (or in another C-contiguous shape).
+        '''
+        if self.size != obj.size:
+            return False
+        shared = np.may_share_memory(self.view(np.ndarray), obj.view(np.ndarray))
+        same_memory = addr(self) == addr(obj)
+        if self.shape == obj.shape and (not shared or (same_memory and
+                                                       self.strides == obj.strides)):
+            return True
+        return self.flags.c_contiguous and obj.flags.c_contiguous and (not shared or same_memory)
+
+    def _values_of(self, obj):
+        '''
+        @obj: weldarray whose memory self views in a different layout.
+        @ret: ndarray with the values of self.
+        '''
+        if obj._in_memory:
+            return self.view(np.ndarray)
+        if obj.flags.c_contiguous and np.may_share_memory(self.view(np.ndarray),
+                                                          obj.view(np.ndarray)):
+            # obj's evaluated array has the layout of obj's memory.
+            values = obj._eval()
+            return np.ndarray(self.shape, self.dtype, buffer=values,
+                              offset=addr(self) - addr(obj), strides=self.strides)
+        raise ValueError('views of non-contiguous weldarrays with pending ops are not '
+                         'supported; evaluate the array first')
 
     def __repr__(self):
         '''
@@ -98,6 +221,9 @@ class weldarray(np.ndarray):
                     3. Create the arr._weldarray_view class for the view which stores pointers to
                     base_array, parent_array, and start/end/strides/idx values.
         '''
+        if self.ndim > 1 or isinstance(idx, tuple):
+            return self._getitem_nd(idx)
+
         # Need to cast it as ndarray view before calling ndarray's __getitem__ implementation.
         ret = self.view(np.ndarray).__getitem__(idx)
         if isinstance(idx, slice):
@@ -120,6 +246,8 @@ class weldarray(np.ndarray):
                 end = par_start + idx.stop
                 # ret is a view, initialize its weldview.
                 ret._weldarray_view = weldarray_view(base_array, self, start, end, idx)
+                # Its values are computed by the base array.
+                ret._in_memory = False
 
             return ret
 
@@ -137,6 +265,16 @@ class weldarray(np.ndarray):
         else:
             assert False, 'idx type not supported'
 
+    def _getitem_nd(self, idx):
+        '''
+        Indexing of N-d arrays, and indexing with tuples. Numpy indexes the latest values of self;
+        views of them are returned as (strided) weldarrays without copying.
+        '''
+        ret = self._eval()[idx]
+        if isinstance(ret, np.ndarray) and str(ret.dtype) in SUPPORTED_DTYPES:
+            return weldarray(ret, verbose=self._verbose)
+        return ret
+
     def __setitem__(self, idx, val):
         '''
         Cases:
@@ -151,7 +289,19 @@ class weldarray(np.ndarray):
 
         When self is a view, update parent instead.
         TODO: This is work in progress, although it does seem to be mostly functionally correct for now.
+
+        For N-d arrays (or tuple indices), numpy updates a copy of the latest values of self,
+        which self's weld_code then reads. The evaluated array is the Weld input of the lazy
+        weldarrays created from self before, so it isn't updated in place.
         '''
+        if self.ndim > 1 or isinstance(idx, tuple):
+            if isinstance(val, weldarray):
+                val = val._eval()
+            arr = self._eval().copy()
+            arr[idx] = val
+            self._gen_weldobj(arr)
+            return
+
         def _update_single_entry(arr, index, val):
             '''
             @start: index to update.
@@ -159,9 +309,7 @@ class weldarray(np.ndarray):
             called from idx = int, or list.
             '''
             # update just one element
-            suffix = DTYPE_SUFFIXES[self._weld_type.__str__()]
-            update_str = str(val) + suffix
-            arr._update_range(index, index+1, update_str)
+            arr._update_range(index, index+1, ir.literal(val, self._weld_type))
 
         if isinstance(idx, slice):
             if idx.step is None: step = 1
@@ -196,19 +344,105 @@ class weldarray(np.ndarray):
             - weldarray: Just update the weldobject with the context from the
               weldarray.
             - ndarray: Add the given array to the context of the weldobject.
-        Sets self.name and self.weldobj.
+        Sets self.name and self.weldobj, and the depth and size of the ops registered on it (see
+        materialize.EvaluationPolicy). self._in_memory is set if self's values are those in its
+        own memory: no ops have been registered on it, and it hasn't been evaluated into a new
+        array.
         '''
-        self.weldobj = WeldObject(NumpyArrayEncoder(), NumpyArrayDecoder())
+        weldobj = WeldObject(NumpyArrayEncoder(), NumpyArrayDecoder())
+        self._weldobj = weldobj
+        self._layout = (self.shape, self.strides)
+        same_memory = addr(arr) == addr(self) and arr.strides == self.strides
         if isinstance(arr, weldarray):
-            self.weldobj.update(arr.weldobj)
-            self.weldobj.weld_code = arr.weldobj.weld_code
+            weldobj.update(arr.weldobj)
+            weldobj.weld_code = arr.weldobj.weld_code
             self.name = arr.name
+            self._lazy_depth = arr._lazy_depth
+            self._lazy_size = arr._lazy_size
+            self._in_memory = arr._in_memory and same_memory
         else:
             # general case for arr being numpy scalar or ndarray
-            # weldobj returns the name bound to the given array. That is also
-            # the array that future ops will act on, so set weld_code to it.
-            self.name = self.weldobj.weld_code = self.weldobj.update(arr,
-                    SUPPORTED_DTYPES[str(arr.dtype)])
+            # weldobj returns the name bound to the given array (or to the contiguous memory a
+            # strided array views). That is also the array that future ops will act on, so set
+            # weld_code to it.
+            buf, offset, strides = flat_buffer(arr)
+            weld_type = SUPPORTED_DTYPES[str(arr.dtype)]
+            self.name = weldobj.update(buf, weld_type)
+            if strides is None:
+                weldobj.weld_code = ir.ident(self.name)
+                self._lazy_depth = 0
+                self._lazy_size = 0
+            else:
+                weldobj.weld_code = _strided_code(
+                    ir.ident(self.name), weld_type, offset, arr.shape, strides)
+                self._lazy_depth = 1
+                self._lazy_size = 1
+            self._in_memory = same_memory
+
+    @property
+    def weldobj(self):
+        '''
+        The WeldObject computing the elements of self in C order.
+        '''
+        if self._layout != (self.shape, self.strides):
+            self._relayout()
+        return self._weldobj
+
+    def _relayout(self):
+        '''
+        numpy changed the shape and strides of self after creating it (e.g. for arr.T), so the
+        weldobj, which computes the elements of its previous layout, is regenerated.
+        '''
+        shape, strides = self._layout
+        if self._in_memory:
+            values = self.view(np.ndarray)
+        elif _is_c_contiguous(shape, strides, self.itemsize):
+            # The previous elements in C order are laid out like self's memory, which the new
+            # layout views.
+            weldobj = self._weldobj
+            if weldobj.weld_code == ir.ident(self.name):
+                previous = weldobj.context[self.name]
+            else:
+                previous = weldobj.evaluate(WeldVec(self._weld_type), verbose=self._verbose)
+            values = np.ndarray(self.shape, self.dtype, buffer=previous, strides=self.strides)
+        else:
+            raise ValueError('views of non-contiguous weldarrays with pending ops are not '
+                             'supported; evaluate the array first')
+        self._gen_weldobj(values)
+
+    def _add_op(self, code, others=()):
+        '''
+        Registers an op on self.
+        @code: ir.Expr, the new weld_code of self, which applies the op to its current weld_code
+        (and to the weld_code of others).
+        @others: weldarrays whose weld_code the op also uses.
+
+        Materializes self if the evaluation policy says the registered ops should be evaluated.
+        '''
+        depth, size = self._lazy_depth, self._lazy_size
+        for other in others:
+            depth = max(depth, other._lazy_depth)
+            # e.g. x * x: the operands are the same expression, which is computed once.
+            if other.weldobj.weld_code is not self.weldobj.weld_code:
+                size += other._lazy_size
+        self.weldobj.weld_code = code
+        self._lazy_depth = depth + 1
+        self._lazy_size = size + 1
+        self._in_memory = False
+
+        policy = materialize.get_policy()
+        if policy is None:
+            return
+        reason = policy.check(self._lazy_depth, self._lazy_size, self.size)
+        if reason is not None:
+            depth, size = self._lazy_depth, self._lazy_size
+            start = time.time()
+            self._eval()
+            eval_time = time.time() - start
+            materialize._record(policy, reason, depth, size, self.size, eval_time)
+            if self._verbose:
+                print('materialized %d ops (depth %d) because of their %s in %.4fs' % (
+                    size, depth, reason, eval_time))
 
     def _process_ufunc_inputs(self, input_args, outputs):
         '''
@@ -229,7 +463,7 @@ class weldarray(np.ndarray):
             if isinstance(i, np.ndarray):
                 if not str(i.dtype) in SUPPORTED_DTYPES:
                     return False
-                if len(i) == 0:
+                if i.size == 0:
                     return False
                 arrays.append(i)
             elif isinstance(i, list):
@@ -239,6 +473,9 @@ class weldarray(np.ndarray):
 
         if len(arrays) == 2 and arrays[0].dtype != arrays[1].dtype:
             return False
+        # TODO: broadcasting.
+        if len(arrays) == 2 and arrays[0].shape != arrays[1].shape:
+            return False
 
         # handle all scalar based tests here - later will just assume that scalar type is correct,
         # and use the suffix based on the weldarray's type.
@@ -278,17 +515,142 @@ class weldarray(np.ndarray):
         input_args = [inp for inp in inputs]
         outputs = kwargs.pop('out', None)
         supported = self._process_ufunc_inputs(input_args, outputs)
+        axes = None
+        if supported and method == 'reduce':
+            axes = self._reduce_axes(ufunc, kwargs, outputs)
+            supported = axes is not None
+        if supported and method in ('__call__', 'reduce'):
+            supported = self._dispatch(ufunc, method, input_args, outputs, kwargs) == 'weld'
         output = None
         if supported and method == '__call__':
             output = self._handle_call(ufunc, input_args, outputs)
         elif supported and method == 'reduce':
-            output = self._handle_reduce(ufunc, input_args, outputs)
+            output = self._handle_reduce(ufunc, input_args, outputs, axes, kwargs)
 
         if output is not None:
             return output
 
         return self._handle_numpy(ufunc, method, input_args, outputs, kwargs)
 
+    def _reduce_axes(self, ufunc, kwargs, outputs):
+        '''
+        @kwargs: keyword arguments of a reduce.
+        @ret: the axes of self the reduce is along, as a sorted tuple (all of them for a reduction
+        over all the elements), or None if Weld doesn't support the reduce. Reduces into outputs,
+        and reductions over all the elements with keepdims, are left to NumPy.
+        '''
+        if ufunc.__name__ not in REDUCE_OPS or outputs:
+            return None
+        if kwargs.get('where', True) is not True or 'initial' in kwargs:
+            return None
+        dtype = kwargs.get('dtype')
+        if dtype is not None and str(np.dtype(dtype)) not in SUPPORTED_DTYPES:
+            return None
+        axis = kwargs.get('axis', 0)
+        if axis is None:
+            axis = tuple(range(self.ndim))
+        elif not isinstance(axis, tuple):
+            axis = (axis,)
+        axes = set()
+        for a in axis:
+            if not -self.ndim <= a < self.ndim:
+                # Let numpy raise the error.
+                return None
+            axes.add(a % self.ndim)
+        if len(axes) != len(axis):
+            return None
+        if len(axes) == self.ndim and kwargs.get('keepdims'):
+            return None
+        return tuple(sorted(axes))
+
+    def _dispatch(self, ufunc, method, input_args, outputs, kwargs):
+        '''
+        Asks the dispatcher whether a supported ufunc runs in Weld or NumPy (see
+        dispatch.Dispatcher).
+        @kwargs: keyword arguments of the ufunc.
+        @ret: 'weld' or 'numpy'.
+        '''
+        dispatcher = dispatch.get_dispatcher()
+        if dispatcher is None:
+            return 'weld'
+        if (method == '__call__' and ufunc.__name__ not in UNARY_OPS and
+                ufunc.__name__ not in BINARY_OPS):
+            # NumPy computes it anyway.
+            return 'weld'
+        if outputs and outputs[0]._weldarray_view:
+            # The ops on a view are registered on its base array.
+            return 'weld'
+
+        operands = [arg for arg in list(input_args) + list(outputs or [])
+                    if isinstance(arg, weldarray)]
+        depth = 0
+        for arg in operands:
+            if arg._weldarray_view:
+                # The ops on a view are registered on its base array.
+                arg = arg._weldarray_view.base_array
+            depth = max(depth, arg._lazy_depth)
+        program = None
+        # The programs of reductions along an axis, or into another dtype, aren't memoized, so
+        # the dispatcher doesn't look for them in the module cache.
+        memoized = method == '__call__' or (
+            len(self._reduce_axes(ufunc, kwargs, outputs)) == self.ndim and
+            kwargs.get('dtype') is None)
+        if memoized and not any(arg._weldarray_view for arg in operands):
+            program = lambda: dispatcher.program(
+                self._op_shape(ufunc, method, input_args, outputs),
+                lambda: self._op_program(ufunc, method, input_args, outputs))
+        return dispatcher.choose(ufunc.__name__, self.size, depth, program,
+                                 verbose=self._verbose)
+
+    @staticmethod
+    def _op_shape(ufunc, method, input_args, outputs):
+        '''
+        @ret: a key identifying the Weld program of a ufunc on arrays without pending ops, which
+        doesn't depend on their values or lengths.
+        '''
+        def shape(arg, args):
+            for i, other in enumerate(args):
+                if other is arg:
+                    # e.g. w * w, or out=w.
+                    return ('same', i)
+            if isinstance(arg, np.ndarray):
+                return (type(arg).__name__, str(arg.dtype))
+            if arg in (0, 1):
+                # Literals are passed to the compiled module as arguments, except for 0 and 1
+                # (see weld.literals).
+                return ('scalar', type(arg).__name__, arg)
+            return ('scalar', type(arg).__name__)
+        shapes = [shape(arg, input_args[:i]) for i, arg in enumerate(input_args)]
+        shapes.extend(shape(out, input_args) for out in outputs or [])
+        return (ufunc.__name__, method, tuple(shapes))
+
+    @staticmethod
+    def _op_program(ufunc, method, input_args, outputs):
+        '''
+        Registers the ufunc on one element arrays of the same types as the given arrays, and
+        returns the normalized program of the result.
+        '''
+        dummies = {}
+        def dummy(arg):
+            if not isinstance(arg, np.ndarray):
+                return arg
+            if id(arg) not in dummies:
+                array = np.zeros(1, dtype=arg.dtype)
+                if isinstance(arg, weldarray):
+                    array = weldarray(array)
+                dummies[id(arg)] = array
+            return dummies[id(arg)]
+        args = [dummy(arg) for arg in input_args]
+        outs = [dummy(out) for out in outputs] if outputs else None
+        receiver = [arg for arg in args if isinstance(arg, weldarray)][0]
+        if method == '__call__':
+            result = receiver._handle_call(ufunc, args, outs)
+        else:
+            reduction = receiver._reduction(REDUCE_OPS[ufunc.__name__],
+                                            receiver._reduce_dtype(ufunc, None))
+            return _program([reduction])[0]._snapshot(True)[0]
+        return result.weldobj._snapshot(True)[0]
+
     def _handle_numpy(self, ufunc, method, input_args, outputs, kwargs):
         '''
         relegate responsibility of executing ufunc to numpy.
@@ -300,18 +662,40 @@ class weldarray(np.ndarray):
                 # Evaluate all the lazily stored computations first.
                 input_args[i] = arg_._eval()
 
+        # Lazy weldarrays created from the outputs may still read their memory, so numpy writes
+        # into new arrays, which become the values of the outputs, rather than over it.
+        rebound = {}
         if outputs:
             out_args = []
             for j, output in enumerate(outputs):
-                if isinstance(output, weldarray):
-                    out_args.append(output.view(np.ndarray))
+                if isinstance(output, weldarray) and not output._weldarray_view:
+                    if kwargs.get('where', True) is True:
+                        fresh = np.empty(output.shape, output.dtype)
+                    else:
+                        # The elements where is False keep their values.
+                        fresh = np.array(output._eval())
+                    rebound[id(fresh)] = output
+                    out_args.append(fresh)
                 else:
+                    # Views are updated in place, which is how their base array sees the new
+                    # values.
+                    if isinstance(output, weldarray):
+                        output = output.view(np.ndarray)
+                    _compute_readers(output)
                     out_args.append(output)
             kwargs['out'] = tuple(out_args)
         else:
             outputs = (None,) * ufunc.nout
 
         result = super(weldarray, self).__array_ufunc__(ufunc, method, *input_args, **kwargs)
+        for fresh in kwargs.get('out', ()):
+            if id(fresh) in rebound:
+                rebound[id(fresh)]._gen_weldobj(fresh)
+        if id(result) in rebound:
+            return rebound[id(result)]
+        if any(result is output for output in outputs if not isinstance(output, weldarray)):
+            # numpy returns the ndarray it wrote into.
+            return result
 
         # if possible, return weldarray.
         if str(result.dtype) in SUPPORTED_DTYPES and isinstance(result, np.ndarray):
@@ -345,31 +729,141 @@ class weldarray(np.ndarray):
 
             return self._binary_op(other_arg, BINARY_OPS[ufunc.__name__], result=output)
 
-    def _handle_reduce(self, ufunc, input_args, outputs):
+    def _handle_reduce(self, ufunc, input_args, outputs, axes, kwargs):
         '''
-        TODO: describe.
-        TODO: For multi-dimensional case, might need extra work here if the reduction is being
-        performed only along a certain axis.
-        We force evaluation at the end of the reduction - weird errors if we don't. This seems
-        safer anyway.
+        Reduces self along axes (see _reduce_axes) with ufunc, one of REDUCE_OPS.
+        A reduction over all the elements returns a weldscalar. A reduction along some axes
+        returns a new weldarray. Both are computed lazily, in the same Weld program as the ops
+        registered on self.
         np supports reduce only for binary ops.
         '''
         # input_args[0] must be self so it can be ignored.
         assert len(input_args) == 1
-        if outputs: output = outputs[0]
-        else: output = None
-        if ufunc.__name__ in BINARY_OPS:
-            return self._reduce_op(BINARY_OPS[ufunc.__name__], result=output)
+        op = REDUCE_OPS[ufunc.__name__]
+        dtype = self._reduce_dtype(ufunc, kwargs.get('dtype'))
+        if len(axes) == self.ndim:
+            return self._reduce_op(op, dtype)
+        return self._axis_reduce_op(op, axes, dtype, keepdims=kwargs.get('keepdims', False))
+
+    def _reduce_dtype(self, ufunc, dtype):
+        '''
+        @dtype: dtype argument of the reduce, or None.
+        @ret: np.dtype of the result of reducing self with ufunc.
+        '''
+        if dtype is None:
+            # e.g. numpy sums int32 arrays into int64.
+            return ufunc.reduce(np.zeros(1, dtype=self.dtype)).dtype
+        return np.dtype(dtype)
+
+    def _reduce_op(self, op, dtype):
+        '''
+        Reduces all the elements of self with op.
+        @dtype: dtype of the result.
+        @ret: weldscalar, which computes the reduction lazily, along with the other reductions of
+        self (see weldscalar).
+        '''
+        return weldscalar(self._reduction(op, dtype))
+
+    def _reduction(self, op, dtype):
+        '''
+        @ret: weldscalar._Reduction of all the elements of self with op, with the ops currently
+        registered on self. It reads the current Weld inputs of self, which updates of self don't
+        write over (see __setitem__ and _handle_numpy).
+        '''
+        arr = self._get_result() if self._weldarray_view else self
+        return _Reduction(arr.weldobj.weld_code, dict(arr.weldobj.context), op, dtype,
+                          SUPPORTED_DTYPES[str(dtype)], arr._weld_type, verbose=self._verbose)
+
+    def _reduce_elem(self, weld_type):
+        '''
+        @ret: ir.Expr, the element 'e' of self, cast to weld_type.
+        '''
+        if weld_type == self._weld_type:
+            return ir.ident('e')
+        return ir.cast(weld_type, 'e')
+
+    def _axis_reduce_op(self, op, axes, dtype, keepdims=False):
+        '''
+        Reduces self along the given axes (a sorted tuple, not all of them) with op.
+        @dtype: dtype of the result.
+        @ret: new weldarray, which computes the reduction lazily.
+        '''
+        arr = self._get_result() if self._weldarray_view else self
+        if keepdims:
+            shape = tuple(1 if axis in axes else dim for axis, dim in enumerate(self.shape))
+        else:
+            shape = tuple(dim for axis, dim in enumerate(self.shape) if axis not in axes)
+        result = weldarray(np.empty(shape, dtype=dtype), verbose=self._verbose)
+        result.weldobj.update(arr.weldobj)
+        result._add_op(arr._axis_reduce_code(op, axes, dtype), others=(arr,))
+        return result
+
+    def _axis_reduce_code(self, op, axes, dtype):
+        '''
+        @ret: ir.Expr, reduction of self's elements, cast to dtype, along the given axes with the
+        binop op, as a vector in C order.
+
+        A single loop over self's elements merges each of them into its output element with a
+        vecmerger, so Weld fuses the loop with the ops registered on self. The index of the output
+        element is computed from the element's index like in _strided_code, with adjacent axes
+        that are both reduced or both kept treated as one.
+        '''
+        def i64(value):
+            return ir.literal(value, 'i64')
+
+        # [size, reduced] of each run of adjacent reduced or kept axes.
+        groups = []
+        for axis, dim in enumerate(self.shape):
+            reduced = axis in axes
+            if groups and groups[-1][1] == reduced:
+                groups[-1][0] *= dim
+            else:
+                groups.append([dim, reduced])
+
+        index = None
+        inner = 1
+        num_outputs = 1
+        for dim, reduced in reversed(groups):
+            if not reduced and dim > 1:
+                term = ir.ident('i') if inner == 1 else ir.binop('/', 'i', i64(inner))
+                if inner * dim < self.size:
+                    term = ir.binop('%', term, i64(dim))
+                if num_outputs != 1:
+                    term = ir.binop('*', term, i64(num_outputs))
+                index = term if index is None else ir.binop('+', term, index)
+            if not reduced:
+                num_outputs *= dim
+            inner *= dim
+        if index is None:
+            index = i64(0)
+
+        weld_type = SUPPORTED_DTYPES[str(dtype)]
+        init = ir.result(ir.for_(
+            ir.rangeiter(i64(0), i64(num_outputs), i64(1)),
+            ir.appender(weld_type),
+            ir.lambda_([('b2', None), ('j', None), ('x', 'i64')],
+                       ir.merge('b2', _reduce_identity(op, dtype)))))
+        return ir.result(ir.for_(
+            self.weldobj.weld_code,
+            ir.vecmerger(weld_type, op, init),
+            ir.lambda_([('b', None), ('i', None), ('e', None)],
+                       ir.merge('b', ir.struct(index, self._reduce_elem(weld_type))))))
 
-    def _reduce_op(self, op, result=None):
+    def mean(self, axis=None, dtype=None, out=None, keepdims=False, **kwargs):
         '''
-        TODO: support for multidimensional arrays.
+        Like ndarray.mean, but the division of the sum by the number of elements summed is
+        computed lazily, like the sum.
         '''
-        template = 'result(for({arr},merger[{type}, {op}], |b, i, e| merge(b, e)))'
-        self.weldobj.weld_code = template.format(arr = self.weldobj.weld_code,
-                                                 type = self._weld_type.__str__(),
-                                                 op  = op)
-        return self._eval(restype = self._weld_type)
+        if out is None and not kwargs:
+            if dtype is None and self.dtype.kind == 'i':
+                dtype = np.float64
+            total = self.sum(axis=axis, dtype=dtype, keepdims=keepdims)
+            if isinstance(total, weldarray):
+                count = self.size // total.size
+                return np.divide(total, total.dtype.type(count), out=total)
+            return total / total.dtype.type(self.size)
+        return super(weldarray, self).mean(axis=axis, dtype=dtype, out=out, keepdims=keepdims,
+                                           **kwargs)
 
     def evaluate(self):
         '''
@@ -383,7 +877,8 @@ class weldarray(np.ndarray):
         @ret: ndarray after evaluating all the ops registered with the given weldarray.
         @restype: type of the result. Usually, it will be a WeldVec, but if called from reduction,
         it would be a scalar.
-        Evalutes the expression based on weldobj.weld_code. If no new ops have been registered,
+        Evalutes the expression based on weldobj.weld_code, an expression tree (see weld.ir) which
+        each op extends without copying the ops before it. If no new ops have been registered,
         then just returns the last ndarray.
         If self is a view, then evaluates the parent array, and returns the aprropriate index from
         the result.
@@ -399,15 +894,21 @@ class weldarray(np.ndarray):
             return arr[self._weldarray_view.idx]
 
         # Caching
-        if self.name == self.weldobj.weld_code:
+        if self.weldobj.weld_code == ir.ident(self.name):
             # No new ops have been registered. Avoid creating unneccessary new copies with
             # weldobj.evaluate()
             return self.weldobj.context[self.name]
+        if self._in_memory:
+            # A strided array without new ops.
+            return self.view(np.ndarray)
 
         if restype is None:
             # use default type for all weldarray operations
             restype = WeldVec(self._weld_type)
         arr = self.weldobj.evaluate(restype, verbose=self._verbose)
+        if isinstance(restype, WeldVec) and self.ndim != 1:
+            # Weld computes the elements in C order.
+            arr = arr.reshape(self.shape)
         # Now that the evaluation is done - create new weldobject for self,
         # initalized from the returned arr.
         self._gen_weldobj(arr)
@@ -439,11 +940,9 @@ class weldarray(np.ndarray):
             @res: weldarray to be updated.
             @unop: str, operator applied to res.
             '''
-            template = 'map({arr}, |z : {type}| {unop}(z))'
-            code = template.format(arr  = res.weldobj.weld_code,
-                                   type = res._weld_type.__str__(),
-                                   unop = unop)
-            res.weldobj.weld_code = code
+            res._add_op(ir.map_(
+                res.weldobj.weld_code,
+                ir.lambda_([('z', res._weld_type)], ir.call(unop, 'z'))))
 
         if result is None:
             result = self._get_result()
@@ -451,8 +950,7 @@ class weldarray(np.ndarray):
             # in place op. If is a view, just update base array and return.
             if result._weldarray_view:
                 v = result._weldarray_view
-                update_str = '{unop}(e)'.format(unop=unop)
-                v.base_array._update_range(v.start, v.end, update_str)
+                v.base_array._update_range(v.start, v.end, ir.call(unop, 'e'))
                 return result
 
         # back to updating result array
@@ -465,30 +963,31 @@ class weldarray(np.ndarray):
         @other, scalar values (i32, i64, f32, f64).
         @result: weldarray to store results in.
         '''
-        template = 'map({arr}, |z: {type}| z {binop} {other}{suffix})'
-        weld_type = result._weld_type.__str__()
-        result.weldobj.weld_code = template.format(arr = result.weldobj.weld_code,
-                                                  type =  weld_type,
-                                                  binop = binop,
-                                                  other = str(other),
-                                                  suffix = DTYPE_SUFFIXES[weld_type])
+        weld_type = result._weld_type
+        result._add_op(ir.map_(
+            result.weldobj.weld_code,
+            ir.lambda_([('z', weld_type)],
+                       ir.binop(binop, 'z', ir.literal(other, weld_type)))))
         return result
 
-    def _update_range(self, start, end, update_str, strides=1):
+    def _update_range(self, start, end, update, strides=1, others=()):
         '''
         @start, end: define which values of the view needs to be updated - for a child, it
         would be all values, and for parent it wouldn't be.
-        @update_str: code to be executed in the if block to update the variable, 'e', in the given
-        range.
+        @update: ir.Expr, code to be executed in the if block to update the variable, 'e', in the
+        given range. It can use the index, 'i'.
+        @others: weldarrays whose weld_code update uses.
         '''
-        views_template = "result(for({arr1}, appender,|b,i,e| if \
-        (i >= {start}L & i < {end}L,merge(b,{update_str}),merge(b,e))))"
+        in_range = ir.binop('&', ir.binop('>=', 'i', ir.literal(start, 'i64')),
+                            ir.binop('<', 'i', ir.literal(end, 'i64')))
 
         # all values of child will be updated. so start = 0, end = len(c)
-        self.weldobj.weld_code = views_template.format(arr1 = self.weldobj.weld_code,
-                                                      start = start,
-                                                      end   = end,
-                                                      update_str = update_str)
+        self._add_op(ir.result(ir.for_(
+            self.weldobj.weld_code,
+            ir.appender(),
+            ir.lambda_([('b', None), ('i', None), ('e', None)],
+                       ir.if_(in_range, ir.merge('b', update), ir.merge('b', 'e'))))),
+            others=others)
 
     def _update_views_binary(self, result, other, binop):
         '''
@@ -500,19 +999,19 @@ class weldarray(np.ndarray):
         (uses if statements (unneccessary checks when updating child) and wouldn't be ideal to
         update a large parent).
         '''
-        update_str_template = '{e2}{binop}e'
         v = result._weldarray_view
+        others = ()
         if isinstance(other, weldarray):
-            lookup_ind = 'i-{st}'.format(st=v.start)
+            others = (other,)
+            lookup_ind = ir.binop('-', 'i', ir.literal(v.start, 'i64'))
             # update the base array to include the context from other
             v.base_array.weldobj.update(other.weldobj)
-            e2 = 'lookup({arr2},{i}L)'.format(arr2 = other.weldobj.weld_code, i = lookup_ind)
+            e2 = ir.lookup(other.weldobj.weld_code, lookup_ind)
         else:
             # other is just a scalar.
-            e2 = str(other) + DTYPE_SUFFIXES[result._weld_type.__str__()]
+            e2 = ir.literal(other, result._weld_type)
 
-        update_str = update_str_template.format(e2 = e2, binop=binop)
-        v.base_array._update_range(v.start, v.end, update_str)
+        v.base_array._update_range(v.start, v.end, ir.binop(binop, e2, 'e'), others=others)
 
     def _binary_op(self, other, binop, result=None):
         '''
@@ -547,12 +1046,11 @@ class weldarray(np.ndarray):
             return self._scalar_binary_op(other, binop, result)
 
         result.weldobj.update(other.weldobj)
-        # @arr{i}: latest array based on the ops registered on operand{i}. {{
-        # is used for escaping { for format.
-        template = 'map(zip({arr1},{arr2}), |z: {{{type1},{type2}}}| z.$0 {binop} z.$1)'
-        result.weldobj.weld_code = template.format(arr1 = result.weldobj.weld_code,
-                                                  arr2  = other.weldobj.weld_code,
-                                                  type1 = result._weld_type.__str__(),
-                                                  type2 = other._weld_type.__str__(),
-                                                  binop = binop)
+        # The latest arrays based on the ops registered on each operand. If both are the same
+        # expression (e.g. x * x), it is computed once.
+        result._add_op(ir.map_(
+            ir.zip_(result.weldobj.weld_code, other.weldobj.weld_code),
+            ir.lambda_([('z', WeldStruct([result._weld_type, other._weld_type]))],
+                       ir.binop(binop, ir.field('z', 0), ir.field('z', 1)))),
+            others=(other,))
         return result
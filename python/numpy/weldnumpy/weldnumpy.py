@@ -40,6 +40,27 @@ def addr(arr):
     '''
     return arr.__array_interface__['data'][0]
 
+def flat_buffer(arr):
+    '''
+    Finds the contiguous memory a (possibly strided) array is a view of, so that the array can be
+    passed to Weld without copying it.
+    @arr: ndarray.
+    @ret: (buf, offset, strides). buf is a 1-d array, and element idx of arr is
+    buf[offset + sum(idx * strides)]. If arr is C-contiguous, buf is arr itself and strides is
+    None. Arrays which aren't views of a contiguous array are copied into one.
+    '''
+    if arr.flags.c_contiguous:
+        return arr, 0, None
+    root = arr
+    while isinstance(root.base, np.ndarray):
+        root = root.base
+    if (arr.size == 0 or root.dtype != arr.dtype or
+            not (root.flags.c_contiguous or root.flags.f_contiguous) or
+            any(s % arr.itemsize for s in arr.strides)):
+        return np.ascontiguousarray(arr), 0, None
+    offset = (addr(arr) - addr(root)) // arr.itemsize
+    strides = tuple(s // arr.itemsize for s in arr.strides)
+    return root.view(np.ndarray).ravel(order='K'), offset, strides
 
 def get_supported_binary_ops():
     '''
@@ -52,6 +73,18 @@ def get_supported_binary_ops():
     binary_ops[np.divide.__name__] = '/'
     return binary_ops
 
+def get_supported_reduce_ops():
+    '''
+    Returns a dictionary of the ufuncs whose reductions Weld supports, with values being the binop
+    of the Weld merger that computes them.
+    '''
+    reduce_ops = {}
+    reduce_ops[np.add.__name__] = '+'
+    reduce_ops[np.multiply.__name__] = '*'
+    reduce_ops[np.minimum.__name__] = 'min'
+    reduce_ops[np.maximum.__name__] = 'max'
+    return reduce_ops
+
 def get_supported_unary_ops():
     '''
     Returns a dictionary of the Weld supported unary ops, with values being their Weld symbol.
@@ -87,6 +120,7 @@ def get_supported_suffixes():
 # TODO: turn these all into classes which provide functions.
 # Global variables for the WeldArray type, used for lookups
 BINARY_OPS = get_supported_binary_ops()
+REDUCE_OPS = get_supported_reduce_ops()
 UNARY_OPS = get_supported_unary_ops()
 SUPPORTED_DTYPES = get_supported_types()
 DTYPE_SUFFIXES = get_supported_suffixes()
@@ -0,0 +1,294 @@
+import collections
+import itertools
+import numbers
+import weakref
+
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+from weld import ir
+from weld.types import WeldStruct
+from weld.weldobject import WeldObject
+from weld.encoders import NumpyArrayEncoder, NumpyArrayDecoder
+
+# Reductions which haven't been computed yet, and are still used by a weldscalar.
+_pending = weakref.WeakSet()
+_next_seq = itertools.count()
+
+class _Reduction(object):
+    '''
+    A reduction of a vector, computed when a weldscalar using it (or another reduction of the same
+    vector) is evaluated.
+
+    @code: ir.Expr, the vector.
+    @context: dict, the inputs code reads.
+    @op: str, binop of the Weld merger.
+    @dtype: np.dtype of the result. Elements of another type (@elem_type, their Weld type) are
+    cast to it.
+    '''
+    def __init__(self, code, context, op, dtype, weld_type, elem_type, verbose=False):
+        self.code = code
+        self.context = context
+        self.op = op
+        self.dtype = dtype
+        self.weld_type = weld_type
+        self.elem_type = elem_type
+        self.verbose = verbose
+        self.seq = next(_next_seq)
+        self.value = None
+
+    @property
+    def computed(self):
+        return self.code is None
+
+    def merged(self, elem):
+        '''
+        @elem: ir.Expr, an element of self.code.
+        @ret: ir.Expr, the value merged for it.
+        '''
+        if self.elem_type == self.weld_type:
+            return elem
+        return ir.cast(self.weld_type, elem)
+
+    def _set(self, value):
+        self.value = value
+        # The inputs aren't needed anymore.
+        self.code = None
+        self.context = None
+        _pending.discard(self)
+
+def _peel(code):
+    '''
+    @ret: (vector, element) if code is a map over the elements of vector (map(v, f), or
+    map(zip(v, v, ...), f)), where element(x) returns the element of code computed from the
+    element x of vector; None otherwise.
+    '''
+    if code.kind != 'call' or code.args[0] != 'map':
+        return None
+    vector, function = code.args[1], code.args[2]
+    if function.kind != 'lambda':
+        return None
+    (param, _), = function.args[0]
+    body = function.args[1]
+    if vector.kind == 'call' and vector.args[0] == 'zip':
+        vectors = vector.args[1:]
+        if any(v != vectors[0] for v in vectors[1:]):
+            return None
+        return vectors[0], lambda x: ir.let(param, ir.struct(*([x] * len(vectors))), body)
+    return vector, lambda x: ir.let(param, x, body)
+
+def _sources(code):
+    '''
+    @ret: list of (vector, element) pairs, starting with (code, identity), where each vector is
+    one that code maps over (see _peel), and element(x) returns the element of code computed from
+    the element x of vector.
+    '''
+    sources = [(code, lambda x: x)]
+    while True:
+        peeled = _peel(sources[-1][0])
+        if peeled is None:
+            return sources
+        vector, inner = peeled
+        outer = sources[-1][1]
+        sources.append((vector, lambda x, inner=inner, outer=outer: outer(inner(x))))
+
+def _program(reductions):
+    '''
+    Builds the Weld program computing the given reductions.
+
+    Reductions of vectors computed from the same vector through maps (e.g. the sum of x, and the
+    sum of x * x) are computed in a single loop over the last vector they all map over, which
+    merges into a struct of mergers; equal reductions are computed once.
+
+    @ret: (WeldObject, restype, fields), where fields[i] is the index of reductions[i] in the
+    result, a struct unless there's a single field.
+    '''
+    chains = [_sources(r.code) for r in reductions]
+    # Reductions (and their chains) by the vector their chains end with.
+    roots = collections.OrderedDict()
+    for r, chain in zip(reductions, chains):
+        roots.setdefault(chain[-1][0], []).append((r, chain))
+
+    weldobj = WeldObject(NumpyArrayEncoder(), NumpyArrayDecoder())
+    loops = []
+    field_types = []
+    fields = {}
+    for group in roots.values():
+        common = set.intersection(*[set(vector for vector, _ in chain) for _, chain in group])
+        source = [vector for vector, _ in group[0][1] if vector in common][0]
+        mergers = collections.OrderedDict()
+        for r, chain in group:
+            weldobj.context.update(r.context)
+            element = dict(chain)[source]
+            key = (r.op, str(r.weld_type), r.merged(element(ir.ident('e'))))
+            if key not in mergers:
+                mergers[key] = len(field_types)
+                field_types.append(r.weld_type)
+            fields[r] = mergers[key]
+        loops.append((source, list(mergers.keys())))
+
+    if len(field_types) == 1:
+        (source, [(op, _, merged)]), = loops
+        weldobj.weld_code = ir.result(ir.for_(
+            source, ir.merger(field_types[0], op),
+            ir.lambda_([('b', None), ('i', None), ('e', None)], ir.merge('b', merged))))
+        return weldobj, field_types[0], [0 for r in reductions]
+
+    results = []
+    for n, (source, mergers) in enumerate(loops):
+        name = 'r%d' % n
+        if len(mergers) == 1:
+            results.append(ir.result(name))
+        else:
+            results.extend(ir.result(ir.field(name, j)) for j in range(len(mergers)))
+    code = ir.struct(*results)
+    for n, (source, mergers) in reversed(list(enumerate(loops))):
+        if len(mergers) == 1:
+            (op, weld_type, merged), = mergers
+            builder = ir.merger(weld_type, op)
+            merge = ir.merge('b', merged)
+        else:
+            builder = ir.struct(*[ir.merger(weld_type, op) for op, weld_type, _ in mergers])
+            merge = ir.struct(*[ir.merge(ir.field('b', j), merged)
+                                for j, (_, _, merged) in enumerate(mergers)])
+        code = ir.let('r%d' % n, ir.for_(
+            source, builder, ir.lambda_([('b', None), ('i', None), ('e', None)], merge)), code)
+    weldobj.weld_code = code
+    return weldobj, WeldStruct(field_types), [fields[r] for r in reductions]
+
+def _compute(reductions):
+    '''
+    Computes the given reductions, along with all the pending reductions of the same vectors (see
+    _program), in a single Weld program.
+    '''
+    roots = set(_sources(r.code)[-1][0] for r in reductions)
+    batch = set(reductions)
+    batch.update(r for r in list(_pending) if _sources(r.code)[-1][0] in roots)
+    # In the order they were created, so the same computations give the same program.
+    batch = sorted(batch, key=lambda r: r.seq)
+    weldobj, restype, fields = _program(batch)
+    values = weldobj.evaluate(restype, verbose=any(r.verbose for r in batch))
+    if not isinstance(restype, WeldStruct):
+        values = (values,)
+    for r, field in zip(batch, fields):
+        r._set(r.dtype.type(values[field]))
+
+def _compute_readers(arr):
+    '''
+    Computes the pending reductions whose inputs share memory with arr, before arr is updated in
+    place, so that they keep the values they were taken of.
+    '''
+    readers = [r for r in list(_pending)
+               if any(isinstance(value, np.ndarray) and np.may_share_memory(value, arr)
+                      for value in r.context.values())]
+    if readers:
+        _compute(readers)
+
+class weldscalar(NDArrayOperatorsMixin):
+    '''
+    The result of a reduction of all the elements of a weldarray (e.g. np.sum(w), or w.max()), or
+    of arithmetic on such results and numbers, which is computed lazily.
+
+    Arithmetic operators and ufuncs on weldscalars and numbers return a new weldscalar. The value
+    is computed when it is needed (e.g. float(s), or s + arr for an array arr), or asked for with
+    evaluate(). The reductions of a weldarray which haven't been computed yet are then computed
+    together, in one loop over the array, so e.g. the mean, variance, min and max of an array take
+    a single pass and a single compile.
+    '''
+    def __init__(self, reduction=None, ufunc=None, inputs=()):
+        '''
+        @reduction: _Reduction, or None if self is ufunc applied to inputs (weldscalars and numbers).
+        '''
+        self._reduction = reduction
+        self._ufunc = ufunc
+        self._inputs = tuple(inputs)
+        self._evaluated = False
+        self._value = None
+        if reduction is not None:
+            _pending.add(reduction)
+
+    @property
+    def dtype(self):
+        if self._reduction is not None:
+            return self._reduction.dtype
+        # The dtype numpy would compute the value in.
+        ones = [x.dtype.type(1) if isinstance(x, weldscalar) else x for x in self._inputs]
+        with np.errstate(all='ignore'):
+            return np.asarray(self._ufunc(*ones)).dtype
+
+    def evaluate(self):
+        '''
+        @ret: numpy scalar, the value of self.
+        '''
+        if self._evaluated:
+            return self._value
+        # weldscalars self depends on, each after its inputs.
+        order = []
+        reductions = []
+        stack = [(self, False)]
+        visited = set()
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                order.append(node)
+                continue
+            if node._evaluated or id(node) in visited:
+                continue
+            visited.add(id(node))
+            stack.append((node, True))
+            if node._reduction is not None:
+                if not node._reduction.computed:
+                    reductions.append(node._reduction)
+            else:
+                stack.extend((x, False) for x in node._inputs if isinstance(x, weldscalar))
+        if reductions:
+            _compute(reductions)
+        for node in order:
+            if node._reduction is not None:
+                node._value = node._reduction.value
+            else:
+                args = [x._value if isinstance(x, weldscalar) else x for x in node._inputs]
+                node._value = node._ufunc(*args)
+                # The inputs aren't needed anymore.
+                node._inputs = ()
+            node._evaluated = True
+        return self._value
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        '''
+        Applying a ufunc to weldscalars and numbers returns a weldscalar. Otherwise (e.g. for
+        arrays) the weldscalars are evaluated, and numpy (or weldarray) applies the ufunc.
+        '''
+        if (method == '__call__' and ufunc.nout == 1 and not kwargs and
+                all(isinstance(x, (weldscalar, numbers.Number, np.generic)) for x in inputs)):
+            return weldscalar(ufunc=ufunc, inputs=inputs)
+        inputs = [x.evaluate() if isinstance(x, weldscalar) else x for x in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.evaluate(), dtype=dtype)
+
+    def item(self):
+        return self.evaluate().item()
+
+    def __float__(self):
+        return float(self.evaluate())
+
+    def __int__(self):
+        return int(self.evaluate())
+
+    def __index__(self):
+        return self.evaluate().__index__()
+
+    def __bool__(self):
+        return bool(self.evaluate())
+
+    __nonzero__ = __bool__
+
+    def __hash__(self):
+        return hash(self.evaluate())
+
+    def __repr__(self):
+        return repr(self.evaluate())
+
+    def __str__(self):
+        return str(self.evaluate())
@@ -0,0 +1,79 @@
+import pytest
+from weld import ir
+
+def test_serialization():
+    x = ir.ident('_inp0')
+    code = ir.map_(x, ir.lambda_([('e', 'i32')], ir.binop('+', 'e', ir.literal(1, 'i32'))))
+    assert str(code) == 'map(_inp0, |e: i32| (e + 1))'
+    assert code.free == frozenset(['_inp0'])
+
+    code = ir.let('y', ir.struct(x, ir.literal(2, 'i64')), ir.field(ir.field('y', 1), 0))
+    assert str(code) == '(let y = {_inp0, 2L}; y.$1.$0)'
+    assert code.free == frozenset(['_inp0'])
+    assert str(ir.field(ir.binop('+', 'a', 'b'), '1.$0')) == '((a + b)).$1.$0'
+    assert str(ir.annotate('loopsize: 10L', ir.unop('-', 'a'))) == '@(loopsize: 10L) (-a)'
+    assert str(ir.result(ir.for_(x, ir.merger('f64', '+'), ir.lambda_(
+        [('b', None), ('i', None), ('e', None)], ir.merge('b', 'e'))))) == \
+        'result(for(_inp0, merger[f64,+], |b, i, e| merge(b, e)))'
+
+def test_literals():
+    assert [str(ir.literal(1, t)) for t in ['i8', 'i16', 'i32', 'i64']] == ['1c', '1si', '1', '1L']
+    assert str(ir.literal(2, 'f64')) == '2.0'
+    assert str(ir.literal(0.5, 'f32')) == '0.5f'
+    assert str(ir.literal(1e30, 'f64')) == '1e30'
+    assert str(ir.literal(True, 'bool')) == 'true'
+    for value, ty in [(2.5, 'i32'), (float('nan'), 'f64'), (float('inf'), 'f32'), (1, 'u128')]:
+        with pytest.raises(ValueError):
+            ir.literal(value, ty)
+
+def test_structural_equality():
+    a = ir.map_('v', ir.lambda_([('e', None)], ir.call('exp', 'e')))
+    b = ir.map_('v', ir.lambda_([('e', None)], ir.call('exp', 'e')))
+    assert a == b and hash(a) == hash(b)
+    assert a != ir.map_('v', ir.lambda_([('e', None)], ir.call('log', 'e')))
+
+def test_deep_trees():
+    '''
+    Deep trees are compared and written out without hitting the recursion limit.
+    '''
+    a = b = ir.ident('v')
+    for i in range(20000):
+        a = ir.binop('+', a, ir.literal(i, 'i64'))
+        b = ir.binop('+', b, ir.literal(i, 'i64'))
+    assert a == b
+    assert str(a).count('+') == 20000
+
+def test_cse():
+    m = ir.map_('v', ir.lambda_([('x', None)], ir.call('exp', 'x')))
+    code = ir.struct(m, m)
+    assert ir.to_weld(code) == '(let _t0 = map(v, |x| exp(x));\n{_t0, _t0})'
+    assert ir.to_weld(code, cse=False) == '{map(v, |x| exp(x)), map(v, |x| exp(x))}'
+
+    # Builders are linear, so they aren't shared.
+    merge = ir.merge('b', 'e')
+    assert ir.to_weld(ir.struct(merge, merge)) == '{merge(b, e), merge(b, e)}'
+
+    # Subtrees using a lambda's parameters stay in the lambda.
+    inner = ir.map_('v', ir.lambda_([('x', None)], ir.binop('+', 'x', 'y')))
+    code = ir.map_('w', ir.lambda_([('y', None)], ir.struct(inner, inner)))
+    assert ir.to_weld(code) == str(code)
+
+def test_cse_shadowing():
+    '''
+    A subtree using a name which a lambda parameter shadows where it occurs isn't moved out of
+    the lambda.
+    '''
+    m = ir.map_('e', ir.lambda_([('x', None)], 'x'))
+    code = ir.struct(ir.map_('e', ir.lambda_([('e', None)], ir.binop('+', m, m))), m)
+    assert ir.to_weld(code) == str(ir.struct(
+        ir.map_('e', ir.lambda_([('e', None)], ir.binop('+', m, m))), m)) == \
+        '{map(e, |e| (map(e, |x| x) + map(e, |x| x))), map(e, |x| x)}'
+
+    # The same for let statements.
+    code = ir.struct(ir.let('e', ir.ident('w'), ir.struct(m, m)), m)
+    assert '_t0' not in ir.to_weld(code)
+
+    # Subtrees which don't use the shadowed name are still shared.
+    m = ir.map_('v', ir.lambda_([('x', None)], 'x'))
+    code = ir.struct(ir.map_('e', ir.lambda_([('e', None)], ir.binop('+', m, m))), m)
+    assert ir.to_weld(code) == '(let _t0 = map(v, |x| x);\n{map(e, |e| (_t0 + _t0)), _t0})'
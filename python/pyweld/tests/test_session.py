@@ -0,0 +1,93 @@
+import pytest
+from weld import pool
+from weld.pool import WeldContextPool
+from weld.session import WeldSession, get_session
+
+def test_compile_conf():
+    session = WeldSession(passes=['inline-apply', 'loop-fusion'],
+                          llvm_options={'level': 2, 'weld.llvm.optimization.vectorizer': False})
+    assert session.compile_conf() == {
+        'weld.llvm.optimization.level': '2',
+        'weld.llvm.optimization.vectorizer': 'false',
+        'weld.optimization.passes': 'inline-apply,loop-fusion',
+    }
+    # Arguments override the session's settings.
+    assert session.compile_conf(passes=[], apply_experimental_transforms=True) == {
+        'weld.llvm.optimization.level': '2',
+        'weld.llvm.optimization.vectorizer': 'false',
+        'weld.optimization.applyExperimentalTransforms': 'true',
+    }
+    for kwargs in [{'threads': 0}, {'memory_limit': 0}]:
+        with pytest.raises(ValueError):
+            WeldSession(**kwargs)
+
+def test_session_stack():
+    default = get_session()
+    outer = WeldSession(threads=2)
+    inner = WeldSession(threads='auto')
+    with outer:
+        assert get_session() is outer
+        with inner:
+            assert get_session() is inner and inner.num_threads >= 1
+        assert get_session() is outer
+    assert get_session() is default
+
+def test_resources():
+    modules = object()
+    contexts = WeldContextPool()
+    session = WeldSession(cache=modules, pool=contexts)
+    assert session.get_cache() is modules and session.get_pool() is contexts
+    assert session.get_cache(False) is None and session.get_pool(None) is None
+    other = WeldContextPool()
+    assert session.get_pool(other) is other
+    assert WeldSession(pool=False).get_pool() is None
+
+class FakeConf(object):
+    def set(self, key, value):
+        setattr(self, key, value)
+
+class FakeContext(object):
+    def __init__(self, conf):
+        self.conf = conf
+        self.freed = False
+        self.referenced = False
+
+    def reset(self, err):
+        err.failed = self.referenced
+
+    def free(self):
+        self.freed = True
+
+class FakeError(object):
+    failed = False
+
+    def code(self):
+        return int(self.failed)
+
+def test_context_pool(monkeypatch):
+    for name, fake in [('WeldConf', FakeConf), ('WeldContext', FakeContext),
+                       ('WeldError', FakeError)]:
+        monkeypatch.setattr(pool.cweld, name, fake)
+
+    contexts = WeldContextPool(max_idle=1)
+    a = contexts.acquire(4, 1000)
+    assert getattr(a.conf, 'weld.threads') == '4'
+    b = contexts.acquire(4, 1000)
+    contexts.release(a)
+    contexts.release(b)
+    # Only max_idle contexts are kept.
+    assert b.freed and not a.freed
+    assert contexts.acquire(4, 1000) is a
+    # Contexts are pooled per configuration.
+    assert contexts.acquire(4, 2000) is not a
+    assert contexts.stats() == {'created': 3, 'reused': 1, 'idle': 0}
+
+    # Contexts whose memory is still referenced aren't reused.
+    a.referenced = True
+    contexts.release(a)
+    assert a.freed and contexts.stats()['idle'] == 0
+
+    c = contexts.acquire(1, 1000)
+    contexts.release(c)
+    contexts.clear()
+    assert c.freed and contexts.stats()['idle'] == 0
@@ -0,0 +1,164 @@
+import os
+
+import numpy as np
+from weld import cache, weldobject
+from weld.cache import WeldModuleCache, normalize_layout, normalize_program
+from weld.encoders import NumpyArrayEncoder, NumpyArrayDecoder
+from weld.literals import hoist_literals
+from weld.metrics import WeldCompileStats
+from weld.types import WeldLong, WeldVec
+from weld.weldobject import WeldFunction, WeldObject
+
+def new_object(code, inputs, dependencies=()):
+    '''
+    @code: Weld code, formatted with the names of inputs and the names of dependencies.
+    @inputs: ndarrays.
+    @dependencies: WeldObjects.
+    '''
+    obj = WeldObject(NumpyArrayEncoder(), NumpyArrayDecoder())
+    names = [obj.update(x) for x in inputs]
+    for dep in dependencies:
+        obj.update(dep)
+        obj.dependencies[dep.obj_id] = dep
+    obj.weld_code = code.format(*(names + [dep.obj_id for dep in dependencies]))
+    return obj
+
+def test_merge_duplicate_objects():
+    '''
+    Objects whose code is the same up to layout are computed by a single let statement.
+    '''
+    x = np.arange(10, dtype='int64')
+    a = new_object('map({0}, |e| e * 2L)', [x])
+    b = new_object('map({0},   # doubled\n    |e| e * 2L)', [x])
+    top = new_object('result(for(zip({0}, {1}), appender[i64], |b, i, e| merge(b, e.$0 + e.$1)))',
+                     [], [a, b])
+    program = top.to_weld_func()
+    assert program.count('let ') == 1
+    assert a.obj_id in program and b.obj_id not in program
+    assert np.array_equal(top.evaluate(WeldVec(WeldLong())), x * 4)
+
+def test_prune_unused_objects():
+    '''
+    Objects and inputs which the program doesn't use aren't part of it.
+    '''
+    x = np.arange(10, dtype='int64')
+    y = np.arange(5, dtype='int64')
+    used = new_object('map({0}, |e| e + 1L)', [x])
+    unused = new_object('map({0}, |e| e + 2L)', [y])
+    top = new_object('{0}', [], [used, unused])
+    program, _, names = top._to_weld_func()
+    assert unused.obj_id not in program
+    assert names == [name for name in used.context]
+    assert np.array_equal(top.evaluate(WeldVec(WeldLong())), x + 1)
+
+def test_let_statement_order():
+    '''
+    Objects are defined after the objects they depend on, and dependencies are visited in order.
+    '''
+    x = np.arange(10, dtype='int64')
+    a = new_object('map({0}, |e| e + 1L)', [x])
+    b = new_object('map({0}, |e| e * 3L)', [], [a])
+    c = new_object('map({0}, |e| e - 4L)', [x])
+    top = new_object('{{{0}, {1}, {2}}}', [], [b, c, a])
+    lets, code = top._let_statements()
+    assert [name for name, _ in lets] == [a.obj_id, b.obj_id, c.obj_id]
+    assert code == '{%s, %s, %s}' % (b.obj_id, c.obj_id, a.obj_id)
+    assert top.get_let_statements().splitlines()[0] == 'let %s = (map(%s, |e| e + 1L));' % (
+        a.obj_id, list(a.context)[0])
+
+def test_normalization():
+    assert normalize_layout('map( v,\n  |e|   e  # comment\n)') == 'map( v, |e| e )'
+    assert normalize_layout('"a  # b"   x') == '"a  # b" x'
+    assert normalize_program('let obj105 = _inp7 + _inp3;\nobj105 + _inp7') == \
+        'let obj0 = _inp1 + _inp2; obj0 + _inp1'
+
+def test_module_cache(monkeypatch, tmpdir):
+    compiled = []
+    def compile_module(program, conf):
+        compiled.append(program)
+        return object()
+    monkeypatch.setattr(cache, 'compile_module', compile_module)
+
+    modules = WeldModuleCache(max_size=2, cache_dir=str(tmpdir))
+    first, hit = modules.lookup('|x: i32| x + 2')
+    assert not hit
+    assert modules.lookup('|x: i32| x + 2') == (first, True)
+    # Compile-time options are part of the key.
+    assert not modules.lookup('|x: i32| x + 2', {'weld.optimization.passes': 'loop-fusion'})[1]
+    modules.get('|x: i32| x + 3')
+    assert modules.stats()['evictions'] == 1 and len(modules) == 2
+    assert not modules.contains('|x: i32| x + 2')
+    assert modules.stats()['hits'] == 1 and modules.stats()['misses'] == 3
+
+    # Programs are recorded on disk, and compiled ahead of time by a new cache.
+    assert len(os.listdir(str(tmpdir))) == 3
+    del compiled[:]
+    warmed = WeldModuleCache(max_size=8, cache_dir=str(tmpdir))
+    assert warmed.warm() == 3
+    assert sorted(compiled) == ['|x: i32| x + 2', '|x: i32| x + 2', '|x: i32| x + 3']
+    assert warmed.contains('|x: i32| x + 3')
+
+def test_hoist_literals():
+    code, literals = hoist_literals(
+        'map(obj100, |e| e * 3L + 2.5f + 1L + 0.0 + i64(7c)) # 9\n@(loopsize: 10L) "4"')
+    assert code == ('map(obj100, |e| e * _lit0 + _lit1 + 1L + 0.0 + i64(_lit2)) # 9\n'
+                    '@(loopsize: 10L) "4"')
+    assert [(l.weld_type, l.value) for l in literals] == [('i64', 3), ('f32', 2.5), ('i8', 7)]
+
+    # Out of range literals are left for Weld to report.
+    code, literals = hoist_literals('200c + 40000si + 2147483648 + 1e3')
+    assert code == '200c + 40000si + 2147483648 + _lit0'
+    assert [(l.weld_type, l.value) for l in literals] == [('f64', 1000.0)]
+
+def test_compile_stats_parse():
+    stats = WeldCompileStats.parse('weld\tParsing\t1.5\npass\tinline-apply\t2\n'
+                                   'pass\tloop-fusion\t4\npass\tinline-apply\t1\n'
+                                   'llvm\tMCJIT\t3\nbad line\nother\tx\t5\n')
+    assert stats.weld_times == [('Parsing', 0.0015)]
+    assert list(stats.pass_totals().items()) == [('inline-apply', 0.003), ('loop-fusion', 0.004)]
+    assert stats.llvm_times == [('MCJIT', 0.003)]
+    assert abs(stats.total_time - 0.0115) < 1e-12
+
+def test_prepare(monkeypatch):
+    '''
+    Programs which differ only in their literals are compiled once, and take the literals as
+    arguments.
+    '''
+    compiled = []
+    def compile_module(program, conf):
+        compiled.append(program)
+        return object()
+    monkeypatch.setattr(weldobject, 'compile_module', compile_module)
+    monkeypatch.setattr(cache, 'compile_module', compile_module)
+
+    x = np.arange(10, dtype='int64')
+    obj = new_object('map({0}, |e| e * 3L)', [x])
+    f = obj.prepare(WeldVec(WeldLong()), cache=False)
+    assert f.compiled and compiled == [f.program]
+    assert f.arg_names == list(obj.context) + ['_lit0'] and '_lit0' in f.program
+
+    modules = WeldModuleCache(max_size=2)
+    f = new_object('map({0}, |e| e * 3L)', [x]).prepare(WeldVec(WeldLong()), cache=modules)
+    g = new_object('map({0}, |e| e * 4L)', [x]).prepare(WeldVec(WeldLong()), cache=modules)
+    assert f.compiled and not g.compiled and f.module is g.module
+    assert (f._defaults['_lit0'], g._defaults['_lit0']) == (3, 4)
+
+def test_evaluate_async_snapshot(monkeypatch):
+    '''
+    evaluate_async captures the program before it returns, so later changes to the object don't
+    change the evaluation.
+    '''
+    monkeypatch.setattr(weldobject, 'compile_module', lambda program, conf: object())
+    monkeypatch.setattr(WeldFunction, '_run', lambda self, *args: self.program)
+    class Executor(object):
+        def submit(self, fn):
+            self.fn = fn
+            return fn
+
+    x = np.arange(10, dtype='int64')
+    obj = new_object('map({0}, |e| e + 1L)', [x])
+    executor = Executor()
+    obj.evaluate_async(WeldVec(WeldLong()), cache=False, hoist_literals=False,
+                       executor=executor)
+    obj.weld_code = 'map({0}, |e| e + 2L)'.format(list(obj.context)[0])
+    assert executor.fn().endswith('|e| e + 1L)')
@@ -8,6 +8,8 @@ from ctypes import *
 
 import pkg_resources
 
+from .metrics import WeldCompileStats
+
 system = platform.system()
 if system == 'Linux':
     lib_file = "libweld.so"
@@ -49,19 +51,26 @@ class WeldModule(c_void_p):
 
         code = c_char_p(code.encode('utf-8'))
         self.module = weld_module_compile(code, conf.conf, err.error)
+        self._stats = None
 
-    def run(self, conf, arg, err):
+    def run(self, conf, arg, err, context=None):
         """
-        WeldContext is currently hidden from the Python API. We create a new
-        context per Weld run and give ownership of it to the resulting value.
+        Runs the module in `context`, a WeldContext. If no context is given,
+        we create a new context for this run (configured by `conf`) and give
+        ownership of it to the resulting value.
 
-        NOTE: This can leak the context if the result of the Weld run is an
-        error.
+        If the run fails, the returned value is null; freeing it still frees
+        the context it owns.
         """
-        weld_context_new = weld.weld_context_new
-        weld_context_new.argtypes = [c_weld_conf]
-        weld_context_new.restype = c_weld_context
-        ctx = weld_context_new(conf.conf)
+        if context is None:
+            weld_context_new = weld.weld_context_new
+            weld_context_new.argtypes = [c_weld_conf]
+            weld_context_new.restype = c_weld_context
+            ctx = weld_context_new(conf.conf)
+            owned_ctx = ctx
+        else:
+            ctx = context.context
+            owned_ctx = None
 
         weld_module_run = weld.weld_module_run
         # module, context, arg, &err
@@ -69,7 +78,20 @@ class WeldModule(c_void_p):
             c_weld_module, c_weld_context, c_weld_value, c_weld_err]
         weld_module_run.restype = c_weld_value
         ret = weld_module_run(self.module, ctx, arg.val, err.error)
-        return WeldValue(ret, assign=True, _ctx=ctx)
+        return WeldValue(ret, assign=True, _ctx=owned_ctx)
+
+    def stats(self):
+        """
+        Returns the statistics Weld collected while compiling this module, as
+        a WeldCompileStats.
+        """
+        if self._stats is None:
+            weld_module_stats = weld.weld_module_stats
+            weld_module_stats.argtypes = [c_weld_module]
+            weld_module_stats.restype = c_char_p
+            text = weld_module_stats(self.module)
+            self._stats = WeldCompileStats.parse(text.decode('utf-8'))
+        return self._stats
 
     def __del__(self):
         weld_module_free = weld.weld_module_free
@@ -91,6 +113,11 @@ class WeldValue(c_void_p):
 
         self._ctx = _ctx
         self.freed = False
+        # Values created here only wrap a pointer to data owned by the
+        # caller, so they can always be freed once unreachable. Values
+        # returned by Weld own memory that may still be referenced, and must
+        # be freed explicitly.
+        self._owned = not assign
 
     def _check(self):
         if self.freed:
@@ -127,6 +154,56 @@ class WeldValue(c_void_p):
         self.freed = True
         return weld_value_free(self.val)
 
+    def __del__(self):
+        if self._owned and not self.freed:
+            self.free()
+
+
+class WeldContext(c_void_p):
+
+    def __init__(self, conf):
+        weld_context_new = weld.weld_context_new
+        weld_context_new.argtypes = [c_weld_conf]
+        weld_context_new.restype = c_weld_context
+        self.context = weld_context_new(conf.conf)
+        self.freed = False
+
+    def _check(self):
+        if self.freed:
+            raise ValueError("Attempted to use freed WeldContext")
+
+    def memory_usage(self):
+        self._check()
+        weld_context_memory_usage = weld.weld_context_memory_usage
+        weld_context_memory_usage.argtypes = [c_weld_context]
+        weld_context_memory_usage.restype = c_int64
+        return weld_context_memory_usage(self.context)
+
+    def reset(self, err):
+        """
+        Frees all memory allocated in this context so that it can be reused.
+        Fails if a value returned by a run in this context is still alive.
+        """
+        self._check()
+        weld_context_reset = weld.weld_context_reset
+        weld_context_reset.argtypes = [c_weld_context, c_weld_err]
+        weld_context_reset.restype = None
+        weld_context_reset(self.context, err.error)
+
+    def free(self):
+        self._check()
+        weld_context_free = weld.weld_context_free
+        weld_context_free.argtypes = [c_weld_context]
+        weld_context_free.restype = None
+        self.freed = True
+        weld_context_free(self.context)
+
+    def __del__(self):
+        # Values returned by runs in this context hold their own references
+        # to it, so freeing this handle never frees memory still in use.
+        if not self.freed:
+            self.free()
+
 
 class WeldConf(c_void_p):
 
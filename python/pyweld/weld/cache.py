@@ -0,0 +1,315 @@
+#
+# Caches compiled Weld modules.
+#
+# Compiling a Weld program (parsing, optimization passes and LLVM code
+# generation) is often far more expensive than running it, and libraries built
+# on WeldObject tend to generate the same programs over and over. The cache
+# below keys compiled modules on a normalized form of the program text and the
+# configuration options that affect compilation.
+#
+
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from . import bindings as cweld
+
+# Matches Weld string literals, and runs of comments and whitespace, in that
+# order, so that comments and whitespace inside string literals are left
+# alone.
+_LAYOUT_RE = re.compile(r'("[^"]*")|((?:#[^\n]*|\s)+)')
+
+# Names generated by WeldObject, which differ between otherwise identical
+# programs depending on how many objects and inputs were created before.
+_GENERATED_NAME_RE = re.compile(r"\b(obj|_inp)\d+\b")
+
+
+def normalize_layout(code):
+    """
+    Removes comments from Weld code and collapses runs of whitespace (and
+    comments) into a single space, leaving string literals alone.
+    """
+    def layout(match):
+        if match.group(1) is not None:
+            return match.group(1)
+        return " "
+
+    return _LAYOUT_RE.sub(layout, code).strip()
+
+
+def normalize_program(program):
+    """
+    Returns a canonical form of a Weld program.
+
+    Comments are removed, runs of whitespace are collapsed, and names
+    generated by WeldObject (objN, _inpN) are renumbered in order of their
+    first appearance. Since arguments are passed to Weld positionally, a
+    program and its normalized form compute the same function.
+    """
+    program = normalize_layout(program)
+
+    renamed = {}
+
+    def rename(match):
+        name = match.group(0)
+        if name not in renamed:
+            renamed[name] = "%s%d" % (match.group(1), len(renamed))
+        return renamed[name]
+
+    return _GENERATED_NAME_RE.sub(rename, program)
+
+
+def compile_module(program, conf):
+    """
+    Compiles a Weld program with the given compile-time configuration.
+
+    Raises:
+        ValueError: If the program does not compile.
+    """
+    weld_conf = cweld.WeldConf()
+    for key, value in conf.items():
+        weld_conf.set(key, value)
+    err = cweld.WeldError()
+    module = cweld.WeldModule(program, weld_conf, err)
+    if err.code() != 0:
+        raise ValueError("Could not compile function {}: {}".format(
+            program, err.message()))
+    return module
+
+
+class _CacheEntry(object):
+
+    def __init__(self, module, compile_time):
+        self.module = module
+        self.compile_time = compile_time
+
+
+class WeldModuleCache(object):
+    """
+    An LRU cache of compiled WeldModules.
+
+    Modules are keyed on the normalized program text and the compile-time
+    configuration (optimization passes, LLVM options, etc.). Run-time options
+    such as weld.threads and weld.memory.limit should not be passed to the
+    cache, since the same module can be run with any of them.
+
+    If `cache_dir` is set, every program compiled by the cache is also
+    recorded on disk. Weld cannot serialize compiled machine code, so the
+    on-disk tier stores programs rather than modules: a fresh process calls
+    `warm()` to compile the recorded programs ahead of time, off the
+    critical path of its first requests.
+    """
+
+    def __init__(self, max_size=128, cache_dir=None):
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self._entries = collections.OrderedDict()
+        # Guards the entries and counters. Compilation happens outside the
+        # lock, so that threads compiling different programs don't wait on
+        # each other.
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compile_time = 0.0
+        self.saved_time = 0.0
+
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _key(program, conf):
+        return (program, tuple(sorted(conf.items())))
+
+    def get(self, program, conf=None):
+        """
+        Returns a compiled module for `program`, compiling it on a miss.
+
+        Args:
+            program (str): The Weld program. It should already be normalized
+                with `normalize_program`: the module returned takes its
+                arguments in the order they appear in this text.
+            conf (dict): Compile-time configuration, mapping Weld
+                configuration keys to string values.
+
+        Raises:
+            ValueError: If the program does not compile.
+        """
+        return self.lookup(program, conf)[0]
+
+    def contains(self, program, conf=None):
+        """
+        Returns whether a compiled module for `program` (normalized, as for
+        `get`) is cached, without counting a hit or a miss.
+        """
+        if conf is None:
+            conf = {}
+        with self._lock:
+            return self._key(program, conf) in self._entries
+
+    def lookup(self, program, conf=None):
+        """
+        Like `get`, but returns a tuple (module, hit), where `hit` is False if
+        the module was compiled by this call.
+        """
+        if conf is None:
+            conf = {}
+        key = self._key(program, conf)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = self._entries.pop(key)
+                self.hits += 1
+                self.saved_time += entry.compile_time
+                return entry.module, True
+            self.misses += 1
+
+        entry = self._compile(program, conf)
+        with self._lock:
+            # Another thread may have compiled the same program meanwhile;
+            # keep the module that is already cached.
+            cached = self._entries.get(key)
+            if cached is not None:
+                return cached.module, True
+            self._insert(key, entry)
+        if self.cache_dir is not None:
+            self._persist(program, conf)
+        return entry.module, False
+
+    def _compile(self, program, conf):
+        start = time.time()
+        module = compile_module(program, conf)
+        compile_time = time.time() - start
+
+        with self._lock:
+            self.compile_time += compile_time
+        return _CacheEntry(module, compile_time)
+
+    def _insert(self, key, entry):
+        if self.max_size <= 0:
+            return
+        self._entries[key] = entry
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _path(self, program, conf):
+        digest = hashlib.sha1(
+            json.dumps([program, sorted(conf.items())]).encode("utf-8"))
+        return os.path.join(self.cache_dir, digest.hexdigest() + ".json")
+
+    def _persist(self, program, conf):
+        path = self._path(program, conf)
+        if os.path.exists(path):
+            os.utime(path, None)
+            return
+        # Write to a temporary file first so concurrent workers never read a
+        # partially written entry.
+        tmp_path = "%s.%d.%d.tmp" % (path, os.getpid(),
+                                     threading.current_thread().ident)
+        with open(tmp_path, "w") as f:
+            json.dump({"program": program, "conf": conf}, f)
+        os.rename(tmp_path, path)
+
+    def warm(self, limit=None):
+        """
+        Compiles programs recorded in `cache_dir` into the in-process cache.
+
+        The most recently used programs are compiled first. Returns the number
+        of modules compiled.
+        """
+        if self.cache_dir is None:
+            return 0
+        if limit is None:
+            limit = self.max_size
+
+        paths = [os.path.join(self.cache_dir, name)
+                 for name in os.listdir(self.cache_dir)
+                 if name.endswith(".json")]
+        paths.sort(key=os.path.getmtime, reverse=True)
+
+        warmed = 0
+        # Insert the least recently used programs first so that the most
+        # recently used ones end up at the front of the LRU order.
+        for path in reversed(paths[:limit]):
+            try:
+                with open(path) as f:
+                    record = json.load(f)
+                program, conf = record["program"], record["conf"]
+            except (IOError, OSError, ValueError, KeyError):
+                continue
+            key = self._key(program, conf)
+            with self._lock:
+                if key in self._entries:
+                    continue
+            try:
+                entry = self._compile(program, conf)
+            except ValueError:
+                continue
+            with self._lock:
+                self._insert(key, entry)
+            warmed += 1
+        return warmed
+
+    def clear(self):
+        """
+        Drops all in-process entries. Entries on disk are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns a dictionary of hit/miss counts and compile times (in seconds).
+
+        `saved_time` is the total time the hits would have spent compiling,
+        based on how long each module took to compile the first time.
+        """
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "compile_time": self.compile_time,
+                "saved_time": self.saved_time,
+            }
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    """
+    Returns the process-wide module cache used by WeldObject.evaluate.
+
+    The cache is created on first use. Its size and on-disk directory can be
+    set with the WELD_MODULE_CACHE_SIZE and WELD_MODULE_CACHE_DIR
+    environment variables.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = WeldModuleCache(
+                max_size=int(os.environ.get("WELD_MODULE_CACHE_SIZE", 128)),
+                cache_dir=os.environ.get("WELD_MODULE_CACHE_DIR"))
+        return _default_cache
+
+
+def set_default_cache(cache):
+    """
+    Replaces the process-wide module cache.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = cache
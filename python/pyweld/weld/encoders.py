@@ -27,6 +27,16 @@ def dtype_to_weld_type(dtype):
         raise ValueError("unsupported dtype {}".format(dtype))
 
 
+# The dtypes of the scalar Weld types, by name.
+_SCALAR_DTYPES = {
+    "i16": "int16",
+    "i32": "int32",
+    "i64": "int64",
+    "f32": "float32",
+    "f64": "float64",
+}
+
+
 class NumpyArrayEncoder(WeldObjectEncoder):
 
     def _check(self, obj):
@@ -52,7 +62,9 @@ class NumpyArrayEncoder(WeldObjectEncoder):
 
 class NumpyArrayDecoder(WeldObjectDecoder):
 
-    def decode(self, obj, restype):
+    tracks_ownership = True
+
+    def decode(self, obj, restype, owner=None):
         # This stuff is same as grizzly.
         if restype == WeldInt16():
             data = cweld.WeldValue(obj).data()
@@ -74,6 +86,11 @@ class NumpyArrayDecoder(WeldObjectDecoder):
             data = cweld.WeldValue(obj).data()
             result = ctypes.cast(data, ctypes.POINTER(c_double)).contents.value
             return np.float64(result) 
+        elif isinstance(restype, WeldStruct):
+            # A struct of scalars, e.g. the results of several mergers.
+            fields = obj.contents
+            return tuple(np.dtype(_SCALAR_DTYPES[str(field_type)]).type(getattr(fields, str(i)))
+                         for i, field_type in enumerate(restype.field_types))
 
         # is a WeldVec() - depending on the types, need to make minor changes.
         assert isinstance(restype, WeldVec)
@@ -82,6 +99,15 @@ class NumpyArrayDecoder(WeldObjectDecoder):
         data = obj.ptr
         dtype = restype.elemType.ctype_class
 
+        if owner is not None:
+            # Zero-copy view of Weld's memory, which is freed once the array
+            # and all views of it are garbage collected.
+            dtype = np.dtype(dtype)
+            if size == 0:
+                return np.empty(0, dtype=dtype)
+            address = ctypes.cast(data, ctypes.c_void_p).value
+            return np.asarray(owner.buffer(address, (size,), dtype.str))
+
         if restype == WeldVec(WeldInt()) or restype == WeldVec(WeldFloat()):
             # these have same sizes.
             ArrayType = ctypes.c_float*size
@@ -96,7 +122,9 @@ class NumpyArrayDecoder(WeldObjectDecoder):
 
 class ScalarDecoder(WeldObjectDecoder):
 
-    def decode(self, obj, restype):
+    tracks_ownership = True
+
+    def decode(self, obj, restype, owner=None):
         assert isinstance(restype, WeldLong)
         result = obj.contents.value
         return result
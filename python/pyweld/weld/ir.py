@@ -0,0 +1,487 @@
+#
+# Builds Weld programs as expression trees.
+#
+# Libraries used to build programs by substituting the text of whole
+# sub-programs into string templates, so every operation copied the text of
+# everything it built on. The nodes below reference their children instead:
+# building an operation takes constant time, and the program is written out
+# once, when it is evaluated.
+#
+# Nodes are immutable and compare structurally. Each node's hash is computed
+# from its children's when it is built, so nodes are cheap to use as
+# dictionary keys. When a program is written out, closed subtrees that occur
+# more than once (e.g. both operands of `x * x`) are bound to a let statement
+# and computed once.
+#
+# Example:
+#
+#   x = ident("_inp0")
+#   code = map_(x, lambda_([("e", "i32")], binop("+", ident("e"), literal(1, "i32"))))
+#   str(code)  # "map(_inp0, |e: i32| (e + 1))"
+#
+
+from __future__ import print_function
+
+_EMPTY = frozenset()
+
+# Calls whose result is a value that's worth computing once when it occurs
+# more than once. Builders are linear, so expressions that may evaluate to one
+# (e.g. for and merge) are never shared.
+_SHAREABLE = frozenset(["map", "filter", "result", "sort", "tovec"])
+
+# Suffixes of integer literals, by type.
+_INT_SUFFIXES = {"i8": "c", "i16": "si", "i32": "", "i64": "L"}
+
+
+class Expr(object):
+    """
+    A node of a Weld expression tree. Use the functions in this module to
+    build them.
+
+    Attributes:
+        kind (str): The kind of node, e.g. "call" or "lambda"
+        args (tuple): The node's children (Exprs) and other parameters
+            (strings, ints and tuples of them)
+        free (frozenset): The identifiers the expression uses that it
+            doesn't bind itself
+    """
+
+    __slots__ = ("kind", "args", "free", "_hash", "_text")
+
+    def __init__(self, kind, args, free):
+        self.kind = kind
+        self.args = args
+        self.free = free
+        self._hash = hash((kind,) + tuple(
+            arg._hash if isinstance(arg, Expr) else arg for arg in args))
+        self._text = None
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Expr):
+            return False
+        # Iterative, so that deep trees don't hit the recursion limit. Trees
+        # share subtrees, so each pair of nodes is compared once.
+        stack = [(self, other)]
+        compared = set()
+        while stack:
+            a, b = stack.pop()
+            if a is b or (id(a), id(b)) in compared:
+                continue
+            compared.add((id(a), id(b)))
+            if (a._hash != b._hash or a.kind != b.kind or
+                    len(a.args) != len(b.args)):
+                return False
+            for x, y in zip(a.args, b.args):
+                if isinstance(x, Expr):
+                    if not isinstance(y, Expr):
+                        return False
+                    stack.append((x, y))
+                elif isinstance(y, Expr) or x != y:
+                    return False
+        return True
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __str__(self):
+        if self._text is None:
+            self._text = to_weld(self)
+        return self._text
+
+    def __repr__(self):
+        return "Expr(%s)" % str(self)
+
+    def children(self):
+        """Returns the child nodes of this node."""
+        return [arg for arg in self.args if isinstance(arg, Expr)]
+
+    def pieces(self):
+        """
+        Returns the text of this node as a list of strings and child nodes,
+        which are written out in their place.
+        """
+        kind, args = self.kind, self.args
+        if kind in ("ident", "literal", "builder"):
+            return [args[0]]
+        elif kind == "call":
+            pieces = [args[0], "("]
+            for i, arg in enumerate(args[1:]):
+                if i > 0:
+                    pieces.append(", ")
+                pieces.append(arg)
+            pieces.append(")")
+            return pieces
+        elif kind == "binop":
+            return ["(", args[1], " %s " % args[0], args[2], ")"]
+        elif kind == "unop":
+            return ["(", args[0], args[1], ")"]
+        elif kind == "lambda":
+            params = ", ".join(name if ty is None else "%s: %s" % (name, ty)
+                               for name, ty in args[0])
+            return ["|%s| " % params, args[1]]
+        elif kind == "let":
+            return ["(let %s = " % args[0], args[1], "; ", args[2], ")"]
+        elif kind == "field":
+            if args[0].kind in ("ident", "call", "field"):
+                return [args[0], ".$%s" % (args[1],)]
+            return ["(", args[0], ").$%s" % (args[1],)]
+        elif kind == "struct":
+            pieces = ["{"]
+            for i, arg in enumerate(args):
+                if i > 0:
+                    pieces.append(", ")
+                pieces.append(arg)
+            pieces.append("}")
+            return pieces
+        elif kind == "annotation":
+            return ["@(%s) " % args[0], args[1]]
+        raise ValueError("Unknown expression kind: %s" % kind)
+
+
+def _union(exprs):
+    free = _EMPTY
+    for expr in exprs:
+        if expr.free:
+            free = free | expr.free if free else expr.free
+    return free
+
+
+def _type_str(ty):
+    return None if ty is None else str(ty)
+
+
+def _expr(value):
+    """Wraps identifiers given as strings."""
+    return value if isinstance(value, Expr) else ident(value)
+
+
+# Leaves
+
+def ident(name):
+    """An identifier, e.g. an input, an object or a lambda parameter."""
+    return Expr("ident", (name,), frozenset([name]))
+
+
+def literal(value, ty):
+    """
+    A scalar literal of Weld type `ty` (i8, i16, i32, i64, f32, f64 or
+    bool).
+
+    Raises:
+        ValueError: If the type isn't supported, or the value can't be
+            written as a Weld literal of that type (e.g. NaN, or 2.5 as an
+            integer)
+    """
+    ty = str(ty)
+    if ty == "bool":
+        text = "true" if value else "false"
+    elif ty in _INT_SUFFIXES:
+        if int(value) != value:
+            raise ValueError("%r isn't a literal of type %s" % (value, ty))
+        text = "%d%s" % (int(value), _INT_SUFFIXES[ty])
+    elif ty in ("f32", "f64"):
+        value = float(value)
+        if value != value or value in (float("inf"), float("-inf")):
+            raise ValueError("%r can't be written as a Weld literal" % value)
+        text = repr(value).replace("e+", "e")
+        if "." not in text and "e" not in text:
+            text += ".0"
+        if ty == "f32":
+            text += "f"
+    else:
+        raise ValueError("Unsupported literal type: %s" % ty)
+    return Expr("literal", (text,), _EMPTY)
+
+
+# Operators
+
+def binop(op, left, right):
+    """A binary operator, e.g. binop("+", a, b)."""
+    left, right = _expr(left), _expr(right)
+    return Expr("binop", (op, left, right), _union([left, right]))
+
+
+def unop(op, expr):
+    """A prefix operator, e.g. unop("-", a)."""
+    expr = _expr(expr)
+    return Expr("unop", (op, expr), expr.free)
+
+
+def call(function, *args):
+    """A call of a Weld function or builtin, e.g. call("sqrt", a)."""
+    args = tuple(_expr(arg) for arg in args)
+    return Expr("call", (function,) + args, _union(args))
+
+
+def cast(ty, expr):
+    """Casts `expr` to the scalar type `ty`."""
+    return call(str(ty), expr)
+
+
+def if_(condition, on_true, on_false):
+    return call("if", condition, on_true, on_false)
+
+
+def field(expr, index):
+    """
+    Field `index` of a struct. `index` can also be a path into nested
+    structs, e.g. "1.$0".
+    """
+    expr = _expr(expr)
+    return Expr("field", (expr, index), expr.free)
+
+
+def struct(*fields):
+    """A struct literal."""
+    fields = tuple(_expr(f) for f in fields)
+    return Expr("struct", fields, _union(fields))
+
+
+def annotate(annotation, expr):
+    """Prefixes `expr` with an annotation, e.g. "loopsize: 10L"."""
+    expr = _expr(expr)
+    return Expr("annotation", (annotation, expr), expr.free)
+
+
+# Binding
+
+def lambda_(params, body):
+    """
+    A lambda.
+
+    Args:
+        params (list): (name, type) pairs, where the type is a WeldType, a
+            string or None to let Weld infer it
+        body (Expr): The lambda's body
+    """
+    params = tuple((name, _type_str(ty)) for name, ty in params)
+    body = _expr(body)
+    return Expr("lambda", (params, body),
+                body.free - frozenset(name for name, _ in params))
+
+
+def let(name, value, body):
+    """Binds `name` to `value` in `body`."""
+    value, body = _expr(value), _expr(body)
+    return Expr("let", (name, value, body),
+                value.free | (body.free - frozenset([name])))
+
+
+# Builders
+
+def merger(ty, op):
+    return Expr("builder", ("merger[%s,%s]" % (ty, op),), _EMPTY)
+
+
+def appender(ty=None):
+    if ty is None:
+        return Expr("builder", ("appender",), _EMPTY)
+    return Expr("builder", ("appender[%s]" % ty,), _EMPTY)
+
+
+def dictmerger(key_ty, value_ty, op):
+    return Expr("builder", ("dictmerger[%s,%s,%s]" % (key_ty, value_ty, op),),
+                _EMPTY)
+
+
+def groupmerger(key_ty, value_ty):
+    return Expr("builder", ("groupmerger[%s,%s]" % (key_ty, value_ty),),
+                _EMPTY)
+
+
+def vecmerger(ty, op, init):
+    """
+    A vecmerger, which merges {index, value} pairs into a copy of the vector
+    `init` with `op`.
+    """
+    return call("vecmerger[%s,%s]" % (ty, op), init)
+
+
+def merge(builder, value):
+    return call("merge", builder, value)
+
+
+def result(builder):
+    return call("result", builder)
+
+
+# Loops and collections
+
+def for_(iterable, builder, function):
+    """
+    A for loop over `iterable` (a vector, zip_ or iter_) which merges into
+    `builder` with `function`, a lambda of the builder, index and element.
+    """
+    return call("for", iterable, builder, function)
+
+
+def map_(vector, function):
+    return call("map", vector, function)
+
+
+def filter_(vector, function):
+    return call("filter", vector, function)
+
+
+def zip_(*vectors):
+    return call("zip", *vectors)
+
+
+def iter_(vector, start, end, stride):
+    return call("iter", vector, start, end, stride)
+
+
+def rangeiter(start, end, stride):
+    return call("rangeiter", start, end, stride)
+
+
+def lookup(collection, key):
+    return call("lookup", collection, key)
+
+
+def keyexists(dictionary, key):
+    return call("keyexists", dictionary, key)
+
+
+def len_(vector):
+    return call("len", vector)
+
+
+def slice_(vector, start, size):
+    return call("slice", vector, start, size)
+
+
+def sort(vector, key_function):
+    return call("sort", vector, key_function)
+
+
+def tovec(dictionary):
+    return call("tovec", dictionary)
+
+
+# Serialization
+
+def _write(expr, names, out):
+    """
+    Appends the text of `expr` to `out`, writing the nodes in `names` (other
+    than `expr` itself) as their names. Takes time linear in the size of the
+    text.
+    """
+    stack = [expr]
+    while stack:
+        item = stack.pop()
+        if not isinstance(item, Expr):
+            out.append(item)
+            continue
+        if names and item is not expr:
+            name = names.get(item)
+            if name is not None:
+                out.append(name)
+                continue
+        stack.extend(reversed(item.pieces()))
+
+
+def _scopes(node):
+    """
+    Returns the children of `node`, each with the set of names `node` binds
+    in it.
+    """
+    if node.kind == "lambda":
+        return [(node.args[1], frozenset(name for name, _ in node.args[0]))]
+    if node.kind == "let":
+        return [(node.args[1], _EMPTY), (node.args[2], frozenset([node.args[0]]))]
+    return [(child, _EMPTY) for child in node.children()]
+
+
+def _scoped(expr):
+    """
+    Returns the subtrees of `expr` which, in some place they occur, use a
+    name bound around them inside `expr` by a lambda or a let statement.
+    This includes uses of a parameter which shadows a free name of `expr`,
+    e.g. `e` in `map(e, |e| e + 1)`.
+    """
+    scoped = set()
+    # Each node is visited once for each set of the names it uses that are
+    # bound around it, so shared subtrees are visited a few times at most.
+    visited = set()
+    stack = [(expr, _EMPTY)]
+    while stack:
+        node, bound = stack.pop()
+        bound = bound & node.free
+        if (node, bound) in visited:
+            continue
+        visited.add((node, bound))
+        if bound:
+            scoped.add(node)
+        for child, names in _scopes(node):
+            stack.append((child, bound | names if names else bound))
+    return scoped
+
+
+def _shared(expr):
+    """
+    Returns the closed, shareable subtrees of `expr` which occur more than
+    once, each after the shared subtrees it contains.
+    """
+    counts = {}
+    stack = [expr]
+    while stack:
+        node = stack.pop()
+        if node in counts:
+            counts[node] += 1
+            continue
+        counts[node] = 1
+        stack.extend(node.children())
+
+    scoped = _scoped(expr)
+
+    def is_shared(node):
+        # Nodes using names bound inside expr can't be moved out of it.
+        return (counts[node] > 1 and node.kind == "call" and
+                node.args[0] in _SHAREABLE and node not in scoped)
+
+    shared = []
+    visited = set()
+    # Post-order, so that each node comes after the ones it contains.
+    stack = [(expr, iter(expr.children()))]
+    while stack:
+        node, children = stack[-1]
+        for child in children:
+            if child not in visited:
+                visited.add(child)
+                stack.append((child, iter(child.children())))
+                break
+        else:
+            stack.pop()
+            if node is not expr and is_shared(node):
+                shared.append(node)
+    return shared
+
+
+def to_weld(expr, cse=True, prefix="_t"):
+    """
+    Returns the Weld code of an expression.
+
+    If `cse` is set, closed subtrees which occur more than once are bound to
+    let statements named `prefix` followed by a number, and computed once.
+    """
+    names = {}
+    out = []
+    if cse:
+        for node in _shared(expr):
+            name = "%s%d" % (prefix, len(names))
+            out.append("let %s = " % name)
+            _write(node, names, out)
+            out.append(";\n")
+            names[node] = name
+    _write(expr, names, out)
+    if names:
+        # Keep the let statements scoped, so the code can be embedded.
+        out.insert(0, "(")
+        out.append(")")
+    return "".join(out)
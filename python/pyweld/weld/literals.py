@@ -0,0 +1,117 @@
+#
+# Hoists scalar literals out of Weld programs.
+#
+# Libraries built on WeldObject paste Python scalars straight into their
+# templates, so `x + 3` and `x + 4` are different programs as far as the
+# compiler (and the module cache) is concerned. Replacing each literal with a
+# typed argument of the generated function makes such programs identical, so
+# they compile once and run with different argument values.
+#
+
+import ctypes
+import re
+
+# Splits a program into the tokens that matter here. This follows the Weld
+# tokenizer (weld/src/syntax/tokenizer.rs): floating point literals are matched
+# before words, and word tokens (identifiers, keywords and integer literals)
+# are runs of [A-Za-z0-9$_]. Comments, string literals and annotations are
+# matched so that literals inside them are left alone; annotation values must
+# be literals.
+_TOKEN_RE = re.compile(
+    r"(#[^\n]*)|"
+    r'("[^"]*")|'
+    r"(@\s*\([^)]*\))|"
+    r"([0-9]+\.[0-9]+(?:[eE]-?[0-9]+)?[fF]?|[0-9]+[eE]-?[0-9]+[fF]?)|"
+    r"([A-Za-z0-9$_]+)")
+
+# Base 10 integer literals, by their suffix. Binary and hexadecimal literals
+# are rare in generated code and are left as they are.
+_INT_LITERALS = [
+    (re.compile(r"^([0-9]+)[cC]$"), "i8", ctypes.c_int8, 8),
+    (re.compile(r"^([0-9]+)si$"), "i16", ctypes.c_int16, 16),
+    (re.compile(r"^([0-9]+)$"), "i32", ctypes.c_int32, 32),
+    (re.compile(r"^([0-9]+)[lL]$"), "i64", ctypes.c_int64, 64),
+]
+
+# Literals which are left in the program. These are almost always structural
+# (loop bounds and strides, merger identities, indices into lookups) rather
+# than data, and keeping them lets Weld fold and vectorize around them.
+_KEPT_VALUES = (0, 1)
+
+
+class HoistedLiteral(object):
+    """
+    A literal that was replaced by an argument of the generated function.
+
+    Attributes:
+        name (str): The argument name that replaced the literal.
+        weld_type (str): The Weld type of the literal, e.g. "i64".
+        ctype_class: The ctypes class the argument is passed as.
+        value: The Python value of the literal.
+    """
+
+    def __init__(self, name, weld_type, ctype_class, value):
+        self.name = name
+        self.weld_type = weld_type
+        self.ctype_class = ctype_class
+        self.value = value
+
+    def __repr__(self):
+        return "%s: %s = %r" % (self.name, self.weld_type, self.value)
+
+
+def _parse_literal(token, is_float):
+    """
+    Returns (weld_type, ctype_class, value) for a literal token, or None if
+    the token should stay in the program.
+    """
+    if is_float:
+        if token[-1] in "fF":
+            weld_type, ctype_class, value = "f32", ctypes.c_float, float(token[:-1])
+        else:
+            weld_type, ctype_class, value = "f64", ctypes.c_double, float(token)
+        if value in _KEPT_VALUES:
+            return None
+        return weld_type, ctype_class, value
+
+    for regex, weld_type, ctype_class, bits in _INT_LITERALS:
+        match = regex.match(token)
+        if match is not None:
+            value = int(match.group(1))
+            # Out of range literals are left for Weld to report.
+            if value in _KEPT_VALUES or value >= 2 ** (bits - 1):
+                return None
+            return weld_type, ctype_class, value
+    return None
+
+
+def hoist_literals(code, prefix="_lit"):
+    """
+    Replaces the scalar literals in a Weld expression with argument names.
+
+    Args:
+        code (str): Weld code, without the function header.
+        prefix (str): Prefix of the generated argument names, which are
+            numbered in order of appearance.
+
+    Returns:
+        A tuple (code, literals), where `literals` is a list of
+        HoistedLiteral, in the order the arguments should be declared.
+    """
+    literals = []
+    pieces = []
+    last = 0
+    for match in _TOKEN_RE.finditer(code):
+        float_token, word_token = match.group(4), match.group(5)
+        if float_token is None and word_token is None:
+            continue
+        parsed = _parse_literal(match.group(0), float_token is not None)
+        if parsed is None:
+            continue
+        name = "%s%d" % (prefix, len(literals))
+        literals.append(HoistedLiteral(name, *parsed))
+        pieces.append(code[last:match.start()])
+        pieces.append(name)
+        last = match.end()
+    pieces.append(code[last:])
+    return "".join(pieces), literals
@@ -0,0 +1,345 @@
+#
+# Per-evaluation metrics.
+#
+# Every WeldObject evaluation can produce an EvaluationMetrics record with the
+# time spent in each phase (encoding, compilation, the Weld run and decoding),
+# the number of bytes passed in and out, and the memory Weld used. Evaluations
+# which compile their program also carry Weld's WeldCompileStats, with the
+# time spent in each optimization pass and in LLVM. Records are handed to the
+# registered sinks: a callback, an in-memory ring buffer, a JSON lines file, or
+# anything else implementing MetricsSink. When no sink is registered (and
+# verbose output is off), no record is built.
+#
+
+from __future__ import print_function
+
+import collections
+import hashlib
+import json
+import threading
+import time
+import warnings
+
+
+class WeldCompileStats(object):
+    """
+    Timings collected by Weld while compiling a module. Times are in seconds.
+
+    Attributes:
+        weld_times (list): (phase, time) pairs for the phases of the Weld
+            compiler, e.g. parsing and type inference.
+        pass_times (list): (pass, time) pairs for the optimization passes, in
+            the order they ran. Passes that run more than once appear more
+            than once.
+        llvm_times (list): (phase, time) pairs for LLVM code generation.
+    """
+
+    _categories = ("weld", "pass", "llvm")
+
+    def __init__(self, weld_times=None, pass_times=None, llvm_times=None):
+        self.weld_times = weld_times or []
+        self.pass_times = pass_times or []
+        self.llvm_times = llvm_times or []
+
+    def __repr__(self):
+        return "WeldCompileStats(weld=%.6f, passes=%.6f, llvm=%.6f)" % (
+            self.weld_time, self.passes_time, self.llvm_time)
+
+    @staticmethod
+    def parse(text):
+        """
+        Parses statistics in the format returned by weld_module_stats: one
+        line per measurement, with its category (weld, pass or llvm), its
+        name and its duration in milliseconds separated by tabs.
+        """
+        stats = WeldCompileStats()
+        times = dict(zip(WeldCompileStats._categories,
+                         (stats.weld_times, stats.pass_times,
+                          stats.llvm_times)))
+        for line in text.splitlines():
+            fields = line.split("\t")
+            if len(fields) != 3 or fields[0] not in times:
+                continue
+            times[fields[0]].append((fields[1], float(fields[2]) / 1000.0))
+        return stats
+
+    @property
+    def weld_time(self):
+        return sum(t for _, t in self.weld_times)
+
+    @property
+    def passes_time(self):
+        return sum(t for _, t in self.pass_times)
+
+    @property
+    def llvm_time(self):
+        return sum(t for _, t in self.llvm_times)
+
+    @property
+    def total_time(self):
+        """
+        The time spent in all measured parts of the compiler.
+        """
+        return self.weld_time + self.passes_time + self.llvm_time
+
+    def pass_totals(self):
+        """
+        Returns a dictionary mapping each optimization pass to the total time
+        spent in it.
+        """
+        totals = collections.OrderedDict()
+        for name, t in self.pass_times:
+            totals[name] = totals.get(name, 0.0) + t
+        return totals
+
+    def to_dict(self):
+        """
+        Returns the statistics as a dictionary of JSON-serializable values.
+        """
+        return {
+            "weld_times": [list(entry) for entry in self.weld_times],
+            "pass_times": [list(entry) for entry in self.pass_times],
+            "llvm_times": [list(entry) for entry in self.llvm_times],
+        }
+
+
+class EvaluationMetrics(object):
+    """
+    Measurements of a single evaluation. Times are in seconds, and sizes in
+    bytes.
+
+    Attributes:
+        timestamp (float): When the evaluation finished, as a Unix time.
+        program_hash (str): SHA-1 hash of the normalized Weld program, which
+            identifies the program across processes.
+        threads (int): The number of threads Weld ran with.
+        encode_time (float): Time spent encoding the inputs.
+        compile_time (float): Time spent compiling (or looking up) the
+            module, or None if the function was prepared beforehand.
+        compile_stats (WeldCompileStats): Weld's timings of the
+            compilation, or None if the module came from the cache or was
+            prepared beforehand.
+        run_time (float): Time spent in the Weld run.
+        decode_time (float): Time spent decoding the result.
+        bytes_encoded (int): Size of the array and string inputs.
+        bytes_decoded (int): Size of the array and string parts of the
+            result.
+        memory_usage (int): Memory held by the result in Weld, as reported
+            by WeldValue.memory_usage.
+    """
+
+    _fields = ("timestamp", "program_hash", "threads", "encode_time",
+               "compile_time", "run_time", "decode_time", "bytes_encoded",
+               "bytes_decoded", "memory_usage", "compile_stats")
+
+    def __init__(self, program_hash, threads, encode_time=0.0,
+                 compile_time=None, run_time=0.0, decode_time=0.0,
+                 bytes_encoded=0, bytes_decoded=0, memory_usage=0,
+                 compile_stats=None, timestamp=None):
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.program_hash = program_hash
+        self.threads = threads
+        self.encode_time = encode_time
+        self.compile_time = compile_time
+        self.run_time = run_time
+        self.decode_time = decode_time
+        self.bytes_encoded = bytes_encoded
+        self.bytes_decoded = bytes_decoded
+        self.memory_usage = memory_usage
+        self.compile_stats = compile_stats
+
+    def __repr__(self):
+        return "EvaluationMetrics(%s)" % ", ".join(
+            "%s=%r" % (field, getattr(self, field)) for field in self._fields)
+
+    @property
+    def total_time(self):
+        """
+        The time spent in all phases of the evaluation.
+        """
+        return (self.encode_time + (self.compile_time or 0.0) +
+                self.run_time + self.decode_time)
+
+    def to_dict(self):
+        """
+        Returns the record as a dictionary of JSON-serializable values.
+        """
+        record = dict((field, getattr(self, field)) for field in self._fields)
+        if self.compile_stats is not None:
+            record["compile_stats"] = self.compile_stats.to_dict()
+        return record
+
+
+def program_hash(program):
+    """
+    Returns the hash identifying `program` in EvaluationMetrics records.
+    """
+    return hashlib.sha1(program.encode("utf-8")).hexdigest()
+
+
+def payload_size(value):
+    """
+    Returns the size in bytes of the array and string data in `value`: the
+    `nbytes` of arrays, the length of strings, and the sum of both over the
+    elements of tuples and lists. Other values count as zero.
+    """
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(payload_size(element) for element in value)
+    return 0
+
+
+class MetricsSink(object):
+    """
+    An abstract class for receivers of EvaluationMetrics. Sinks are called on
+    the thread that ran the evaluation, so they should be fast and
+    thread-safe.
+    """
+
+    def record(self, metrics):
+        """
+        Receives the metrics of an evaluation.
+        """
+        raise NotImplementedError
+
+
+class CallbackSink(MetricsSink):
+    """
+    Calls `callback(metrics)` for every evaluation.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record(self, metrics):
+        self.callback(metrics)
+
+
+class RingBufferSink(MetricsSink):
+    """
+    Keeps the records of the last `capacity` evaluations in memory.
+    """
+
+    def __init__(self, capacity=1024):
+        self._records = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def record(self, metrics):
+        with self._lock:
+            self._records.append(metrics)
+
+    def records(self):
+        """
+        Returns the buffered records, oldest first.
+        """
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+
+class JsonLinesSink(MetricsSink):
+    """
+    Appends every record to a file as a line of JSON.
+
+    Args:
+        file: A path, which is opened in append mode, or a file-like object
+            opened for writing text.
+    """
+
+    def __init__(self, file):
+        if hasattr(file, "write"):
+            self._file = file
+            self._owns_file = False
+        else:
+            self._file = open(file, "a")
+            self._owns_file = True
+        self._lock = threading.Lock()
+
+    def record(self, metrics):
+        line = json.dumps(metrics.to_dict(), sort_keys=True) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        """
+        Closes the file, if it was opened by this sink.
+        """
+        with self._lock:
+            if self._owns_file:
+                self._file.close()
+
+
+class PrintSink(MetricsSink):
+    """
+    Prints the time spent in each phase. Used for verbose evaluations.
+    """
+
+    def record(self, metrics):
+        if metrics.compile_time is not None:
+            print("Weld compile time:", metrics.compile_time)
+        stats = metrics.compile_stats
+        if stats is not None:
+            print("\tWeld compiler:", stats.weld_time)
+            print("\tWeld passes:", stats.passes_time)
+            for name, t in stats.pass_totals().items():
+                print("\t\t%s: %s" % (name, t))
+            print("\tLLVM:", stats.llvm_time)
+        print("Python->Weld:", metrics.encode_time)
+        print("Weld:", metrics.run_time)
+        print("Weld->Python:", metrics.decode_time)
+
+
+# The registered sinks. This is replaced rather than modified, so that
+# evaluations can read it without taking the lock.
+_sinks = ()
+_sinks_lock = threading.Lock()
+
+
+def add_sink(sink):
+    """
+    Registers a sink to receive the metrics of every evaluation in this
+    process. Returns the sink.
+    """
+    global _sinks
+    with _sinks_lock:
+        _sinks = _sinks + (sink,)
+    return sink
+
+
+def remove_sink(sink):
+    """
+    Unregisters a sink added with `add_sink`.
+    """
+    global _sinks
+    with _sinks_lock:
+        _sinks = tuple(s for s in _sinks if s is not sink)
+
+
+def get_sinks():
+    """
+    Returns the registered sinks.
+    """
+    return _sinks
+
+
+def emit(metrics, sinks):
+    """
+    Passes `metrics` to each of `sinks`. A failing sink raises a warning
+    rather than failing the evaluation.
+    """
+    for sink in sinks:
+        try:
+            sink.record(metrics)
+        except Exception as e:
+            warnings.warn("Metrics sink {!r} failed: {}".format(sink, e))
@@ -0,0 +1,124 @@
+#
+# Pools Weld contexts across runs.
+#
+# Every run of a Weld module needs a context, which holds the memory the run
+# allocates. Creating one per run (and freeing it with the run's result) adds
+# fixed overhead that dominates small queries, so the pool below keeps idle
+# contexts around and resets them for reuse instead.
+#
+
+import threading
+
+from . import bindings as cweld
+
+
+class WeldContextPool(object):
+    """
+    A pool of idle WeldContexts, keyed on their configuration (the number of
+    threads and the memory limit).
+
+    A context is acquired for each run and released once the run's result
+    has been freed. Releasing resets the context, freeing all memory the run
+    allocated; a context whose memory is still referenced fails to reset and
+    is freed instead of being pooled. At most `max_idle` idle contexts are
+    kept per configuration.
+    """
+
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        # Maps (threads, memory_limit) -> list of idle contexts
+        self._idle = {}
+        self._lock = threading.Lock()
+
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def _key(threads, memory_limit):
+        return (int(threads), int(memory_limit))
+
+    def acquire(self, threads, memory_limit):
+        """
+        Returns a context for a run with the given configuration, which the
+        caller has exclusive use of until it is released.
+        """
+        key = self._key(threads, memory_limit)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                context = idle.pop()
+                context.pool_key = key
+                return context
+            self.created += 1
+
+        conf = cweld.WeldConf()
+        conf.set("weld.threads", str(key[0]))
+        conf.set("weld.memory.limit", str(key[1]))
+        context = cweld.WeldContext(conf)
+        context.pool_key = key
+        return context
+
+    def release(self, context):
+        """
+        Resets `context` and returns it to the pool. Nothing returned by runs
+        in the context may be used afterwards.
+        """
+        err = cweld.WeldError()
+        context.reset(err)
+        if err.code() != 0:
+            context.free()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(context.pool_key, [])
+            if len(idle) < self.max_idle:
+                idle.append(context)
+                return
+        context.free()
+
+    def clear(self):
+        """
+        Frees all idle contexts.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for contexts in idle.values():
+            for context in contexts:
+                context.free()
+
+    def stats(self):
+        """
+        Returns a dictionary with the number of contexts created and reused,
+        and the number currently idle.
+        """
+        with self._lock:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "idle": sum(len(c) for c in self._idle.values()),
+            }
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool():
+    """
+    Returns the process-wide context pool used by WeldObject.evaluate,
+    creating it on first use.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = WeldContextPool()
+        return _default_pool
+
+
+def set_default_pool(pool):
+    """
+    Replaces the process-wide context pool.
+    """
+    global _default_pool
+    with _default_pool_lock:
+        _default_pool = pool
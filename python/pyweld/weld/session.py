@@ -0,0 +1,174 @@
+#
+# Sessions configure how WeldObjects are compiled and run.
+#
+# A session holds the resources and settings every evaluation needs: the
+# number of threads, the memory limit, optimization passes, LLVM options,
+# and the module cache and context pool to use. Libraries built on
+# WeldObject (Grizzly, weldnumpy) evaluate with the current session unless
+# told otherwise, so it is the one place to configure all of them.
+#
+
+import multiprocessing
+import threading
+
+from .cache import get_default_cache
+from .pool import get_default_pool
+
+# The default memory limit of a Weld run, in bytes.
+DEFAULT_MEMORY_LIMIT = 100000000000
+
+_LLVM_OPTION_PREFIX = "weld.llvm.optimization."
+
+
+class WeldSession(object):
+    """
+    Settings and resources for compiling and running Weld programs.
+
+    Sessions can be installed as the process-wide default with
+    `set_default_session`, or for a block of code (on the current thread)
+    with a `with` statement:
+
+        with WeldSession(threads="auto", memory_limit=2 << 30):
+            result = obj.evaluate(WeldVec(WeldDouble()))
+
+    Attributes:
+        threads (int or str): The number of threads each run uses, or "auto"
+            to use one per CPU.
+        memory_limit (int): The memory limit of each run, in bytes.
+        passes (list): Names of the Weld optimization passes to apply, or
+            None for Weld's defaults.
+        llvm_options (dict): LLVM configuration options, e.g.
+            {"level": 3, "vectorizer": False}. Keys may be given in full
+            ("weld.llvm.optimization.level") or without the common prefix.
+        apply_experimental_transforms (bool): Whether Weld applies its
+            experimental transforms.
+        cache (WeldModuleCache): The module cache. True uses the
+            process-wide default cache, and False disables caching.
+        pool (WeldContextPool): The context pool. True uses the process-wide
+            default pool, and False creates a new context per run.
+    """
+
+    def __init__(self, threads=1, memory_limit=DEFAULT_MEMORY_LIMIT,
+                 passes=None, llvm_options=None,
+                 apply_experimental_transforms=False, cache=True, pool=True):
+        if threads != "auto" and int(threads) < 1:
+            raise ValueError("threads must be positive or 'auto'")
+        if int(memory_limit) <= 0:
+            raise ValueError("memory_limit must be positive")
+        self.threads = threads
+        self.memory_limit = int(memory_limit)
+        self.passes = passes
+        self.llvm_options = dict(llvm_options or {})
+        self.apply_experimental_transforms = apply_experimental_transforms
+        self.cache = cache
+        self.pool = pool
+
+    def __repr__(self):
+        return ("WeldSession(threads={!r}, memory_limit={}, passes={!r}, "
+                "llvm_options={!r})").format(self.threads, self.memory_limit,
+                                             self.passes, self.llvm_options)
+
+    @property
+    def num_threads(self):
+        """
+        The number of threads each run uses, with "auto" resolved.
+        """
+        if self.threads == "auto":
+            return multiprocessing.cpu_count()
+        return int(self.threads)
+
+    def compile_conf(self, passes=None, apply_experimental_transforms=None):
+        """
+        Returns the compile-time Weld configuration of this session, as a
+        dictionary. Arguments that are not None override the session's
+        settings.
+        """
+        if passes is None:
+            passes = self.passes
+        if apply_experimental_transforms is None:
+            apply_experimental_transforms = self.apply_experimental_transforms
+
+        conf = {}
+        for key, value in self.llvm_options.items():
+            if not key.startswith("weld."):
+                key = _LLVM_OPTION_PREFIX + key
+            if isinstance(value, bool):
+                value = "true" if value else "false"
+            conf[key] = str(value)
+        if passes is not None:
+            passes = ",".join(passes).strip()
+            if passes != "":
+                conf["weld.optimization.passes"] = passes
+        if apply_experimental_transforms:
+            conf["weld.optimization.applyExperimentalTransforms"] = "true"
+        return conf
+
+    def get_cache(self, cache=True):
+        """
+        Resolves a `cache` argument: True selects this session's cache, and
+        None or False disables caching. Returns a WeldModuleCache or None.
+        """
+        if cache is True:
+            cache = self.cache
+        if cache is True:
+            return get_default_cache()
+        if cache is None or cache is False:
+            return None
+        return cache
+
+    def get_pool(self, pool=True):
+        """
+        Resolves a `pool` argument: True selects this session's pool, and
+        None or False disables pooling. Returns a WeldContextPool or None.
+        """
+        if pool is True:
+            pool = self.pool
+        if pool is True:
+            return get_default_pool()
+        if pool is None or pool is False:
+            return None
+        return pool
+
+    def __enter__(self):
+        _session_stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _session_stack().pop()
+
+
+_default_session = WeldSession()
+_local = threading.local()
+
+
+def _session_stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def get_default_session():
+    """
+    Returns the process-wide default session.
+    """
+    return _default_session
+
+
+def set_default_session(session):
+    """
+    Replaces the process-wide default session.
+    """
+    global _default_session
+    _default_session = session
+
+
+def get_session():
+    """
+    Returns the current session: the innermost session entered with a `with`
+    statement on this thread, or the process-wide default.
+    """
+    stack = _session_stack()
+    if stack:
+        return stack[-1]
+    return _default_session
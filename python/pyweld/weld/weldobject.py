@@ -5,13 +5,37 @@
 #
 from __future__ import print_function
 
+import collections
 import ctypes
+import os
+import re
+import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 
 from . import bindings as cweld
+from .cache import compile_module, normalize_layout, normalize_program
+from .literals import hoist_literals
+from . import metrics
+from .session import get_session
 from .types import *
 
 
+# Names of WeldObjects in Weld code.
+_OBJ_NAME_RE = re.compile(r"\bobj\d+\b")
+
+# Words in Weld code (identifiers, keywords and integer literals), as in the
+# Weld tokenizer.
+_WORD_RE = re.compile(r"[A-Za-z0-9$_]+")
+
+# Builders and merges. Builders are linear in Weld, so an object which may
+# evaluate to a builder (one that uses them without calling result) can't be
+# merged with a copy of itself.
+_BUILDER_RE = re.compile(
+    r"\b(appender|merger|dictmerger|groupmerger|vecmerger|merge)\b")
+
+
 class WeldObjectEncoder(object):
     """
     An abstract class that must be overwridden by libraries. This class
@@ -35,7 +59,15 @@ class WeldObjectDecoder(object):
     """
     An abstract class that must be overwridden by libraries. This class
     is used to marshall objects from Weld types to Python types.
+
+    Decoders which set `tracks_ownership` accept an `owner` keyword argument
+    in `decode`: a WeldValueOwner that must stay referenced by any decoded
+    object pointing into Weld's memory (see WeldValueOwner.buffer). The
+    memory of a run is freed once its owner is garbage collected. The memory
+    returned to other decoders is never freed.
     """
+    tracks_ownership = False
+
     def decode(self, obj, restype):
         """
         Decodes obj, assuming object is of type `restype`. obj's Python
@@ -44,6 +76,160 @@ class WeldObjectDecoder(object):
         raise NotImplementedError
 
 
+class _WeldArrayBuffer(object):
+    """
+    Exposes a region of Weld's memory through the NumPy array interface.
+    Arrays created from it keep it, and therefore its owner, alive.
+    """
+
+    def __init__(self, owner, address, shape, typestr):
+        self.owner = owner
+        self.__array_interface__ = {
+            "data": (address, False),
+            "shape": tuple(shape),
+            "typestr": typestr,
+            "version": 3,
+        }
+
+
+class WeldValueOwner(object):
+    """
+    Owns a WeldValue returned by a Weld run, along with the context holding
+    its memory, and frees both when garbage collected. If the context came
+    from a WeldContextPool, it is released back to the pool instead.
+    """
+
+    def __init__(self, value, pool=None, context=None):
+        self.value = value
+        self.pool = pool
+        self.context = context
+
+    def buffer(self, address, shape, typestr):
+        """
+        Returns an object exposing `shape` elements of type `typestr` (a
+        NumPy array-interface type string) at `address` through the array
+        interface. np.asarray on it returns a zero-copy array whose base
+        keeps this owner alive.
+        """
+        return _WeldArrayBuffer(self, address, shape, typestr)
+
+    def __del__(self):
+        self.free()
+
+    def free(self):
+        if self.value is not None and not self.value.freed:
+            self.value.free()
+        if self.pool is not None:
+            self.pool.release(self.context)
+            self.pool = None
+
+    def leak(self):
+        """
+        Gives up ownership, so that the value and its context are never
+        freed.
+        """
+        self.value = None
+        self.pool = None
+
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def get_default_executor():
+    """
+    Returns the thread pool used by WeldObject.evaluate_async, creating it on
+    first use. Its size can be set with the WELD_ASYNC_WORKERS environment
+    variable (four workers by default).
+    """
+    global _default_executor
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ThreadPoolExecutor(
+                max_workers=int(os.environ.get("WELD_ASYNC_WORKERS", 4)))
+        return _default_executor
+
+
+def set_default_executor(executor):
+    """
+    Replaces the executor used by WeldObject.evaluate_async.
+    """
+    global _default_executor
+    with _default_executor_lock:
+        _default_executor = executor
+
+
+class _InputRegistry(object):
+    """
+    Assigns names to WeldObject inputs, so that the same input always has the
+    same name and objects that share inputs can be combined.
+
+    Arrays (anything exposing __array_interface__) are keyed on their
+    identity, buffer address, dtype, shape and strides, and are tracked with
+    weak references so that their entries are dropped when they are garbage
+    collected. Other hashable values (e.g., strings and scalars) are keyed on
+    their value in a bounded LRU. Anything else gets a fresh name.
+    """
+
+    def __init__(self, max_values=1024):
+        self.max_values = max_values
+        # Maps array key -> (name, weakref to the array)
+        self._arrays = {}
+        # Maps (type, value) -> name, in LRU order
+        self._values = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._arrays) + len(self._values)
+
+    def lookup(self, value):
+        """
+        Returns the name for `value`, assigning a new one if necessary.
+        """
+        interface = getattr(value, "__array_interface__", None)
+        with self._lock:
+            if interface is not None:
+                return self._lookup_array(value, interface)
+            try:
+                key = (type(value), value)
+                name = self._values.pop(key, None)
+            except TypeError:
+                # Unhashable values can't be recognized when they're seen
+                # again.
+                return WeldObject.generate_input_name()
+            if name is None:
+                name = WeldObject.generate_input_name()
+            self._values[key] = name
+            while len(self._values) > self.max_values:
+                self._values.popitem(last=False)
+            return name
+
+    def _lookup_array(self, value, interface):
+        key = (id(value), interface["data"][0], interface["typestr"],
+               interface["shape"], interface.get("strides"))
+        entry = self._arrays.get(key)
+        if entry is not None:
+            return entry[0]
+
+        name = WeldObject.generate_input_name()
+        arrays = self._arrays
+
+        # This runs whenever the array is collected, possibly while this
+        # thread already holds the lock, so it doesn't take it. Popping a
+        # key is atomic.
+        def remove(ref):
+            arrays.pop(key, None)
+
+        try:
+            ref = weakref.ref(value, remove)
+        except TypeError:
+            # Without a weak reference, the entry could outlive the array
+            # and be handed to an unrelated array at the same address.
+            return name
+        arrays[key] = (name, ref)
+        return name
+
+
 class WeldObject(object):
     """
     Holds a Weld program to be lazily compiled and evaluated,
@@ -54,8 +240,10 @@ class WeldObject(object):
     i.e. libraries should be implemented so they can accept both their
     native types and WeldObjects.
 
-    An WeldObject contains a Weld program as a string, along with a context.
-    The context maps names in the Weld program to concrete values.
+    An WeldObject contains a Weld program, along with a context. The context
+    maps names in the Weld program to concrete values. The program
+    (`weld_code`) is either a string or an expression tree built with
+    weld.ir, which is only written out as text when the object is compiled.
 
     When a WeldObject is evaluated, it uses its encode and decode functions to
     marshall native library types into types that Weld understands. The basic
@@ -74,7 +262,9 @@ class WeldObject(object):
     # Counter for assigning variable names
     _var_num = 0
     _obj_id = 100
-    _registry = {}
+    _registry = _InputRegistry()
+    # Guards the counters above, which are shared by all threads
+    _lock = threading.Lock()
 
     def __init__(self, encoder, decoder):
         self.encoder = encoder
@@ -85,8 +275,9 @@ class WeldObject(object):
         self.dependencies = {}
 
         # Assign a unique ID to the context
-        self.obj_id = "obj%d" % WeldObject._obj_id
-        WeldObject._obj_id += 1
+        with WeldObject._lock:
+            self.obj_id = "obj%d" % WeldObject._obj_id
+            WeldObject._obj_id += 1
 
         # Maps name -> input data
         self.context = {}
@@ -94,14 +285,21 @@ class WeldObject(object):
         self.argtypes = {}
 
     def __repr__(self):
-        return self.weld_code + " " + str(self.context) + " " + str([obj_id for obj_id in self.dependencies])
+        return str(self.weld_code) + " " + str(self.context) + " " + str([obj_id for obj_id in self.dependencies])
 
     @staticmethod
-    def generate_input_name(value_str):
-        name = "_inp%d" % WeldObject._var_num
-        WeldObject._var_num += 1
-        WeldObject._registry[value_str] = name
+    def reset_registry(max_values=1024):
+        """
+        Replaces the input registry, e.g. to change how many non-array inputs
+        it remembers by value.
+        """
+        WeldObject._registry = _InputRegistry(max_values)
 
+    @staticmethod
+    def generate_input_name():
+        with WeldObject._lock:
+            name = "_inp%d" % WeldObject._var_num
+            WeldObject._var_num += 1
         return name
 
     def update(self, value, tys=None, override=True):
@@ -116,126 +314,459 @@ class WeldObject(object):
             self.context.update(value.context)
         else:
             # Ensure that the same inputs always have same names
-            value_str = str(value)
-            if value_str in WeldObject._registry:
-                name = WeldObject._registry[value_str]
-            else:
-                name = WeldObject.generate_input_name(value_str)
+            name = WeldObject._registry.lookup(value)
             self.context[name] = value
             if tys is not None and not override:
                 self.argtypes[name] = tys
             return name
 
     def get_let_statements(self):
-        queue = [self]
-        visited = set()
+        """
+        Returns the let statements defining the objects this object depends
+        on, each after the objects it depends on.
+
+        Objects are emitted in depth-first post-order, visiting dependencies
+        in the order of their keys, so the output is deterministic and takes
+        time linear in the size of the dependency graph. The traversal is
+        iterative, so deep chains of objects don't hit the recursion limit.
+        """
+        lets, _ = self._let_statements(cse=False)
+        return "\n".join("let %s = (%s);" % let for let in lets)
+
+    def _let_statements(self, cse=True):
+        """
+        Returns the let statements for this object's dependencies (see
+        get_let_statements), as a list of (name, code) pairs, and the code of
+        this object.
+
+        If `cse` is set, objects which compute the same value, i.e. whose
+        code is the same up to layout once their dependencies are merged, are
+        merged into a single let statement. Inputs have the same name
+        wherever they are used, so equal code reads the same inputs.
+        References to merged objects are renamed in the code that follows.
+        """
         let_statements = []
-        is_first = True
-        while len(queue) > 0:
-            cur_obj = queue.pop()
-            cur_obj_id = cur_obj.obj_id
-            if cur_obj_id in visited:
-                continue
-            if not is_first:
-                let_statements.insert(0, "let %s = (%s);" % (cur_obj_id, cur_obj.weld_code))
-            is_first = False
-            for key in sorted(cur_obj.dependencies.keys()):
-                queue.append(cur_obj.dependencies[key])
-            visited.add(cur_obj_id)
-        let_statements.sort()  # To ensure that let statements are in the right
-                               # order in the final generated program
-        return "\n".join(let_statements)
+        # Maps the ID of each merged object to the ID of the object it was
+        # merged into.
+        renamed = {}
+        # Maps normalized code to the ID of the object defined with it.
+        defined = {}
+
+        def rename(match):
+            return renamed.get(match.group(0), match.group(0))
+
+        visited = set([self.obj_id])
+        # Each entry is an object and an iterator over its dependencies which
+        # haven't been visited yet.
+        stack = [(self, iter(sorted(self.dependencies.items())))]
+        while stack:
+            obj, deps = stack[-1]
+            for _, dep in deps:
+                if dep.obj_id not in visited:
+                    visited.add(dep.obj_id)
+                    stack.append((dep, iter(sorted(dep.dependencies.items()))))
+                    break
+            else:
+                # All dependencies of obj have been emitted.
+                stack.pop()
+                code = str(obj.weld_code)
+                if renamed:
+                    code = _OBJ_NAME_RE.sub(rename, code)
+                if obj is self:
+                    break
+                if cse and (_BUILDER_RE.search(code) is None or
+                            "result(" in code):
+                    key = normalize_layout(code)
+                    existing = defined.get(key)
+                    if existing is not None:
+                        renamed[obj.obj_id] = existing
+                        continue
+                    defined[key] = obj.obj_id
+                let_statements.append((obj.obj_id, code))
+        return let_statements, code
+
+    @staticmethod
+    def _prune(lets, code):
+        """
+        Drops the let statements which `code` doesn't use, directly or
+        through other let statements. `lets` must be in the order returned
+        by _let_statements.
+
+        Returns the remaining statements and the set of words in them and in
+        `code`, which includes the name of every input they read.
+        """
+        used = set(_WORD_RE.findall(code))
+        kept = []
+        # Statements are only used by the ones that follow them.
+        for name, let_code in reversed(lets):
+            if name in used:
+                used.update(_WORD_RE.findall(let_code))
+                kept.append((name, let_code))
+        kept.reverse()
+        return kept, used
 
     def to_weld_func(self):
-        names = sorted(self.context.keys())
+        return self._to_weld_func()[0]
+
+    def _to_weld_func(self, hoist=False, cse=True):
+        """
+        Returns the Weld function for this object, the literals hoisted out of
+        it into arguments, and the names of the context's inputs it takes,
+        which precede the literals.
+
+        If `cse` is set, duplicate objects in the dependency graph are
+        computed once (see _let_statements). Objects and inputs which the
+        program doesn't use are left out, so they are never encoded or passed
+        to Weld.
+        """
+        lets, code = self._let_statements(cse)
+        lets, used = WeldObject._prune(lets, code)
+        names = sorted(name for name in self.context.keys() if name in used)
         arg_strs = ["{0}: {1}".format(str(name),
                                       str(self.encoder.py_to_weld_type(self.context[name])))
                     for name in names]
+        let_statements = "\n".join("let %s = (%s);" % let for let in lets)
+        body = let_statements + "\n" + code
+        literals = []
+        if hoist:
+            body, literals = hoist_literals(body)
+            arg_strs.extend("{0}: {1}".format(lit.name, lit.weld_type)
+                            for lit in literals)
         header = "|" + ", ".join(arg_strs) + "|"
-        text = header + " " + self.get_let_statements() + "\n" + self.weld_code
-        return text
+        text = header + " " + body
+        return text, literals, names
 
-    def evaluate(self, restype, verbose=True, decode=True, passes=None,
-                 num_threads=1, apply_experimental_transforms=False):
-        function = self.to_weld_func()
+    def prepare(self, restype, verbose=False, passes=None,
+                apply_experimental_transforms=None, cache=True,
+                hoist_literals=True, session=None, decoder=None):
+        """
+        Compiles this object's program and returns a WeldFunction, which runs
+        it with the current inputs or with new inputs of the same types.
 
-        # Returns a wrapped ctypes Structure
-        def args_factory(encoded):
-            class Args(ctypes.Structure):
-                _fields_ = [e for e in encoded]
-            return Args
+        The program is compiled with the settings of `session` (by default,
+        the current WeldSession); `passes` and
+        `apply_experimental_transforms` override them unless None.
 
-        # Encode each input argument. This is the positional argument list
-        # which will be wrapped into a Weld struct and passed to the Weld API.
-        names = sorted(self.context.keys())
+        `cache` selects the WeldModuleCache used to look up the compiled
+        module: True uses the session's cache, and False or None compiles the
+        program without caching.
 
-        start = time.time()
-        encoded = []
-        argtypes = []
+        If `hoist_literals` is set, scalar literals in the program are passed
+        as arguments instead (see weld.literals), so programs which differ
+        only in their constants share one compiled module.
+
+        `decoder` replaces this object's decoder for the function's results,
+        e.g. to decode them into a different format.
+        """
+        return self._prepare(self._snapshot(hoist_literals), restype,
+                             verbose, passes, apply_experimental_transforms,
+                             cache, session, decoder)
+
+    def _snapshot(self, hoist_literals):
+        """
+        Captures the program and inputs of this object, so that it can be
+        compiled and run while the object continues to change.
+        """
+        function, literals, names = self._to_weld_func(hoist=hoist_literals)
+        function = normalize_program(function)
+
+        weld_types = []
         for name in names:
             if name in self.argtypes:
-                argtypes.append(self.argtypes[name].ctype_class)
-                encoded.append(self.context[name])
+                weld_types.append(self.argtypes[name])
             else:
-                argtypes.append(self.encoder.py_to_weld_type(
-                    self.context[name]).ctype_class)
-                encoded.append(self.encoder.encode(self.context[name]))
+                weld_types.append(self.encoder.py_to_weld_type(
+                    self.context[name]))
+        defaults = [self.context[name] for name in names]
+        return (function, names, weld_types, defaults,
+                set(self.argtypes.keys()), literals)
+
+    def _prepare(self, snapshot, restype, verbose, passes,
+                 apply_experimental_transforms, cache, session, decoder):
+        function, names, weld_types, defaults, pre_encoded, literals = snapshot
+        if session is None:
+            session = get_session()
+        compile_conf = session.compile_conf(passes,
+                                            apply_experimental_transforms)
+
+        start = time.time()
+        cache = session.get_cache(cache)
+        if cache is None:
+            module, hit = compile_module(function, compile_conf), False
+        else:
+            module, hit = cache.lookup(function, compile_conf)
         end = time.time()
         if verbose:
-            print("Python->Weld:", end - start)
+            print("Weld compile time:", end - start)
 
-        Args = args_factory(zip(names, argtypes))
-        weld_args = Args()
-        for name, value in zip(names, encoded):
-            setattr(weld_args, name, value)
+        if decoder is None:
+            decoder = self.decoder
+        function = WeldFunction(module, function, restype, self.encoder,
+                                decoder, names, weld_types, defaults,
+                                pre_encoded, literals)
+        function.compile_time = end - start
+        function.compiled = not hit
+        return function
+
+    def evaluate(self, restype, verbose=False, decode=True, passes=None,
+                 num_threads=None, apply_experimental_transforms=None,
+                 cache=True, hoist_literals=True, pool=True, session=None,
+                 sink=None, decoder=None):
+        """
+        Compiles and runs this object's program, returning the decoded result.
+
+        See `prepare` for a description of the compilation options, and
+        WeldFunction.run for the others. The metrics of the evaluation,
+        including its compile time and, if the program was compiled rather
+        than found in the cache, Weld's WeldCompileStats, are passed to the
+        sinks registered with weld.metrics.add_sink and to `sink`, and printed
+        if `verbose` is set.
+        """
+        function = self._prepare(
+            self._snapshot(hoist_literals), restype, False, passes,
+            apply_experimental_transforms, cache, session, decoder)
+        return function._run(None, num_threads, verbose, decode, pool,
+                             session, sink, True)
+
+    def evaluate_async(self, restype, verbose=False, decode=True, passes=None,
+                       num_threads=None, apply_experimental_transforms=None,
+                       cache=True, hoist_literals=True, pool=True,
+                       session=None, sink=None, decoder=None,
+                       executor=None):
+        """
+        Compiles and runs this object's program on a worker thread, returning
+        a concurrent.futures.Future for the decoded result.
+
+        The program and its inputs are captured before this method returns, so
+        the object can be changed (or evaluated again) while the evaluation
+        is in flight. Weld releases the GIL while it compiles and runs, so
+        other Python threads keep running. In asyncio code, wrap the result
+        with asyncio.wrap_future to await it.
+
+        `executor` is the concurrent.futures.Executor to run on; by default,
+        a shared thread pool (see set_default_executor) is used. The other
+        arguments are the same as for `evaluate`; the current session is
+        captured on the calling thread.
+        """
+        snapshot = self._snapshot(hoist_literals)
+        if session is None:
+            session = get_session()
 
-        start = time.time()
-        void_ptr = ctypes.cast(ctypes.byref(weld_args), ctypes.c_void_p)
-        arg = cweld.WeldValue(void_ptr)
-        conf = cweld.WeldConf()
-        err = cweld.WeldError()
+        def run():
+            function = self._prepare(snapshot, restype, False, passes,
+                                     apply_experimental_transforms, cache,
+                                     session, decoder)
+            return function._run(None, num_threads, verbose, decode, pool,
+                                 session, sink, True)
 
-        if passes is not None:
-            passes = ",".join(passes)
-            passes = passes.strip()
-            if passes != "":
-                conf.set("weld.optimization.passes", passes)
+        if executor is None:
+            executor = get_default_executor()
+        return executor.submit(run)
 
-        module = cweld.WeldModule(function, conf, err)
-        if err.code() != 0:
-            raise ValueError("Could not compile function {}: {}".format(
-                function, err.message()))
-        end = time.time()
+
+class WeldFunction(object):
+    """
+    A compiled WeldObject program, which can be called repeatedly with new
+    inputs of the same Weld types. Created by WeldObject.prepare.
+
+    The function takes the inputs of the WeldObject it was prepared from,
+    named `arg_names` in order; inputs which aren't passed keep their values
+    from when the function was prepared. Hoisted literals can be passed by
+    name as well. Since the program and its argument layout are fixed,
+    calling the function only encodes the inputs, runs the module and decodes
+    the result.
+    """
+
+    def __init__(self, module, program, restype, encoder, decoder, names,
+                 weld_types, defaults, pre_encoded, literals):
+        self.module = module
+        self.program = program
+        self.restype = restype
+        self.encoder = encoder
+        self.decoder = decoder
+        # Seconds spent compiling (or looking up) the module, if known, and
+        # whether the module was compiled (rather than found in a cache).
+        self.compile_time = None
+        self.compiled = False
+        self._program_hash = None
+
+        # Inputs passed to Weld as they are, rather than through the encoder.
+        self._pre_encoded = set(pre_encoded)
+        self._pre_encoded.update(lit.name for lit in literals)
+
+        self.arg_names = list(names) + [lit.name for lit in literals]
+        self._weld_types = dict(zip(names, weld_types))
+        self._defaults = dict(zip(names, defaults))
+        for lit in literals:
+            self._defaults[lit.name] = lit.value
+
+        ctype_classes = [ty.ctype_class for ty in weld_types]
+        ctype_classes.extend(lit.ctype_class for lit in literals)
+
+        class Args(ctypes.Structure):
+            _fields_ = list(zip(self.arg_names, ctype_classes))
+        self._args_class = Args
+
+    def __call__(self, *args, **kwargs):
+        """
+        Runs the function with the given inputs, returning the decoded result.
+        Positional arguments are bound to `arg_names` in order.
+        """
+        if len(args) > len(self.arg_names):
+            raise ValueError("Expected at most {} arguments, got {}".format(
+                len(self.arg_names), len(args)))
+        values = dict(zip(self.arg_names, args))
+        for name, value in kwargs.items():
+            if name in values:
+                raise ValueError("Argument {} passed twice".format(name))
+            values[name] = value
+        return self.run(values)
+
+    @property
+    def program_hash(self):
+        """
+        The hash identifying this function's program in metrics records.
+        """
+        if self._program_hash is None:
+            self._program_hash = metrics.program_hash(self.program)
+        return self._program_hash
+
+    @property
+    def compile_stats(self):
+        """
+        The WeldCompileStats Weld collected while compiling this function's
+        module.
+        """
+        return self.module.stats()
+
+    def _check(self, name, value):
+        if name not in self._defaults:
+            raise ValueError("Unknown argument {}".format(name))
+        if name in self._pre_encoded:
+            return
+        expected = self._weld_types[name]
+        weld_type = self.encoder.py_to_weld_type(value)
+        if weld_type != expected:
+            raise ValueError("Argument {} has Weld type {}, expected {}".format(
+                name, weld_type, expected))
+
+    def run(self, values=None, num_threads=None, verbose=False, decode=True,
+            pool=True, session=None, sink=None):
+        """
+        Runs the function, returning the decoded result.
+
+        Args:
+            values (dict): Maps argument names to new inputs. Other arguments
+                keep their values from when the function was prepared.
+            num_threads (int): The number of threads Weld runs with. If None,
+                the session's setting is used.
+            verbose (bool): Prints the time spent in each phase if set.
+            decode (bool): If unset, returns the result as an int64 read from
+                the result pointer instead of decoding it.
+            pool (WeldContextPool): The pool to take the run's context from.
+                True uses the session's pool, and False or None creates a new
+                context for the run.
+            session (WeldSession): The session providing the thread count,
+                memory limit and pool. Defaults to the current session.
+            sink (MetricsSink): Receives the metrics of this run, in
+                addition to the sinks registered with weld.metrics.add_sink.
+        """
+        return self._run(values, num_threads, verbose, decode, pool, session,
+                         sink, False)
+
+    def _run(self, values, num_threads, verbose, decode, pool, session, sink,
+             report_compile):
+        sinks = metrics.get_sinks()
+        if sink is not None:
+            sinks = sinks + (sink,)
         if verbose:
-            print("Weld compile time:", end - start)
+            sinks = sinks + (metrics.PrintSink(),)
+        if session is None:
+            session = get_session()
+        if num_threads is None:
+            num_threads = session.num_threads
+        memory_limit = session.memory_limit
+        pool = session.get_pool(pool)
+        if values is None:
+            values = {}
+        for name, value in values.items():
+            self._check(name, value)
+
+        # Encode each input argument. This is the positional argument list
+        # which will be wrapped into a Weld struct and passed to the Weld API.
+        bytes_encoded = 0
+        start = time.time()
+        weld_args = self._args_class()
+        # The arguments are copies of the encoded values, which may own the
+        # memory they point to (e.g. a table of rows), so the values are kept
+        # until the run returns.
+        encoded = []
+        for name in self.arg_names:
+            value = values.get(name, self._defaults[name])
+            if name not in self._pre_encoded:
+                if sinks:
+                    bytes_encoded += metrics.payload_size(value)
+                value = self.encoder.encode(value)
+                encoded.append(value)
+            setattr(weld_args, name, value)
+        encode_time = time.time() - start
 
         start = time.time()
-        conf = cweld.WeldConf()
-        conf.set("weld.threads", str(num_threads))
-        conf.set("weld.memory.limit", "100000000000")
-        conf.set("weld.optimization.applyExperimentalTransforms",
-                 "true" if apply_experimental_transforms else "false")
+        void_ptr = ctypes.cast(ctypes.byref(weld_args), ctypes.c_void_p)
+        arg = cweld.WeldValue(void_ptr)
+        if pool is None:
+            context = None
+            conf = cweld.WeldConf()
+            conf.set("weld.threads", str(num_threads))
+            conf.set("weld.memory.limit", str(memory_limit))
+        else:
+            context = pool.acquire(num_threads, memory_limit)
+            conf = None
         err = cweld.WeldError()
-        weld_ret = module.run(conf, arg, err)
+        weld_ret = self.module.run(conf, arg, err, context=context)
+        arg.free()
+        del encoded
+        owner = WeldValueOwner(weld_ret, pool, context)
         if err.code() != 0:
+            # Frees (or releases) the context of the failed run.
+            owner.free()
             raise ValueError(("Error while running function,\n{}\n\n"
                               "Error message: {}").format(
-                function, err.message()))
-        ptrtype = POINTER(restype.ctype_class)
+                self.program, err.message()))
+        ptrtype = POINTER(self.restype.ctype_class)
         data = ctypes.cast(weld_ret.data(), ptrtype)
-        end = time.time()
-        if verbose:
-            print("Weld:", end - start)
+        run_time = time.time() - start
+        memory_usage = weld_ret.memory_usage() if sinks else 0
 
         start = time.time()
-        if decode:
-            result = self.decoder.decode(data, restype)
-        else:
-            data = cweld.WeldValue(weld_ret).data()
-            result = ctypes.cast(data, ctypes.POINTER(
+        if not decode:
+            result = ctypes.cast(weld_ret.data(), ctypes.POINTER(
                 ctypes.c_int64)).contents.value
-        end = time.time()
-        if verbose:
-            print("Weld->Python:", end - start)
-
+            owner.free()
+        elif getattr(self.decoder, "tracks_ownership", False):
+            # Weld's memory is freed when the last object decoded from it
+            # (e.g., a zero-copy NumPy array) is garbage collected; right
+            # away if nothing references it.
+            result = self.decoder.decode(data, self.restype, owner=owner)
+        else:
+            # The result may point into Weld's memory indefinitely, so the
+            # value is never freed and its context never returns to the pool.
+            owner.leak()
+            result = self.decoder.decode(data, self.restype)
+        del owner
+        decode_time = time.time() - start
+
+        if sinks:
+            compile_time, compile_stats = None, None
+            if report_compile:
+                compile_time = self.compile_time
+                if self.compiled:
+                    compile_stats = self.compile_stats
+            record = metrics.EvaluationMetrics(
+                self.program_hash, num_threads, encode_time=encode_time,
+                compile_time=compile_time, run_time=run_time,
+                decode_time=decode_time, bytes_encoded=bytes_encoded,
+                bytes_decoded=metrics.payload_size(result) if decode else 0,
+                memory_usage=memory_usage, compile_stats=compile_stats)
+            metrics.emit(record, sinks)
         return result
@@ -102,6 +102,24 @@ pub unsafe extern "C" fn weld_context_memory_usage(context: weld_context_t) -> i
     context.memory_usage() as int64_t
 }
 
+#[no_mangle]
+/// Resets a context so that it can be reused for another run.
+///
+/// This frees all memory allocated in the context. It fails, storing an error in `err`, if a value
+/// returned by a run with the context has not been freed yet.
+///
+/// This function is a wrapper for `WeldContext::reset`.
+pub unsafe extern "C" fn weld_context_reset(context: weld_context_t, err: weld_error_t) {
+    let context = context as *mut weld::WeldContext;
+    let context = &mut *context;
+    let err = err as *mut weld::WeldError;
+    let err = &mut *err;
+    match context.reset() {
+        Ok(()) => *err = weld::WeldError::new_success(),
+        Err(reset_err) => *err = reset_err,
+    }
+}
+
 #[no_mangle]
 /// Frees a context.
 ///
@@ -289,6 +307,21 @@ pub unsafe extern "C" fn weld_module_run(
     }
 }
 
+#[no_mangle]
+/// Returns the statistics collected while compiling a module.
+///
+/// The statistics are returned as a string with one line per measurement, each with three
+/// tab-separated fields: the category of the measurement (`weld`, `pass` or `llvm`), its name, and
+/// its duration in milliseconds. The string is owned by the module and is valid until the module
+/// is freed.
+///
+/// This function is a wrapper for `WeldModule::compile_stats_tsv`.
+pub unsafe extern "C" fn weld_module_stats(module: weld_module_t) -> *const c_char {
+    let module = module as *mut weld::WeldModule;
+    let module = &*module;
+    module.compile_stats_tsv().as_ptr()
+}
+
 #[no_mangle]
 /// Frees a module.
 ///
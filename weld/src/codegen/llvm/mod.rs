@@ -474,11 +474,18 @@ pub trait CodeGenExt {
             _ if kind.is_integer() => {
                 let ty = LLVMIntTypeInContext(self.context(), kind.bits());
                 let signed = kind.is_signed() as i32;
+                // The bit patterns of the smallest and largest values of the type.
+                let (min, max) = if kind.is_signed_integer() {
+                    let sign = 1u64 << (kind.bits() - 1);
+                    (sign, sign - 1)
+                } else {
+                    (::std::u64::MIN, ::std::u64::MAX)
+                };
                 match op {
                     Add => Ok(LLVMConstInt(ty, 0, signed)),
                     Multiply => Ok(LLVMConstInt(ty, 1, signed)),
-                    Max => Ok(LLVMConstInt(ty, ::std::u64::MIN, signed)),
-                    Min => Ok(LLVMConstInt(ty, ::std::u64::MAX, signed)),
+                    Max => Ok(LLVMConstInt(ty, min, signed)),
+                    Min => Ok(LLVMConstInt(ty, max, signed)),
                     _ => unreachable!(),
                 }
             }
@@ -487,8 +494,8 @@ pub trait CodeGenExt {
                 match op {
                     Add => Ok(LLVMConstReal(ty, 0.0)),
                     Multiply => Ok(LLVMConstReal(ty, 1.0)),
-                    Max => Ok(LLVMConstReal(ty, f64::from(::std::f32::MIN))),
-                    Min => Ok(LLVMConstReal(ty, f64::from(::std::f32::MAX))),
+                    Max => Ok(LLVMConstReal(ty, f64::from(::std::f32::NEG_INFINITY))),
+                    Min => Ok(LLVMConstReal(ty, f64::from(::std::f32::INFINITY))),
                     _ => unreachable!(),
                 }
             }
@@ -497,8 +504,8 @@ pub trait CodeGenExt {
                 match op {
                     Add => Ok(LLVMConstReal(ty, 0.0)),
                     Multiply => Ok(LLVMConstReal(ty, 1.0)),
-                    Max => Ok(LLVMConstReal(ty, ::std::f64::MIN)),
-                    Min => Ok(LLVMConstReal(ty, ::std::f64::MAX)),
+                    Max => Ok(LLVMConstReal(ty, ::std::f64::NEG_INFINITY)),
+                    Min => Ok(LLVMConstReal(ty, ::std::f64::INFINITY)),
                     _ => unreachable!(),
                 }
             }
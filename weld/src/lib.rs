@@ -184,10 +184,10 @@ mod tests;
 use crate::conf::ParsedConf;
 use crate::runtime::WeldRuntimeContext;
 use crate::util::dump::{write_code, DumpCodeFormat};
-use crate::util::stats::CompilationStats;
 
 // Error codes are exposed publicly.
 pub use crate::runtime::WeldRuntimeErrno;
+pub use crate::util::stats::CompilationStats;
 
 /// A wrapper for a C pointer.
 pub type Data = *const libc::c_void;
@@ -288,6 +288,38 @@ impl WeldContext {
     pub fn memory_limit(&self) -> i64 {
         self.context.borrow().memory_limit()
     }
+
+    /// Resets this context so that it can be reused for another run.
+    ///
+    /// Resetting frees all memory allocated by previous runs with this context. Values returned
+    /// by those runs hold a reference to the context, so a context can only be reset once all of
+    /// them (and any other clones of the context) have been dropped.
+    ///
+    /// # Errors
+    ///
+    /// Returns an error if another reference to this context is still alive.
+    ///
+    /// # Examples
+    ///
+    /// ```rust
+    /// use weld::{WeldConf, WeldContext};
+    ///
+    /// let mut context = WeldContext::new(&WeldConf::new()).unwrap();
+    /// assert!(context.reset().is_ok());
+    /// assert_eq!(context.memory_usage(), 0);
+    ///
+    /// let _clone = context.clone();
+    /// assert!(context.reset().is_err());
+    /// ```
+    pub fn reset(&mut self) -> WeldResult<()> {
+        if Rc::strong_count(&self.context) > 1 {
+            return weld_err!("Cannot reset a context that is still referenced by a value");
+        }
+        unsafe {
+            self.context.borrow_mut().reset();
+        }
+        Ok(())
+    }
 }
 
 impl WeldError {
@@ -573,6 +605,10 @@ pub struct WeldModule {
     return_type: ast::Type,
     /// A unique identifier for a module.
     module_id: Uuid,
+    /// Statistics collected while compiling this module.
+    compile_stats: CompilationStats,
+    /// `compile_stats` in the format returned by `CompilationStats::to_tsv`.
+    compile_stats_tsv: CString,
 }
 
 impl WeldModule {
@@ -751,14 +787,44 @@ impl WeldModule {
             e2e_ms
         );
 
+        let compile_stats_tsv = CString::new(stats.to_tsv()).unwrap();
         Ok(WeldModule {
             llvm_module: compiled_module,
             param_types,
             return_type,
             module_id: uuid,
+            compile_stats: stats,
+            compile_stats_tsv,
         })
     }
 
+    /// Returns the statistics collected while compiling this module.
+    ///
+    /// These include the time spent in each phase of the Weld compiler, in each optimization pass,
+    /// and in LLVM.
+    ///
+    /// # Examples
+    ///
+    /// ```rust,no_run
+    /// use weld::*;
+    ///
+    /// let conf = &WeldConf::new();
+    /// let module = WeldModule::compile("|x: i32| x + 1", conf).unwrap();
+    ///
+    /// let stats = module.compile_stats();
+    /// assert!(!stats.weld_times.is_empty());
+    /// ```
+    pub fn compile_stats(&self) -> &CompilationStats {
+        &self.compile_stats
+    }
+
+    /// Returns the statistics collected while compiling this module as a C string.
+    ///
+    /// The string is formatted as described in `CompilationStats::to_tsv`.
+    pub fn compile_stats_tsv(&self) -> &CStr {
+        &self.compile_stats_tsv
+    }
+
     /// Run this `WeldModule` with a context and argument.
     ///
     /// This is the entry point for running a Weld program. The argument is a `WeldValue` that
@@ -203,6 +203,21 @@ impl WeldRuntimeContext {
         self.allocated -= layout.size();
     }
 
+    /// Frees all memory allocated by this context and clears its error code and result, so that
+    /// it can be used for another run.
+    ///
+    /// The caller must ensure that no pointer into memory allocated by this context is used
+    /// afterwards.
+    pub unsafe fn reset(&mut self) {
+        trace!("Resetting context ({} allocations)", self.allocations.len());
+        for (pointer, layout) in self.allocations.drain() {
+            Allocator.dealloc(pointer, layout);
+        }
+        self.allocated = 0;
+        self.errno = WeldRuntimeErrno::Success;
+        self.result = ptr::null_mut();
+    }
+
     /// Returns the number of bytes allocated by this Weld run.
     pub fn memory_usage(&self) -> i64 {
         self.allocated as i64
@@ -5,6 +5,7 @@ use time;
 use self::time::Duration;
 
 /// Tracks various compile-time statistics throughout the compiler.
+#[derive(Debug, Clone)]
 pub struct CompilationStats {
     /// Running times for various Weld compiler components.
     pub weld_times: Vec<(String, Duration)>,
@@ -36,6 +37,39 @@ impl CompilationStats {
         }
     }
 
+    /// Returns the duration in milliseconds, with microsecond precision.
+    fn millis(duration: &Duration) -> f64 {
+        match duration.num_microseconds() {
+            Some(v) => (v as f64) / 1000.0,
+            None => duration.num_milliseconds() as f64,
+        }
+    }
+
+    /// Returns the statistics stored in `self` in a machine-readable format.
+    ///
+    /// Each measurement is written on its own line as three tab-separated fields: its category
+    /// (`weld`, `pass` or `llvm`), its name, and its duration in milliseconds. Measurements appear
+    /// in the order they were taken, so passes which run more than once appear more than once.
+    pub fn to_tsv(&self) -> String {
+        let mut result = String::new();
+        let categories = [
+            ("weld", &self.weld_times),
+            ("pass", &self.pass_times),
+            ("llvm", &self.llvm_times),
+        ];
+        for &(category, times) in categories.iter() {
+            for &(ref name, ref dur) in times.iter() {
+                result.push_str(&format!(
+                    "{}\t{}\t{}\n",
+                    category,
+                    name,
+                    CompilationStats::millis(dur)
+                ));
+            }
+        }
+        result
+    }
+
     /// Returns pretty-printed statistics stored in `self`.
     pub fn pretty_print(&self) -> String {
         let mut result = String::new();
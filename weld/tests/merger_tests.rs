@@ -332,3 +332,89 @@ fn maxmin_mergers_test() {
     assert_eq!(result.f32max, 2.0 as f32);
     assert_eq!(result.f64max, 2.0 as f64);
 }
+
+#[test]
+fn signed_maxmin_mergers_identity() {
+    #[derive(Clone)]
+    #[allow(dead_code)]
+    #[repr(C)]
+    struct Output {
+        i64max: i64,
+        i32min: i32,
+    }
+
+    #[derive(Clone)]
+    #[allow(dead_code)]
+    #[repr(C)]
+    struct Args {
+        i32in: WeldVec<i32>,
+        i64in: WeldVec<i64>,
+    }
+
+    // The identities must not win over all positive or all negative inputs.
+    let code = "
+    |i32in: vec[i32], i64in: vec[i64]|
+    let i64max = result(for(i64in, merger[i64, max], |b, i, n| merge(b, n)));
+    let i32min = result(for(i32in, merger[i32, min], |b, i, n| merge(b, n)));
+    {i64max, i32min}";
+
+    let ref mut conf = default_conf();
+
+    let i32in: Vec<i32> = vec![3, 1, 2];
+    let i64in: Vec<i64> = vec![-3, -1, -2];
+
+    let ref input_data = Args {
+        i32in: WeldVec::from(&i32in),
+        i64in: WeldVec::from(&i64in),
+    };
+
+    let ret_value = compile_and_run(code, conf, input_data);
+    let data = ret_value.data() as *const Output;
+    let result = unsafe { (*data).clone() };
+
+    assert_eq!(result.i64max, -1 as i64);
+    assert_eq!(result.i32min, 1 as i32);
+}
+
+#[test]
+fn float_maxmin_mergers_identity() {
+    #[derive(Clone)]
+    #[allow(dead_code)]
+    #[repr(C)]
+    struct Output {
+        f64max: f64,
+        f32min: f32,
+    }
+
+    #[derive(Clone)]
+    #[allow(dead_code)]
+    #[repr(C)]
+    struct Args {
+        f32in: WeldVec<f32>,
+        f64in: WeldVec<f64>,
+    }
+
+    // The identities are infinities, so they don't win over infinite inputs.
+    let code = "
+    |f32in: vec[f32], f64in: vec[f64]|
+    let f64max = result(for(f64in, merger[f64, max], |b, i, n| merge(b, n)));
+    let f32min = result(for(f32in, merger[f32, min], |b, i, n| merge(b, n)));
+    {f64max, f32min}";
+
+    let ref mut conf = default_conf();
+
+    let f32in: Vec<f32> = vec![::std::f32::INFINITY; 3];
+    let f64in: Vec<f64> = vec![::std::f64::NEG_INFINITY; 3];
+
+    let ref input_data = Args {
+        f32in: WeldVec::from(&f32in),
+        f64in: WeldVec::from(&f64in),
+    };
+
+    let ret_value = compile_and_run(code, conf, input_data);
+    let data = ret_value.data() as *const Output;
+    let result = unsafe { (*data).clone() };
+
+    assert_eq!(result.f64max, ::std::f64::NEG_INFINITY);
+    assert_eq!(result.f32min, ::std::f32::INFINITY);
+}